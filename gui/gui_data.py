@@ -67,5 +67,18 @@ class Data:
         self.morse = Morse()
 
         self.color_points = set()
+        # tracker, its color points set and vtk color array of the shown 
+        # salient edges (for partial updates)
+        self.edge_tracker = None
+        self.edge_points = None
+        self.edge_color_array = None
         self.current_segmentation = {}
-        self.current_segmentation_params = None
\ No newline at end of file
+        self.current_segmentation_params = None
+
+    def is_edge_color_array(self, color_array) -> bool:
+        # compares the underlying vtk arrays, the python wrappers of the same 
+        # array need not be the same object
+        if color_array is None or self.edge_color_array is None:
+            return False
+        return (color_array.GetAddressAsString("vtkDataArray") 
+                == self.edge_color_array.GetAddressAsString("vtkDataArray"))
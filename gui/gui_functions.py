@@ -550,20 +550,59 @@ class Gui_Window(Ui_MainWindow):
         self.vtkWidget.GetRenderWindow().Render()
 
     def update_edge_color(self):
-        if self.parameters.mode == "ridge":
-            self.data.color_points = self.data.morse.get_salient_ridges(self.parameters.high_thresh, 
-                                                                        self.parameters.low_thresh, 
-                                                                        self.parameters.min_length, 
-                                                                        self.parameters.max_length,
-                                                                        self.parameters.separatrix_type)
-        elif self.parameters.mode == "valley":
-            self.data.color_points = self.data.morse.get_salient_valleys(self.parameters.high_thresh, 
-                                                                         self.parameters.low_thresh, 
-                                                                         self.parameters.min_length, 
-                                                                         self.parameters.max_length,
-                                                                         self.parameters.separatrix_type)
-        color_dict = {1: self.data.color_points}
+        if self.parameters.mode in ("ridge", "valley"):
+            # only the separatrices between the old and new thresholds change
+            tracker = self.data.morse.get_salient_edge_tracker(mode=self.parameters.mode, 
+                                                               min_length=self.parameters.min_length, 
+                                                               max_length=self.parameters.max_length,
+                                                               separatrix_type=self.parameters.separatrix_type)
+            added, removed = tracker.update(self.parameters.high_thresh, self.parameters.low_thresh)
+            if self.data.edge_tracker is tracker and self.data.color_points is self.data.edge_points:
+                # the color points still hold the previous points of the tracker
+                self.data.color_points.difference_update(removed.tolist())
+                self.data.color_points.update(added.tolist())
+                color_array = self.get_point_colors()
+                if self.data.is_edge_color_array(color_array):
+                    self.update_point_colors(color_array, added, color_list[1])
+                    self.update_point_colors(color_array, removed, (255, 255, 255))
+                    return
+            else:
+                self.data.color_points = set(tracker.points.tolist())
+                self.data.edge_points = self.data.color_points
+            self.data.edge_tracker = tracker
+            color_dict = {1: self.data.color_points}
+        elif self.parameters.mode == "both":
+            ridges, valleys, edges = self.data.morse.get_salient_edges(self.parameters.high_thresh, 
+                                                                       self.parameters.low_thresh, 
+                                                                       self.parameters.min_length, 
+                                                                       self.parameters.max_length,
+                                                                       self.parameters.separatrix_type)
+            self.data.color_points = set(np.flatnonzero(edges).tolist())
+            self.data.edge_tracker = None
+            self.data.edge_points = None
+            color_dict = {1: np.flatnonzero(ridges).tolist(), 
+                          4: np.flatnonzero(valleys).tolist()}
+        else:
+            color_dict = {1: self.data.color_points}
         self.update_mesh_color(color_dict, partial=True, cell_structure=False)
+        self.data.edge_color_array = self.get_point_colors()
+
+    def get_point_colors(self):
+        # Get the color array of the mesh (or None)
+        ren = self.vtkWidget.GetRenderWindow().GetRenderers().GetFirstRenderer()
+        actor = ren.GetActors().GetLastActor()
+        if actor is None:
+            return None
+        return actor.GetMapper().GetInput().GetPointData().GetScalars()
+
+    def update_point_colors(self, color_array, indices, color):
+        # Recolor only the given points in the existing color array
+        if len(indices) == 0:
+            return
+        for ind in indices.tolist():
+            color_array.SetTypedTuple(ind, (color[0], color[1], color[2]))
+        color_array.Modified()
+        self.vtkWidget.GetRenderWindow().Render()
         
     def update_fun_val_color(self, vert_dict: dict, value_range: float, min_value: float):
         # Get the renderer and mesh actor
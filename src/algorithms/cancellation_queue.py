@@ -21,21 +21,30 @@
 #
 # @brief Contains a Cancellation queue class.
 #
+# @section description_cancellationQueue Description
+# An addressable priority queue: every element has a key (e.g. the index of 
+# a saddle or a pair of cell labels) and the priority of a key can be changed 
+# or the key can be removed in O(log n). Outdated heap entries are deleted 
+# lazily, i.e. skipped when they reach the front. Ties in the priority are 
+# broken by the key, so the order of the queue is reproducible.
+#
 # @section libraries_cancellationQueue Libraries/Modules
 # - heapq standard library
 
 import heapq
 
 class CancellationQueue(object):
-    """! @brief Implements a Priority Queue used for Cancellations in Reduce 
-    Morse Complex.
+    """! @brief Implements an addressable Priority Queue used for Cancellations 
+    in Reduce Morse Complex and for merging cells in segmentations.
     """
     ## @var queue
-    # The priority queue storing the elements to be cancelled.
+    # The heap of [priority, key, valid] entries.
+    ## @var entries
+    # Dictionary key -> the valid heap entry of this key.
     def __init__(self): 
         """! @brief The Constructor of the Cancellation Queue."""
         self.queue = []
-        heapq.heapify(self.queue)
+        self.entries = {}
   
     # for checking if the queue is empty 
     def notEmpty(self): 
@@ -43,40 +52,71 @@ class CancellationQueue(object):
         @return Returns True if the queue contains at least one element, 
                 False, if it is empty.
         """
-        return len(self.queue) != 0
+        return len(self.entries) != 0
   
-    # for inserting an element in the queue 
-    def insert(self, data): 
-        """! @brief Inserts a new element to the cancellation queue (based on 
-        the priority).
-        @deatils Need a tuple of 3, with the actual priority first and the id of 
-        the CritEdges to be cancelled, because we need a tiebreaker if two 
-        elements have the same priority (than the id will always give decision, 
-        as they should be unique and for two elements with equal priority, we 
-        do not care which one comes first.
+    # for inserting or updating an element in the queue 
+    def update(self, key, priority): 
+        """! @brief Inserts a key with the given priority or changes the 
+        priority of the key if it is already in the queue.
         
-        @param data The element to be inserted. Should be a tuple of priority, 
-               id of the edge (for tiebreakers) and edge to be cancelled.
+        @param key The key of the element, e.g. the index of the CritEdge to 
+               be cancelled. Has to be comparable to the other keys, as it 
+               breaks ties in the priority.
+        @param priority The priority (lowest comes first).
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] == priority:
+                return
+            entry[2] = False
+        entry = [priority, key, True]
+        self.entries[key] = entry
+        heapq.heappush(self.queue, entry)
+
+    def insert(self, key, priority):
+        """! @brief Inserts a key with the given priority (see update)."""
+        self.update(key, priority)
+
+    def remove(self, key):
+        """! @brief Removes a key from the queue, if it is contained.
+        @param key The key to be removed.
         """
-        heapq.heappush(self.queue, data)
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            entry[2] = False
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def priority(self, key):
+        """! @brief Gives the current priority of a key in the queue.
+        @param key The key.
+        @return The priority of the key.
+        """
+        return self.entries[key][0]
+
+    def _drop_invalid(self):
+        while self.queue and not self.queue[0][2]:
+            heapq.heappop(self.queue)
   
     # for popping an element based on Priority 
     def pop_front(self): 
-        """! @brief Pops the first element with the highest priority from the queue.
-        @return The highest priority element.
+        """! @brief Pops the element with the highest priority from the queue.
+        @return Tuple of priority and key of the highest priority element.
         """
-        return heapq.heappop(self.queue)
+        self._drop_invalid()
+        priority, key, _ = heapq.heappop(self.queue)
+        del self.entries[key]
+        return priority, key
     
-    # for checking the 'second' item (actually is first, cause we popped first one)
+    # for checking the first item
     def check_distance(self):
         """! @brief Check the next priority in the queue.
-        @details Needed cause we have to recompute the priority once we popped 
-        an element and than we need to make sure that the next element in 
-        the queue would still have a lower priority than the one we popped.
         
         @return The priority of the first element in the queue. If it is 
                 empty, the priority is set to inf.
         """
+        self._drop_invalid()
         if self.queue:
             return self.queue[0][0]
         else:
@@ -85,7 +125,6 @@ class CancellationQueue(object):
     # get length of queue
     def length(self):
         """! @brief Give the length of the queue.
-        @return Returns the length of the queue.
+        @return Returns the number of keys in the queue.
         """
-        return len(self.queue)
-    
\ No newline at end of file
+        return len(self.entries)
@@ -0,0 +1,322 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file cell_merging.py
+#
+# @brief Contains the CellMerger class, which segments the cells of a
+# CellGraph by merging adjacent cells with low weights.
+#
+# @section description_cell_merging Description
+# Implements the same greedy merging as MorseCells.segment, but without
+# moving any vertices: merged cells are tracked with a union-find structure
+# over the cell labels, and each adjacency stores the number of salient and
+# of all vertices on its boundary. Merging two cells adds the counts of their
+# boundaries to common neighbors instead of recounting the joined boundary.
+# The vertices of a common neighbor that border both merged cells are found
+# by iterating over the smaller of the two contact sets and are only counted
+# once, so the weights are the same as for the set unions of
+# MorseCells.merge_cells. One addressable CancellationQueue holds all
+# adjacencies below the merge threshold during the whole merging.
+#
+# The merges with a higher merge threshold continue the sequence of merges
+# with a lower one, so the MergeDendrogram records the whole sequence once
+# and gives the segmentation for any merge threshold or number of labels by
+# replaying a prefix of it.
+#
+# @section libraries_cell_merging Libraries/Modules
+# - numpy standard library
+# - cancellation_queue
+# - weight_metrics
+
+# imports
+import numpy as np
+
+from .cancellation_queue import CancellationQueue
+from .weight_metrics import BoundaryCounts
+
+class CellMerger:
+    """! @brief Greedily merges the cells of a CellGraph based on the salient
+    edge points on their boundaries.
+    """
+    ## @var cell_graph
+    # The CellGraph of the cells to be merged.
+    ## @var parent
+    # List with the union-find parent of every label.
+    ## @var sizes
+    # List with the number of vertices of every (merged) cell.
+    ## @var neighbors
+    # List with a dictionary neighbor label -> BoundaryCounts of the boundary
+    # for every (merged) cell. Both cells of an adjacency share the same
+    # BoundaryCounts object.
+    ## @var contacts
+    # List with a dictionary neighbor label -> set of the vertices of the
+    # neighbor bordering the cell for every (merged) cell (as Cell.neighbors).
+    ## @var salient_mask
+    # Boolean numpy array, True for the salient edge points.
+    ## @var cells
+    # Dictionary of the labels of the remaining cells (used as ordered set).
+
+    def __init__(self, cell_graph, salient_mask: np.ndarray):
+        """! @brief Sets up the boundary counts of all adjacencies.
+        @param cell_graph The CellGraph of the cells.
+        @param salient_mask Boolean numpy array, True for the salient edge points.
+        """
+        self.cell_graph = cell_graph
+        self.salient_mask = salient_mask
+        n = cell_graph.n_labels + 1
+        self.parent = list(range(n))
+        self.sizes = cell_graph.sizes.tolist()
+        self.cells = dict.fromkeys(label for label in range(n) if self.sizes[label] > 0)
+
+        # salient and total number of bordering vertices for each adjacency
+        salient = np.concatenate(([0], np.cumsum(salient_mask[cell_graph.contact_idx], dtype=np.int64)))
+        salient = (salient[cell_graph.contact_ptr[1:]] - salient[cell_graph.contact_ptr[:-1]]).tolist()
+        total = np.diff(cell_graph.contact_ptr).tolist()
+        adj_ptr = cell_graph.adj_ptr.tolist()
+        adj_idx = cell_graph.adj_idx.tolist()
+        contact_ptr = cell_graph.contact_ptr.tolist()
+        contact_idx = cell_graph.contact_idx.tolist()
+
+        # the neighbors keep the order of the adjacencies (as Cell.neighbors)
+        pairs = {}
+        self.neighbors = [{} for _ in range(n)]
+        self.contacts = [{} for _ in range(n)]
+        for label in range(n):
+            for k in range(adj_ptr[label], adj_ptr[label + 1]):
+                neighbor = adj_idx[k]
+                key = (min(label, neighbor), max(label, neighbor))
+                counts = pairs.get(key)
+                if counts is None:
+                    counts = pairs[key] = BoundaryCounts()
+                self.neighbors[label][neighbor] = counts
+                self.contacts[label][neighbor] = set(contact_idx[contact_ptr[k]:contact_ptr[k + 1]])
+                counts.salient += salient[k]
+                counts.total += total[k]
+
+    def weight(self, label1: int, label2: int) -> float:
+        """! @brief The percentage of salient edge points on the boundary
+        between two adjacent cells (see compute_weight_saledge).
+        """
+        return self.neighbors[label1][label2].weight()
+
+    def find(self, label: int) -> int:
+        """! @brief Gives the label of the merged cell containing a cell.
+        @param label A cell label.
+        @return The remaining label.
+        """
+        root = label
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[label] != root:
+            self.parent[label], label = root, self.parent[label]
+        return root
+
+    def merge(self, label1: int, label2: int):
+        """! @brief Merges the label2 cell into the label1 cell (see
+        MorseCells.merge_cells). The boundaries to common neighbors are
+        joined by adding their counts, the vertices of the neighbor bordering
+        both cells are counted once.
+        """
+        neighbors1 = self.neighbors[label1]
+        contacts1 = self.contacts[label1]
+        for neighbor, counts in self.neighbors[label2].items():
+            if neighbor == label1:
+                continue
+            contacts2 = self.contacts[label2][neighbor]
+            if neighbor in neighbors1:
+                shared = contacts1[neighbor].intersection(contacts2)
+                if shared:
+                    neighbors1[neighbor].add(counts, shared=BoundaryCounts.from_mask(shared, self.salient_mask))
+                else:
+                    neighbors1[neighbor].add(counts)
+                contacts1[neighbor] = _join(contacts1[neighbor], contacts2)
+                self.contacts[neighbor][label1] = _join(self.contacts[neighbor][label1], 
+                                                        self.contacts[neighbor].pop(label2))
+                self.neighbors[neighbor].pop(label2)
+            else:
+                neighbors1[neighbor] = counts
+                contacts1[neighbor] = contacts2
+                self.neighbors[neighbor][label1] = self.neighbors[neighbor].pop(label2)
+                self.contacts[neighbor][label1] = self.contacts[neighbor].pop(label2)
+        neighbors1.pop(label2)
+        contacts1.pop(label2)
+        self.neighbors[label2] = {}
+        self.contacts[label2] = {}
+        self.sizes[label1] += self.sizes[label2]
+        self.parent[label2] = label1
+        self.cells.pop(label2)
+
+    def merge_below(self, merge_threshold: float, minimum_labels: int, merges: list = None):
+        """! @brief Merges adjacent cells in the order of their weights until
+        no weight is below the merge threshold or the minimum number of
+        labels is reached.
+        @param merges (Optional) List to which the (weight, label1, label2)
+               tuples of the merges are appended.
+        """
+        queue = CancellationQueue()
+        for label in self.cells:
+            for neighbor in self.neighbors[label]:
+                weight = self.weight(label, neighbor)
+                if label < neighbor and weight < merge_threshold:
+                    queue.insert((label, neighbor), weight)
+
+        while queue.notEmpty() and len(self.cells) > minimum_labels:
+            weight, (label1, label2) = queue.pop_front()
+            if merges is not None:
+                merges.append((weight, label1, label2))
+            # the pairs of label2 vanish, the pairs of label1 get new weights
+            for neighbor in self.neighbors[label2]:
+                queue.remove((min(label2, neighbor), max(label2, neighbor)))
+            self.merge(label1, label2)
+            for neighbor in self.neighbors[label1]:
+                key = (min(label1, neighbor), max(label1, neighbor))
+                weight = self.weight(label1, neighbor)
+                if weight < merge_threshold:
+                    queue.update(key, weight)
+                else:
+                    queue.remove(key)
+
+    def remove_small_patches(self, size_threshold: int):
+        """! @brief Merges cells with fewer vertices than the threshold into
+        their lowest weight neighbor (see MorseCells.remove_small_patches).
+        """
+        remove = set()
+        for label in list(self.cells):
+            if self.sizes[label] < size_threshold and self.neighbors[label]:
+                lowest_weight_neighbor = min(self.neighbors[label],
+                                             key=lambda neighbor: abs(self.weight(label, neighbor)))
+                if lowest_weight_neighbor not in remove:
+                    self.merge(lowest_weight_neighbor, label)
+                    remove.add(label)
+
+    def remove_small_enclosures(self, size_threshold: int):
+        """! @brief Merges cells with fewer vertices than the threshold into
+        the cell enclosing them (see MorseCells.remove_small_enclosures).
+        """
+        for label in list(self.cells):
+            if len(self.neighbors[label]) == 1 and self.sizes[label] < size_threshold:
+                self.merge(next(iter(self.neighbors[label])), label)
+
+    def relabel(self) -> np.ndarray:
+        """! @brief Gives the label of the merged cell for every cell label.
+        @return Numpy array indexed by the cell labels.
+        """
+        return np.array([self.find(label) for label in range(len(self.parent))])
+
+    def segment(self, merge_threshold: float, minimum_labels: int, size_threshold: int = 500) -> np.ndarray:
+        """! @brief Merges the cells like MorseCells.segment.
+        @param merge_threshold The threshold for weights between adjacent
+               cells to stop merging.
+        @param minimum_labels A minimum number of labels that stops the
+               merging if it is reached.
+        @param size_threshold (Optional) Cells with fewer vertices are merged
+               into a neighbor afterwards. Default is 500.
+        @return Numpy array with the segment label of every cell label.
+        """
+        self.merge_below(merge_threshold, minimum_labels)
+        self.remove_small_patches(size_threshold)
+        self.remove_small_enclosures(size_threshold)
+        return self.relabel()
+
+def _join(points1: set, points2: set) -> set:
+    """! @brief Joins two vertex sets by adding the smaller one to the larger one.
+    @return The larger set, updated in place.
+    """
+    if len(points1) < len(points2):
+        points1, points2 = points2, points1
+    points1.update(points2)
+    return points1
+
+class MergeDendrogram:
+    """! @brief The sequence of greedy merges of some cells, from which the
+    segmentation for any merge threshold or number of labels can be cut.
+    """
+    ## @var merges
+    # List of (weight, label1, label2) tuples in the order of merging
+    # (label2 is merged into label1).
+    ## @var weights
+    # Numpy array with the running maximum of the merge weights, used to find
+    # the merges below a given merge threshold.
+    ## @var n_cells
+    # The number of cells before merging.
+    ## @var cell_graph
+    # The CellGraph of the cells (None if the merges are not of a CellGraph).
+    ## @var salient_mask
+    # The salient edge point mask used for the weights.
+
+    __slots__ = ("merges", "weights", "n_cells", "cell_graph", "salient_mask")
+
+    def __init__(self, merges: list, n_cells: int, cell_graph=None, salient_mask: np.ndarray = None):
+        """! @brief The constructor of a MergeDendrogram.
+        @param merges List of (weight, label1, label2) tuples of the merges.
+        @param n_cells The number of cells before merging.
+        @param cell_graph (Optional) The CellGraph of the cells.
+        @param salient_mask (Optional) The salient edge point mask.
+        """
+        self.merges = merges
+        self.weights = np.maximum.accumulate(np.array([weight for weight, _, _ in merges], dtype=float))
+        self.n_cells = n_cells
+        self.cell_graph = cell_graph
+        self.salient_mask = salient_mask
+
+    @classmethod
+    def from_cell_graph(cls, cell_graph, salient_mask: np.ndarray):
+        """! @brief Records all merges of the cells of a CellGraph (merging 
+        until no adjacent cells are left).
+        @param cell_graph The CellGraph of the cells.
+        @param salient_mask Boolean numpy array, True for the salient edge points.
+        @return A MergeDendrogram object.
+        """
+        merger = CellMerger(cell_graph, salient_mask)
+        n_cells = len(merger.cells)
+        merges = []
+        merger.merge_below(float("inf"), 1, merges=merges)
+        return cls(merges, n_cells, cell_graph=cell_graph, salient_mask=salient_mask)
+
+    def n_merges(self, merge_threshold: float = None, n_labels: int = None) -> int:
+        """! @brief Gives the number of merges until the merge threshold or
+        the number of labels is reached.
+        @param merge_threshold (Optional) Only merges with weights below are done.
+        @param n_labels (Optional) Merging stops when this number of labels
+               is left.
+        @return The length of the prefix of merges.
+        """
+        n = len(self.merges)
+        if merge_threshold is not None:
+            n = int(np.searchsorted(self.weights, merge_threshold, side="left"))
+        if n_labels is not None:
+            n = min(n, max(self.n_cells - n_labels, 0))
+        return n
+
+    def cut(self, merge_threshold: float = None, n_labels: int = None, size_threshold: int = 0) -> np.ndarray:
+        """! @brief Gives the segmentation for a merge threshold and/or 
+        number of labels, the same as CellMerger.segment.
+        @param merge_threshold (Optional) The threshold for weights between
+               adjacent cells to stop merging.
+        @param n_labels (Optional) The minimum number of labels.
+        @param size_threshold (Optional) Cells with fewer vertices are merged
+               into a neighbor afterwards. Default is 0.
+        @return Numpy array with the segment label of every cell label.
+        """
+        merger = CellMerger(self.cell_graph, self.salient_mask)
+        for _, label1, label2 in self.merges[:self.n_merges(merge_threshold, n_labels)]:
+            merger.merge(label1, label2)
+        merger.remove_small_patches(size_threshold)
+        merger.remove_small_enclosures(size_threshold)
+        return merger.relabel()
@@ -17,7 +17,11 @@
 """
 
 import random
+from copy import deepcopy
 from .cancellation_queue import CancellationQueue
+from .cell_merging import MergeDendrogram
+from .weight_metrics import BoundaryCounts
+from .morse_cells import neighbor_labels
 from collections import Counter
 import numpy as np
 
@@ -32,6 +36,7 @@ class Component:
         self.boundary = set()
         self.neighbors = {}
         self.neighbors_weights = {}
+        self.neighbors_counts = {}
 
     def get_open_neighbors(self, vert_dict: dict) -> list:
         open_neighbors = []
@@ -67,37 +72,56 @@ def merge_components(cluster: dict, label1: int, label2: int) -> dict:
             cluster[label1].neighbors_weights[nei_label] = cluster[label2].neighbors_weights[nei_label]
     do=0
 
-def merge_cluster(cluster: dict, bd_points: set, threshold: float):
+def merge_cluster(cluster: dict, bd_points: set, threshold: float, 
+                  minimum_labels: int = 3, merges: list = None):
     # 1. calculate weights between cells
     compute_all_weights(cluster, bd_points)
-    still_changing = True
-    minimum_labels = 3
+    # 2. create and fill Cancellation Queue with the adjacent cluster pairs
+    queue = CancellationQueue()
+    for label, comp in cluster.items():
+        for neighbor, weight in comp.neighbors_weights.items():
+            if label < neighbor and weight < threshold:
+                queue.insert((label, neighbor), weight)
+
     # pop from queue until no more elements are below the merge threshold or we reach the minimum number of labels
-    while len(cluster) > minimum_labels and still_changing: #and queue.length() != 0:
-        # 2. create and fill Cancellation Queue
-        queue = CancellationQueue()
-        before = len(cluster)
-        for label, comp in cluster.items():
-            for neighbor, weight in comp.neighbors_weights.items():
-                if weight < threshold:
-                    queue.insert(tuple((weight,label, neighbor)))
-
-        while queue.length() != 0:
-            weight, label1, label2 = queue.pop_front()
-            
-            # need to make sure the popped tuple is still available for merging and their weight is also the same.
-            if label1 in cluster.keys() and label2 in cluster.keys():
-                if label2 in cluster[label1].neighbors.keys():
-                    if weight == cluster[label1].neighbors_weights[label2]:
-                        # can merge cells
-                        updated_weights = merge_cells(cluster, bd_points, label1, label2)
-        after = len(cluster)
-        if before == after:
-            still_changing = False
+    while queue.notEmpty() and len(cluster) > minimum_labels:
+        weight, (label1, label2) = queue.pop_front()
+        if merges is not None:
+            merges.append((weight, label1, label2))
+        # the pairs of label2 vanish, the pairs of label1 get new weights
+        for neighbor in cluster[label2].neighbors.keys():
+            queue.remove(tuple(sorted((label2, neighbor))))
+        merge_cells(cluster, bd_points, label1, label2)
+        for neighbor, new_weight in cluster[label1].neighbors_weights.items():
+            if new_weight < threshold:
+                queue.update(tuple(sorted((label1, neighbor))), new_weight)
+            else:
+                queue.remove(tuple(sorted((label1, neighbor))))
 
     cluster = sort_enumerate_dict(cluster)
     return cluster
 
+def cluster_dendrogram(cluster: dict, bd_points: set) -> MergeDendrogram:
+    """! @brief Records all merges of merge_cluster (without merge threshold 
+    and until one label is left) on a copy of the cluster.
+    @return A MergeDendrogram object, cut it with cut_cluster.
+    """
+    merges = []
+    merge_cluster(deepcopy(cluster), bd_points, float("inf"), minimum_labels=1, merges=merges)
+    return MergeDendrogram(merges, len(cluster))
+
+def cut_cluster(cluster: dict, bd_points: set, dendrogram: MergeDendrogram, 
+                threshold: float = None, n_labels: int = 3) -> dict:
+    """! @brief Gives the result of merge_cluster for a threshold and/or 
+    number of labels by replaying the merges of the dendrogram on a copy of 
+    the cluster.
+    """
+    cluster = deepcopy(cluster)
+    compute_all_weights(cluster, bd_points)
+    for _, label1, label2 in dendrogram.merges[:dendrogram.n_merges(threshold, n_labels)]:
+        merge_cells(cluster, bd_points, label1, label2)
+    return sort_enumerate_dict(cluster)
+
 def sort_enumerate_dict(cluster: dict) -> dict:
     sorted_enum = {}
     for count, comp in enumerate(sorted(cluster.values(), key=lambda kv: len(kv.vertices), reverse=True)):
@@ -105,10 +129,7 @@ def sort_enumerate_dict(cluster: dict) -> dict:
     return sorted_enum
 
 def compute_weight_between_two_cells(components: dict, bd_points: set, label1: int, label2: int):
-    points1 = components[label1].neighbors[label2]
-    points2 = components[label2].neighbors[label1]
-    
-    weight = compute_weight(points1.union(points2), bd_points)
+    weight = components[label1].neighbors_counts[label2].weight()
     
     components[label1].neighbors_weights[label2] = weight
     components[label2].neighbors_weights[label1] = weight
@@ -129,6 +150,9 @@ def merge_cells(components: dict, bd_points: set, label1: int, label2: int, pop_
             continue
         # common neighbor -> adjust boundaries and recomupte weights
         elif neighbor in components[label1].neighbors.keys():
+            # points of the neighbor bordering both components are counted once
+            shared = BoundaryCounts.from_points(components[label1].neighbors[neighbor].intersection(indices), bd_points)
+            components[label1].neighbors_counts[neighbor].add(components[label2].neighbors_counts[neighbor], shared=shared)
             # extend boundaries on both sides
             components[label1].neighbors[neighbor].update(indices)
             components[neighbor].neighbors[label1].update(components[neighbor].neighbors[label2])
@@ -136,6 +160,7 @@ def merge_cells(components: dict, bd_points: set, label1: int, label2: int, pop_
             # remove label 2 from neighbor
             components[neighbor].neighbors.pop(label2)
             components[neighbor].neighbors_weights.pop(label2)
+            components[neighbor].neighbors_counts.pop(label2)
             
             # recompute weight:
             new_weight = compute_weight_between_two_cells(components, bd_points, label1, neighbor)
@@ -147,14 +172,17 @@ def merge_cells(components: dict, bd_points: set, label1: int, label2: int, pop_
             # add new neighbor to label 1 and copy weight from label 2
             components[label1].neighbors[neighbor] = indices
             components[label1].neighbors_weights[neighbor] = components[label2].neighbors_weights[neighbor]
+            components[label1].neighbors_counts[neighbor] = components[label2].neighbors_counts[neighbor]
             
             # add label 1 as new neighbor to neighbor and copy weight
             components[neighbor].neighbors[label1] = components[neighbor].neighbors[label2]
             components[neighbor].neighbors_weights[label1] = components[neighbor].neighbors_weights[label2]
+            components[neighbor].neighbors_counts[label1] = components[neighbor].neighbors_counts[label2]
             
             # remove label 2 from neighbor:
             components[neighbor].neighbors.pop(label2)
             components[neighbor].neighbors_weights.pop(label2)
+            components[neighbor].neighbors_counts.pop(label2)
             
         else:
             raise AssertionError("Shouldnt happen. One of the above cases always should be fulfilled.")
@@ -162,6 +190,7 @@ def merge_cells(components: dict, bd_points: set, label1: int, label2: int, pop_
     # remove label 2 from label 1:
     components[label1].neighbors.pop(label2)
     components[label1].neighbors_weights.pop(label2)
+    components[label1].neighbors_counts.pop(label2)
     
     # remove label 2 cell completely (optional due to dictionary size change) need to remove after looping sometimes
     if pop_label2:
@@ -170,10 +199,15 @@ def merge_cells(components: dict, bd_points: set, label1: int, label2: int, pop_
     return updated_weights
     
 def compute_all_weights(cluster: dict, bd_pts: set):
+    # the boundaries are counted once, merged boundaries add up the counts
     for seed, comp in cluster.items():
         for nei_seed, nei_points in comp.neighbors.items():
-            points_from_nei = cluster[nei_seed].neighbors[seed]
-            weight = compute_weight(points_from_nei.union(nei_points), bd_pts)
+            if nei_seed not in comp.neighbors_counts.keys():
+                points_from_nei = cluster[nei_seed].neighbors[seed]
+                counts = BoundaryCounts.from_points(points_from_nei.union(nei_points), bd_pts)
+                comp.neighbors_counts[nei_seed] = counts
+                cluster[nei_seed].neighbors_counts[seed] = counts
+            weight = comp.neighbors_counts[nei_seed].weight()
             comp.neighbors_weights[nei_seed] = weight
             cluster[nei_seed].neighbors_weights[seed] = weight
             
@@ -182,13 +216,15 @@ def compute_weight(cluster_boundary: set, edge_pts: set):
 
 def cluster_mesh(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict:
     cluster = {}
+    # labels are kept in an array of this call, the vertices are not changed
+    labels = np.full(len(vert_dict), -1, dtype=np.int64)
     
     unoccupied_vertices = [ind for ind in vert_dict.keys() if ind not in bd_pts]
 
     seeds = random.sample(unoccupied_vertices, num_seeds)
     for seed in seeds:
         cluster[seed] = Component(seed)
-        vert_dict[seed].label = seed
+        labels[seed] = seed
 
     unoccupied_vertices = set(unoccupied_vertices) - set(seeds)
 
@@ -203,9 +239,9 @@ def cluster_mesh(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict:
                 if ind in unoccupied_vertices:
                     if ind in bd_pts:
                         component.vertices.add(ind)
-                        vert_dict[ind].label = component.seed
+                        labels[ind] = component.seed
                     else:
-                        vert_dict[ind].label = component.seed
+                        labels[ind] = component.seed
                         component.vertices.add(ind)
                         component.open.append(ind)
                     unoccupied_vertices.remove(ind)
@@ -214,7 +250,7 @@ def cluster_mesh(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict:
         if len(unoccupied_vertices) == len_before and len(unoccupied_vertices - bd_pts) != 0:
             new_seed = (unoccupied_vertices - bd_pts).pop()
             cluster[new_seed] = Component(new_seed)
-            vert_dict[new_seed].label = new_seed
+            labels[new_seed] = new_seed
             unoccupied_vertices.remove(new_seed)
 
     if len(unoccupied_vertices) != 0:
@@ -227,20 +263,20 @@ def cluster_mesh(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict:
     # treat boundary points if necessary
     while len(unoccupied_vertices) != 0:
         remaining_pt = unoccupied_vertices.pop()
-        nei_labels, nei_indices = vert_dict[remaining_pt].has_neighbor_label(vert_dict)
+        nei_labels, nei_indices = neighbor_labels(remaining_pt, vert_dict, labels)
         if len(nei_labels) == 1:
             label = nei_labels.pop()
             cluster[label].vertices.add(remaining_pt)
-            vert_dict[remaining_pt].label = label
+            labels[remaining_pt] = label
         elif len(nei_labels) == 0:
             unoccupied_vertices.add(remaining_pt)
             c+=1
         elif len(nei_labels) > 1:
-            nei_labels, nei_indices = vert_dict[remaining_pt].has_neighbor_label(vert_dict)
+            nei_labels, nei_indices = neighbor_labels(remaining_pt, vert_dict, labels)
             counts = Counter(np.array(nei_indices)[:,1])
             label = counts.most_common(1)[0][0]
             cluster[label].vertices.add(remaining_pt)
-            vert_dict[remaining_pt].label = label
+            labels[remaining_pt] = label
         else:
             raise ValueError("Shouldnt happen!")
 
@@ -250,20 +286,19 @@ def cluster_mesh(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict:
     # fill neighborhoods
     fill_neighborhood(cluster, vert_dict)
 
-    # reset labels
-    for vertex in vert_dict.values():
-        vertex.label = -1
     return cluster 
 
 def cluster_mesh_old(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict:
     cluster = {}
+    # labels are kept in an array of this call, the vertices are not changed
+    labels = np.full(len(vert_dict), -1, dtype=np.int64)
     
     unoccupied_vertices = [ind for ind in vert_dict.keys() if ind not in bd_pts]
 
     seeds = random.sample(unoccupied_vertices, num_seeds)
     for seed in seeds:
         cluster[seed] = Component(seed)
-        vert_dict[seed].label = seed
+        labels[seed] = seed
 
     unoccupied_vertices = set(unoccupied_vertices) - set(seeds)
 
@@ -278,9 +313,9 @@ def cluster_mesh_old(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict
                 if ind in unoccupied_vertices:
                     if ind in bd_pts:
                         component.vertices.add(ind)
-                        vert_dict[ind].label = component.seed
+                        labels[ind] = component.seed
                     else:
-                        vert_dict[ind].label = component.seed
+                        labels[ind] = component.seed
                         component.vertices.add(ind)
                         component.open.append(ind)
                     unoccupied_vertices.remove(ind)
@@ -289,7 +324,7 @@ def cluster_mesh_old(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict
         if len(unoccupied_vertices) == len_before and len(unoccupied_vertices - bd_pts) != 0:
             new_seed = (unoccupied_vertices - bd_pts).pop()
             cluster[new_seed] = Component(new_seed)
-            vert_dict[new_seed].label = new_seed
+            labels[new_seed] = new_seed
             unoccupied_vertices.remove(new_seed)
 
     if len(unoccupied_vertices) != 0:
@@ -303,11 +338,11 @@ def cluster_mesh_old(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict
     # treat boundary points if necessary
     while len(unoccupied_vertices) != 0:
         remaining_pt = unoccupied_vertices.pop()
-        nei_labels, nei_indices = vert_dict[remaining_pt].has_neighbor_label(vert_dict)
+        nei_labels, nei_indices = neighbor_labels(remaining_pt, vert_dict, labels)
         if len(nei_labels) == 1:
             label = nei_labels.pop()
             cluster[label].vertices.add(remaining_pt)
-            vert_dict[remaining_pt].label = label
+            labels[remaining_pt] = label
         elif len(nei_labels) == 0:
             unoccupied_vertices.add(remaining_pt)
             c+=1
@@ -318,13 +353,13 @@ def cluster_mesh_old(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict
 
     while len(in_between_points) != 0:
         remaining_pt = in_between_points.pop()
-        nei_labels, nei_indices = vert_dict[remaining_pt].has_neighbor_label(vert_dict)
+        nei_labels, nei_indices = neighbor_labels(remaining_pt, vert_dict, labels)
         if -1 in nei_labels:
             nei_labels.remove(-1)
         counts = Counter(np.array(nei_indices)[:,1])
         label = counts.most_common(1)[0][0]
         cluster[label].vertices.add(remaining_pt)
-        vert_dict[remaining_pt].label = label
+        labels[remaining_pt] = label
 
     # fill boundary points
     get_boundary_points(cluster, vert_dict)
@@ -332,9 +367,6 @@ def cluster_mesh_old(vert_dict: dict, bd_pts: set, num_seeds: int = 150) -> dict
     # fill neighborhoods
     fill_neighborhood(cluster, vert_dict)
 
-    # reset labels
-    for vertex in vert_dict.values():
-        vertex.label = -1
     return cluster 
 
 def get_boundary_points(cluster: dict, vert_dict: dict):
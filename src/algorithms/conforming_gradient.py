@@ -17,7 +17,9 @@
 """
 
 from .PriorityQueue import PriorityQueue
-from .process_lower_stars import lower_star
+from .process_lower_stars import lower_star, compute_gradient_arrays
+
+import numpy as np
 
 import timeit
 
@@ -106,4 +108,25 @@ def conforming_gradient(vertices_dict, edges_dict, faces_dict, labels, C, V12, V
                     C[2].add(Findex)
 
     time_eff = timeit.default_timer() -start_eff
-    print('Time ProcessLowerStar:', time_eff)
\ No newline at end of file
+    print('Time ProcessLowerStar:', time_eff)
+def conforming_gradient_arrays(mesh_arrays, labels, C, V12, V23, n_workers=1):
+    """! @brief Array version of conforming_gradient.
+    
+    @details Uses the same lower star processing as process_lower_stars_arrays, 
+    but an edge is only paired with its vertex if both vertices have the same 
+    label, and a face is only paired with an edge if they have the same label 
+    set. Faces that are never reached become critical, as in 
+    conforming_gradient. Unlike the legacy function, vertices without a 
+    conforming edge do not reuse the paired edge of the previous vertex 
+    (the queues simply start without a paired edge).
+    
+    @param mesh_arrays The MeshArrays object (function values need to be set).
+    @param labels The user labels dictionary (needs the key 'vertices').
+    @param C The dictionary that will store all critical vertices, edges and faces.
+    @param V12 The dictionary that will store pairings between edges and vertices.
+    @param V23 The dictionary that will store pairings between faces and edges.
+    @param n_workers (Optional) Number of processes. Default is 1 (serial), 
+           None uses all cores.
+    """
+    vertex_labels = np.array([labels['vertices'][ind] for ind in range(mesh_arrays.n_vertices)])
+    compute_gradient_arrays(mesh_arrays, vertex_labels, C, V12, V23, n_workers=n_workers)
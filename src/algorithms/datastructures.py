@@ -37,13 +37,19 @@
 # @section segmentation_related Segmentation Related
 # - Cell class
 # - MorseCells class
+# - CellGraph class
+# - Segmentation class
 
 # imports
-from copy import deepcopy
+from collections import Counter
 import numpy as np
 
-from .weight_metrics import compute_weight_saledge
+from .weight_metrics import BoundaryCounts
 from .cancellation_queue import CancellationQueue
+from .paths import path_array
+from .cell_merging import MergeDendrogram
+from .separatrix_table import SeparatrixTable
+from .separatrix_persistence import separatrix_persistences, simplex_values
 
 
 class Vertex:
@@ -410,6 +416,16 @@ class CritVertex:
         
         self.connected_saddles = []
 
+    def copy(self):
+        """! @brief Gives a copy with own connection list.
+        @return A CritVertex object.
+        """
+        new = CritVertex.__new__(CritVertex)
+        new.index = self.index
+        new.fun_val = self.fun_val
+        new.connected_saddles = self.connected_saddles.copy()
+        return new
+
     def __eq__(self, other):
         """! @brief Checks if equal to another CritVertex.
         @param other Another CritVertex.
@@ -468,6 +484,20 @@ class CritEdge:
         
         self.paths = {}
 
+    def copy(self):
+        """! @brief Gives a copy with own connection lists and paths dictionary.
+        The paths themselves are shared, as they are never changed in place.
+        @return A CritEdge object.
+        """
+        new = CritEdge.__new__(CritEdge)
+        new.indices = self.indices
+        new.fun_val = self.fun_val
+        new.index = self.index
+        new.connected_minima = self.connected_minima.copy()
+        new.connected_maxima = self.connected_maxima.copy()
+        new.paths = self.paths.copy()
+        return new
+
     def __eq__(self, other):
         """! @brief Checks if equal to another CritEdge.
         @param other Another CritEdge.
@@ -530,6 +560,19 @@ class CritFace:
         
         self.paths = {}
 
+    def copy(self):
+        """! @brief Gives a copy with own connection list and paths dictionary.
+        The paths themselves are shared, as they are never changed in place.
+        @return A CritFace object.
+        """
+        new = CritFace.__new__(CritFace)
+        new.indices = self.indices
+        new.fun_val = self.fun_val
+        new.index = self.index
+        new.connected_saddles = self.connected_saddles.copy()
+        new.paths = self.paths.copy()
+        return new
+
     def __eq__(self, other):
         """! @brief Checks if equal to another CritFace.
         @param other Another CritFace.
@@ -628,14 +671,12 @@ class Separatrix:
         indices = set()
         # edge-vert separatrix -> only need to add edge indices
         if self.dimension == 1:
-            for i, elt in enumerate(self.path):
-                if i%2 == 0:
-                    indices.add(edge_dict[elt].indices)
+            for elt in path_array(self.path)[::2].tolist():
+                indices.add(edge_dict[elt].indices)
         # face-edge separatrix -> only need to add face indices        
         elif self.dimension == 2:
-            for i, elt in enumerate(self.path):
-                if i%2 == 0:
-                    indices.add(face_dict[elt].indices)
+            for elt in path_array(self.path)[::2].tolist():
+                indices.add(face_dict[elt].indices)
         return indices
         
     def __str__(self) -> str:
@@ -690,7 +731,16 @@ class MorseComplex:
     ## @var Segmentations
     # A dictionary storing different Segmentations at this persistence level. 
     # Can be accessed via .Segmentations[(large_thr, small_thr)][merge_thr] and 
-    # contains Morse Cell objects.
+    # contains Segmentation objects.
+    ## @var _cell_graph
+    # The CellGraph of the MorseCells, shared by the Segmentations 
+    # (see get_cell_graph).
+    ## @var _merge_dendrograms
+    # Dictionary (large_thr, small_thr) -> MergeDendrogram of the cells, 
+    # from which the Segmentations for all merge thresholds are cut.
+    ## @var _separatrix_tables
+    # Dictionary separatrix type -> SeparatrixTable of the separatrices 
+    # (see get_separatrix_table).
     ## @var _flag_BettiNumbers
     # Boolean wether the Betti numbers have been calculated or not.
     ## @var BettiNumbers
@@ -706,10 +756,14 @@ class MorseComplex:
     # The persistence level up to which this complex has been reduced to.
     ## @var filename
     # The filenmae of the underlying mesh.
+    ## @var _owned_cells
+    # None if all critical cells belong to this complex. Otherwise a set of 
+    # (dimension, index) tuples of the critical cells that are not shared 
+    # with another complex (see copy_on_write).
     
-    __slots__ = ("CritVertices", "CritEdges", "CritFaces", "Separatrices", 
-                 "_flag_MorseCells", "MorseCells", "Segmentations", 
-                 "_flag_BettiNumbers", "BettiNumbers", "partners", 
+    __slots__ = ("CritVertices", "CritEdges", "CritFaces", "Separatrices", "_owned_cells",
+                 "_flag_MorseCells", "MorseCells", "Segmentations", "_cell_graph", "_merge_dendrograms", 
+                 "_separatrix_tables", "_flag_BettiNumbers", "BettiNumbers", "partners", 
                  "maximalReduced", "max_separatrix_persistence", 
                  "min_separatrix_persistence", "persistence", "filename",
                  "Separatrices_cutoff", "Separatrices_reversed")
@@ -732,6 +786,9 @@ class MorseComplex:
         self.MorseCells = MorseCells()
         
         self.Segmentations = {}
+        self._cell_graph = None
+        self._merge_dendrograms = {}
+        self._separatrix_tables = {}
         
         self._flag_BettiNumbers = False
         self.BettiNumbers = None
@@ -742,7 +799,73 @@ class MorseComplex:
         self.min_separatrix_persistence = None
         self.persistence = persistence
         self.filename = filename
+
+        self._owned_cells = None
         
+    def copy_on_write(self, persistence: float = None):
+        """! @brief Gives a copy of this complex that shares the critical cells 
+        with this complex until they are changed.
+        
+        @details Only the dictionaries and separatrix lists are copied. The 
+        critical cell objects are copied when they are first requested via 
+        writable_vertex, writable_edge or writable_face, so e.g. a reduction 
+        only copies the cells it changes. Afterwards, the cells of this 
+        complex are treated as shared as well, so changing them also requires 
+        the writable accessors. Morse cells, segmentations and Betti numbers 
+        are not copied.
+        
+        @param persistence (Optional) The persistence of the new complex. 
+               Default is the persistence of this complex.
+        
+        @return A MorseComplex object.
+        """
+        new = MorseComplex(persistence=self.persistence if persistence is None else persistence,
+                           filename=self.filename)
+        new.CritVertices = self.CritVertices.copy()
+        new.CritEdges = self.CritEdges.copy()
+        new.CritFaces = self.CritFaces.copy()
+        new.Separatrices = self.Separatrices.copy()
+        new.Separatrices_cutoff = self.Separatrices_cutoff.copy()
+        new.Separatrices_reversed = self.Separatrices_reversed.copy()
+        new.maximalReduced = self.maximalReduced
+        new.max_separatrix_persistence = self.max_separatrix_persistence
+        new.min_separatrix_persistence = self.min_separatrix_persistence
+        new._owned_cells = set()
+        self._owned_cells = set()
+        return new
+
+    def _writable(self, cells: dict, dim: int, index: int):
+        if self._owned_cells is None or (dim, index) in self._owned_cells:
+            return cells[index]
+        cell = cells[index].copy()
+        cells[index] = cell
+        self._owned_cells.add((dim, index))
+        return cell
+
+    def writable_vertex(self, index: int):
+        """! @brief Gives the critical vertex with this index, such that it can 
+        be changed without changing other complexes (see copy_on_write).
+        @param index The index of the critical vertex.
+        @return The CritVertex object.
+        """
+        return self._writable(self.CritVertices, 0, index)
+
+    def writable_edge(self, index: int):
+        """! @brief Gives the critical edge with this index, such that it can 
+        be changed without changing other complexes (see copy_on_write).
+        @param index The index of the critical edge.
+        @return The CritEdge object.
+        """
+        return self._writable(self.CritEdges, 1, index)
+
+    def writable_face(self, index: int):
+        """! @brief Gives the critical face with this index, such that it can 
+        be changed without changing other complexes (see copy_on_write).
+        @param index The index of the critical face.
+        @return The CritFace object.
+        """
+        return self._writable(self.CritFaces, 2, index)
+
     def add_vertex(self, vert: Vertex):
         """! @brief Adds a critical vertex to the Morse Complex.
         @param vert A Vertex class object.
@@ -759,12 +882,19 @@ class MorseComplex:
                             size_threshold: int = 500,
                             conforming=False, 
                             UserLabels=None,
-                            plotting=False):
+                            plotting=False,
+                            n_vertices: int = None,
+                            salient_mask: np.ndarray = None,
+                            separatrix_type: str = "all",
+                            vertex_user_labels: np.ndarray = None):
         """! @brief Creates a segmentation from this MorseComplex with 
         the given double edge threshold and the merging threshold.
         
-        @details Creates a copy of the Morse cells at this persistence 
-        level and than segments based on the given parameters. Segemntation 
+        @details Merges the cells of the CellGraph of the Morse cells at this 
+        persistence level based on the given parameters (cut from the 
+        MergeDendrogram of the salient edge points, or merged on temporary 
+        MorseCells for conforming segmentations and plotting) and stores the 
+        result as Segmentation (a relabelling of the cells). Segemntation 
         stops when either no more cells can be merged due to no more adjacent 
         cells having a weight below the merge threshold, or reaching the 
         optional minimum number of labels (which is defaulted to 3).
@@ -780,53 +910,188 @@ class MorseComplex:
                Morse cells will be above this threshold.
         @param minimum_labels The minimum number of labels we want to keep. 
                Default is set to 3
+        @param n_vertices (Optional) The number of vertices of the mesh, 
+               used for the CellGraph.
+        @param salient_mask (Optional) Boolean numpy array over the vertices, 
+               True for the salient edge points (e.g. from ridge_detection).
+        @param separatrix_type (Optional) The separatrices the salient edge 
+               points were computed from, part of the key of the cached 
+               MergeDendrogram. Default is "all".
+        @param vertex_user_labels (Optional) Numpy array with the user label 
+               of every vertex, used for conforming segmentations.
+        
+        @return The Segmentation object.
         """
         if self._flag_MorseCells == False:
             raise AssertionError("No Morse Cells calculated yet...")
-        SegmentationCells = deepcopy(self.MorseCells)
-        
-        SegmentationCells.add_salient_edge_points(salient_edge_points, 
-                                                  (thresh_large, thresh_small))
-        
-        SegmentationCells.segment(merge_threshold, 
-                                  minimum_labels=minimum_labels, 
-                                  size_threshold=size_threshold, 
-                                  conforming=conforming, 
-                                  UserLabels=UserLabels,
-                                  plotting=plotting)
+        if (thresh_large, thresh_small) in self.Segmentations.keys():
+            if merge_threshold in self.Segmentations[(thresh_large, thresh_small)].keys():
+                raise AssertionError("This parameter combination "
+                                     "has already been calculated...")
+        cell_graph = self.get_cell_graph(n_vertices=n_vertices)
+        if conforming or plotting:
+            # the merging works on temporary cells, only the relabelling is kept
+            SegmentationCells = cell_graph.to_morse_cells()
+            SegmentationCells.add_salient_edge_points(salient_edge_points, 
+                                                      (thresh_large, thresh_small), 
+                                                      salient_mask=salient_mask)
+            SegmentationCells.segment(merge_threshold, 
+                                      minimum_labels=minimum_labels, 
+                                      size_threshold=size_threshold, 
+                                      conforming=conforming, 
+                                      UserLabels=UserLabels,
+                                      plotting=plotting,
+                                      vertex_user_labels=vertex_user_labels)
+            relabel = Segmentation.from_morse_cells(cell_graph, SegmentationCells).relabel
+        else:
+            dendrogram = self.get_merge_dendrogram(salient_edge_points, thresh_large, thresh_small, 
+                                                   n_vertices=n_vertices, salient_mask=salient_mask, 
+                                                   separatrix_type=separatrix_type)
+            relabel = dendrogram.cut(merge_threshold, n_labels=minimum_labels, 
+                                     size_threshold=size_threshold)
+            salient_mask = dendrogram.salient_mask
         
         if (thresh_large, thresh_small) not in self.Segmentations.keys():
             self.Segmentations[(thresh_large, thresh_small)] = {}
-        if merge_threshold in self.Segmentations[(thresh_large, thresh_small)].keys():
-            raise AssertionError("This parameter combination "
-                                 "has already been calculated...")
-        else:
-            self.Segmentations[(thresh_large, thresh_small)][merge_threshold] = SegmentationCells
-            
+        self.Segmentations[(thresh_large, thresh_small)][merge_threshold] = Segmentation(
+            cell_graph, 
+            relabel, 
+            salient_mask=salient_mask, 
+            threshold=(thresh_large, thresh_small), 
+            merge_threshold=merge_threshold)
+        return self.Segmentations[(thresh_large, thresh_small)][merge_threshold]
+    
+    def get_merge_dendrogram(self, 
+                             salient_edge_points: set, 
+                             thresh_large: float, 
+                             thresh_small: float, 
+                             n_vertices: int = None, 
+                             salient_mask: np.ndarray = None, 
+                             separatrix_type: str = "all") -> MergeDendrogram:
+        """! @brief Gives the MergeDendrogram of the Morse cells of this 
+        complex for the salient edge points of a double threshold. It is 
+        computed on the first call for these thresholds and separatrix type 
+        and computed again if the salient edge points differ from the ones 
+        of the cached dendrogram.
+        @param salient_edge_points The salient edge points of the double threshold.
+        @param thresh_large The larger threshold of the double threshold.
+        @param thresh_small The smaller threshold of the double threshold.
+        @param n_vertices (Optional) The number of vertices of the mesh.
+        @param salient_mask (Optional) Boolean numpy array over the vertices, 
+               True for the salient edge points. Built from the salient edge 
+               points if not given.
+        @param separatrix_type (Optional) The separatrices the salient edge 
+               points were computed from. Default is "all".
+        @return The MergeDendrogram object.
+        """
+        cell_graph = self.get_cell_graph(n_vertices=n_vertices)
+        if salient_mask is None:
+            salient_mask = np.zeros(len(cell_graph.labels), dtype=bool)
+            salient_mask[np.fromiter(salient_edge_points, dtype=np.int64, 
+                                     count=len(salient_edge_points))] = True
+        key = (thresh_large, thresh_small, separatrix_type)
+        dendrogram = self._merge_dendrograms.get(key)
+        if (dendrogram is None or dendrogram.cell_graph is not cell_graph 
+            or (dendrogram.salient_mask is not salient_mask 
+                and not np.array_equal(dendrogram.salient_mask, salient_mask))):
+            dendrogram = MergeDendrogram.from_cell_graph(cell_graph, salient_mask)
+            self._merge_dendrograms[key] = dendrogram
+        return dendrogram
+    
+    def get_cell_graph(self, n_vertices: int = None):
+        """! @brief Gives the CellGraph of the Morse cells of this complex. 
+        It is created on the first call and shared by all segmentations.
+        @param n_vertices (Optional) The number of vertices of the mesh.
+        @return The CellGraph object.
+        """
+        if self._flag_MorseCells == False:
+            raise AssertionError("No Morse Cells calculated yet...")
+        if self._cell_graph is None or self._cell_graph.source is not self.MorseCells:
+            self._cell_graph = CellGraph(self.MorseCells, n_vertices=n_vertices)
+        return self._cell_graph
+    
+    def get_separatrix_table(self, separatrix_type: str, mesh_arrays) -> SeparatrixTable:
+        """! @brief Gives the SeparatrixTable of the separatrices of this 
+        complex. It is created on the first call and whenever the separatrices 
+        changed.
+        @param separatrix_type The separatrices to include: all ("all"), only 
+               the ones that were cut off ("cutoff"), or only the ones that 
+               were reversed ("reverse").
+        @param mesh_arrays The MeshArrays object of the mesh.
+        @return The SeparatrixTable object.
+        """
+        attr_map = {
+            "all": "Separatrices",
+            "cutoff": "Separatrices_cutoff",
+            "reverse": "Separatrices_reversed"
+        }
+        separatrices = getattr(self, attr_map[separatrix_type])
+        table = self._separatrix_tables.get(separatrix_type)
+        if table is None or not table.is_current(separatrices):
+            table = SeparatrixTable(separatrices, mesh_arrays.edges, mesh_arrays.faces)
+            self._separatrix_tables[separatrix_type] = table
+        return table
+        
     def change_separatrix_persistences(self, 
                                        vert_dict: dict, 
                                        edge_dict: dict, 
-                                       face_dict: dict):
-        updated_separatrices = []
-        for _, sepa in self.Separatrices:
-            if sepa.dimension == 1:
-                v_ind_high = edge_dict[sepa.origin].max_fun_val_index
-                v_ind_low = sepa.destination
-            elif sepa.dimension == 2:
-                v_ind_high = face_dict[sepa.origin].max_fun_val_index
-                v_ind_low = edge_dict[sepa.destination].max_fun_val_index
-            else:
-                raise ValueError("Separatrix should have dimension 1 or 2!")
+                                       face_dict: dict, 
+                                       mesh_arrays=None, 
+                                       definition: str = "start_end_average"):
+        """! @brief Replaces the separatrix persistences by another definition.
+        @param vert_dict The dictionary of Vertex objects.
+        @param edge_dict The dictionary of Simplex objects of the edges.
+        @param face_dict The dictionary of Simplex objects of the faces.
+        @param mesh_arrays (Optional) The MeshArrays object of the mesh. If 
+               given, the persistences are computed in bulk (see 
+               separatrix_persistences).
+        @param definition (Optional) The persistence definition (see 
+               PERSISTENCE_DEFINITIONS), other than "start_end_average" only 
+               with mesh_arrays. Default is "start_end_average", the average 
+               function value of the highest vertices of start and end.
+        
+        @details The separatrices of this complex are replaced by new 
+        Separatrix objects, other complexes sharing the old ones keep their 
+        persistences.
+        """
+        separatrices = [sepa for _, sepa in self.Separatrices]
+        if mesh_arrays is not None:
+            persistences = separatrix_persistences(separatrices, 
+                                                   simplex_values(mesh_arrays), 
+                                                   definitions=(definition,))[definition].tolist()
+        elif definition != "start_end_average":
+            raise ValueError("Persistence definition " + str(definition) 
+                             + " needs the mesh arrays!")
+        else:
+            persistences = []
+            for sepa in separatrices:
+                if sepa.dimension == 1:
+                    v_ind_high = edge_dict[sepa.origin].max_fun_val_index
+                    v_ind_low = sepa.destination
+                elif sepa.dimension == 2:
+                    v_ind_high = face_dict[sepa.origin].max_fun_val_index
+                    v_ind_low = edge_dict[sepa.destination].max_fun_val_index
+                else:
+                    raise ValueError("Separatrix should have dimension 1 or 2!")
 
-            # new metric: average function value between start and finish
-            new_sepa_persistence = ((vert_dict[v_ind_high].fun_val 
+                # new metric: average function value between start and finish
+                persistences.append((vert_dict[v_ind_high].fun_val 
                                      + vert_dict[v_ind_low].fun_val) / 2)
-            sepa.separatrix_persistence = new_sepa_persistence
-            updated_separatrices.append(tuple((new_sepa_persistence, sepa)))
 
-        self.Separatrices = updated_separatrices
+        # the Separatrix objects can be shared with copies of this complex and 
+        # the persistence hierarchy, so this complex gets new ones
+        changed = {}
+        for persistence, sepa in zip(persistences, separatrices):
+            changed[id(sepa)] = Separatrix(sepa.origin, sepa.destination, sepa.dimension, 
+                                           sepa.path, persistence)
+        self.Separatrices = [(persistence, changed[id(sepa)]) 
+                             for persistence, sepa in zip(persistences, separatrices)]
+        # the cutoff and reversed lists contain the same Separatrix objects
+        self.Separatrices_cutoff = [(changed[id(sepa)].separatrix_persistence, changed[id(sepa)]) 
+                                    for _, sepa in self.Separatrices_cutoff]
+        self.Separatrices_reversed = [(changed[id(sepa)].separatrix_persistence, changed[id(sepa)]) 
+                                      for _, sepa in self.Separatrices_reversed]
 
-        persistences = [pers for pers, _ in self.Separatrices]
         self.max_separatrix_persistence = max(persistences)
         self.min_separatrix_persistence = min(persistences)
         
@@ -868,8 +1133,17 @@ class Cell:
     ## @var neighbors_weights
     # A dictionary storing neighbor_label, weight pairs, where the weight 
     # gives the weight for the connection between these two cells.
+    ## @var neighbors_counts
+    # A dictionary storing neighbor_label, BoundaryCounts pairs, the 
+    # (salient) point counts of the boundary the weight is computed from. 
+    # Shared with the neighbor cell.
+    ## @var user_label_counts
+    # None or a tuple of two Counters user label -> number of interior and 
+    # boundary vertices with this label. Kept up to date when cells are 
+    # merged (see MorseCells.count_user_labels).
     
-    __slots__ = ("label", "vertices", "boundary", "neighbors", "neighbors_weights")
+    __slots__ = ("label", "vertices", "boundary", "neighbors", "neighbors_weights", 
+                 "neighbors_counts", "user_label_counts")
     
     def __init__(self, label: int):
         """! @brief The constructor of a Cell object.
@@ -882,8 +1156,13 @@ class Cell:
         
         self.neighbors = {}
         self.neighbors_weights = {}
+        self.neighbors_counts = {}
+        self.user_label_counts = None
 
     def getUserLabels(self, UserLabels):
+        if self.user_label_counts is not None:
+            interior, boundary = self.user_label_counts
+            return {'interior': interior, 'boundary': boundary, 'all': interior.keys() | boundary.keys()}
         labels = {'interior': {}, 'boundary': {}, 'all': set()}
         for v in self.vertices:
             label = UserLabels['vertices'][v]
@@ -920,13 +1199,20 @@ class MorseCells:
     # A dictionary of Cell objects, with the labels as keys.
     ## @var salient_edge_points
     # Edge points that are used for further segmentation.
+    ## @var salient_mask
+    # None or a boolean numpy array over the vertices, True for the salient 
+    # edge points.
     ## @var threshold
     # Double threshold that was used to get these edge points. 
     # A tuple of (large_thr, small_thr).
     ## @var merge_threshold
     # The merge threhsold that was used in the segmentation.
+    ## @var vertex_user_labels
+    # None or a numpy array with the user label of every vertex, used for 
+    # the user label counts of the cells (see count_user_labels).
     
-    __slots__ = ("Cells", "salient_edge_points", "threshold", "merge_threshold")
+    __slots__ = ("Cells", "salient_edge_points", "salient_mask", "threshold", "merge_threshold", 
+                 "vertex_user_labels")
     
     def __init__(self):
         """! @brief The constructor of the MorseCells object.
@@ -935,14 +1221,60 @@ class MorseCells:
         
         # only for segmentation cells:
         self.salient_edge_points = None # will be set of indices
+        self.salient_mask = None
         self.threshold = None # will be tuple of (large_thr, small_thr)
         
         self.merge_threshold = None # stores the merge threshold, is a float
+        self.vertex_user_labels = None
+        
+    def count_user_labels(self, vertex_user_labels: np.ndarray):
+        """! @brief Counts the user labels of the interior and boundary 
+        vertices of every cell (see Cell.getUserLabels).
+        
+        @details The counts are stored in the cells and updated when cells 
+        are merged, so the conforming weights do not need to iterate over 
+        the vertices of the cells again.
+        
+        @param vertex_user_labels Numpy array with the user label of every 
+               vertex (see Mesh.VertexUserLabels).
+        
+        Raises a KeyError with the vertex index if a vertex of the cells has 
+        no user label (-1), as the lookup in Cell.getUserLabels does.
+        """
+        self.vertex_user_labels = vertex_user_labels
+        for cell in self.Cells.values():
+            cell.user_label_counts = (self._user_label_counter(cell.vertices - cell.boundary), 
+                                      self._user_label_counter(cell.boundary))
+    
+    def _user_label_counter(self, vertices) -> Counter:
+        indices = np.fromiter(vertices, dtype=np.int64, count=len(vertices))
+        vertex_labels = self.vertex_user_labels[indices]
+        unlabelled = vertex_labels == -1
+        if unlabelled.any():
+            raise KeyError(int(indices[np.argmax(unlabelled)]))
+        labels, counts = np.unique(vertex_labels, return_counts=True)
+        return Counter(dict(zip(labels.tolist(), counts.tolist())))
+    
+    def _merge_user_label_counts(self, label1: int, label2: int, to_interior: set):
+        """! @brief Adds the user label counts of label2 to label1 and counts 
+        the given boundary vertices as interior instead.
+        """
+        cell1, cell2 = self.Cells[label1], self.Cells[label2]
+        if cell1.user_label_counts is None or cell2.user_label_counts is None:
+            cell1.user_label_counts = None
+            return
+        interior = cell1.user_label_counts[0] + cell2.user_label_counts[0]
+        boundary = cell1.user_label_counts[1] + cell2.user_label_counts[1]
+        moved = self._user_label_counter(to_interior)
+        interior.update(moved)
+        boundary.subtract(moved)
+        cell1.user_label_counts = (interior, +boundary)
         
         
     def add_salient_edge_points(self, 
                                 salient_edge_points: set, 
-                                threshold: tuple[float, float]):
+                                threshold: tuple[float, float], 
+                                salient_mask: np.ndarray = None):
         """! @brief Adds salient edge points for a given threshold to this 
         MorseCells object.
         
@@ -950,6 +1282,8 @@ class MorseCells:
                use for further segmentation.
         @param threshold The double threshold that was used to get these edge points. 
                A tuple of (large_thr, small_thr).
+        @param salient_mask (Optional) The salient edge points as boolean 
+               numpy array over the vertices (e.g. from ridge_detection).
         """
         if self.salient_edge_points != None:
             raise AssertionError("This MorseCell object already "
@@ -959,6 +1293,7 @@ class MorseCells:
                                  "a threshold (but probably no salient "
                                  "edge points) shouldnt be possible...")
         self.salient_edge_points = salient_edge_points
+        self.salient_mask = salient_mask
         self.threshold = threshold
         
     def add_cell(self, cell: Cell):
@@ -1026,40 +1361,38 @@ class MorseCells:
         self.Cells[label1].neighbors[label2].add(v2)
         
     def calculate_all_weights(self, conforming=False, UserLabels=None):
-        """! @brief Calculate all weights between neighboring cells. """
+        """! @brief Calculate all weights between neighboring cells. 
+        
+        @details Counts the (salient) points of every boundary once, the 
+        counts are then added up when cells are merged. Uses the salient 
+        mask if one was given with the salient edge points.
+        """
         for label, cell in self.Cells.items():
             for nei_label, points_here in cell.neighbors.items():
-                # need points on both sides of the bopundary
-                points_there = self.Cells[nei_label].neighbors[label]
-
-                if conforming:
-                    ulabels_here = cell.getUserLabels(UserLabels)
-                    ulabels_there = self.Cells[nei_label].getUserLabels(UserLabels)
-                    if ulabels_here['all'].isdisjoint(ulabels_there['all']):
-                        weight = float('inf')
-                    else:
-                        if ulabels_here['interior']:
-                            d_here = ulabels_here['interior']
-                        else:
-                            d_here = ulabels_here['boundary']
-
-                        if ulabels_there['interior']:
-                            d_there = ulabels_there['interior']
-                        else:
-                            d_there = ulabels_there['boundary']
-
-                        if max(d_here, key = d_here.get) == max(d_there, key = d_there.get) and max(d_here, key = d_here.get) in UserLabels['crit']:
-                            weight = float('-inf')
-                        elif max(d_here, key = d_here.get) != max(d_there, key = d_there.get):
-                            weight = float('inf')
-                        else:
-                            weight = compute_weight_saledge(points_here.union(points_there), self.salient_edge_points)
-                else:
-                    weight = compute_weight_saledge(points_here.union(points_there), self.salient_edge_points)
-                # add weight to both cells
-                cell.neighbors_weights[nei_label] = weight
-                self.Cells[nei_label].neighbors_weights[label] = weight
+                if nei_label not in cell.neighbors_counts.keys():
+                    # need points on both sides of the bopundary
+                    points_there = self.Cells[nei_label].neighbors[label]
+                    counts = self.count_boundary_points(points_here.union(points_there))
+                    cell.neighbors_counts[nei_label] = counts
+                    self.Cells[nei_label].neighbors_counts[label] = counts
+                
+                self.calculate_weight_between_two_cells(label, 
+                                                        nei_label, 
+                                                        conforming=conforming, 
+                                                        UserLabels=UserLabels)
                 
+    def count_boundary_points(self, points: set) -> BoundaryCounts:
+        """! @brief Counts the (salient) points of a boundary. Uses the 
+        salient mask if one was given with the salient edge points.
+        
+        @param points The points of the boundary.
+        
+        @return A BoundaryCounts object.
+        """
+        if self.salient_mask is not None:
+            return BoundaryCounts.from_mask(points, self.salient_mask)
+        return BoundaryCounts.from_points(points, self.salient_edge_points)
+    
     def calculate_weight_between_two_cells(self, label1, label2, conforming=False, UserLabels=None):
         """! @brief Calculate weights between two adjacent labels.
         
@@ -1068,8 +1401,7 @@ class MorseCells:
         
         @return weight The calculated weight between the two cells.
         """
-        points1 = self.Cells[label1].neighbors[label2]
-        points2 = self.Cells[label2].neighbors[label1]
+        counts = self.Cells[label1].neighbors_counts[label2]
         
         if conforming:
             ulabels1 = self.Cells[label1].getUserLabels(UserLabels)
@@ -1092,9 +1424,9 @@ class MorseCells:
                 elif max(d_here, key = d_here.get) != max(d_there, key = d_there.get):
                     weight = float('inf')
                 else:
-                    weight = compute_weight_saledge(points1.union(points2), self.salient_edge_points)
+                    weight = counts.weight()
         else:
-            weight = compute_weight_saledge(points1.union(points2), self.salient_edge_points)
+            weight = counts.weight()
         
         self.Cells[label1].neighbors_weights[label2] = weight
         self.Cells[label2].neighbors_weights[label1] = weight
@@ -1137,9 +1469,9 @@ class MorseCells:
         self.Cells[label1].vertices.update(self.Cells[label2].vertices)
         self.Cells[label1].boundary.update(self.Cells[label2].boundary)
         # remove boundary between the two
-        self.Cells[label1].boundary = (self.Cells[label1].boundary - 
-                                       (self.Cells[label1].neighbors[label2]
-                                        .union(self.Cells[label2].neighbors[label1])))
+        between = self.Cells[label1].neighbors[label2].union(self.Cells[label2].neighbors[label1])
+        self._merge_user_label_counts(label1, label2, self.Cells[label1].boundary.intersection(between))
+        self.Cells[label1].boundary = self.Cells[label1].boundary - between
         
         # iterate over neighbors of label2:
         for neighbor, indices in self.Cells[label2].neighbors.items():
@@ -1147,6 +1479,10 @@ class MorseCells:
                 continue
             # common neighbor -> adjust boundaries and recomupte weights
             elif neighbor in self.Cells[label1].neighbors.keys():
+                # points of the neighbor bordering both cells are counted once
+                shared = self.count_boundary_points(self.Cells[label1].neighbors[neighbor].intersection(indices))
+                self.Cells[label1].neighbors_counts[neighbor].add(self.Cells[label2].neighbors_counts[neighbor], 
+                                                                  shared=shared)
                 # extend boundaries on both sides
                 self.Cells[label1].neighbors[neighbor].update(indices)
                 self.Cells[neighbor].neighbors[label1].update(self.Cells[neighbor].neighbors[label2])
@@ -1154,6 +1490,7 @@ class MorseCells:
                 # remove label 2 from neighbor
                 self.Cells[neighbor].neighbors.pop(label2)
                 self.Cells[neighbor].neighbors_weights.pop(label2)
+                self.Cells[neighbor].neighbors_counts.pop(label2)
                 
                 # recompute weight:
                 new_weight = self.calculate_weight_between_two_cells(label1, neighbor, conforming=conforming, UserLabels=UserLabels)
@@ -1165,14 +1502,17 @@ class MorseCells:
                 # add new neighbor to label 1 and copy weight from label 2
                 self.Cells[label1].neighbors[neighbor] = indices
                 self.Cells[label1].neighbors_weights[neighbor] = self.Cells[label2].neighbors_weights[neighbor]
+                self.Cells[label1].neighbors_counts[neighbor] = self.Cells[label2].neighbors_counts[neighbor]
                 
                 # add label 1 as new neighbor to neighbor and copy weight
                 self.Cells[neighbor].neighbors[label1] = self.Cells[neighbor].neighbors[label2]
                 self.Cells[neighbor].neighbors_weights[label1] = self.Cells[neighbor].neighbors_weights[label2]
+                self.Cells[neighbor].neighbors_counts[label1] = self.Cells[neighbor].neighbors_counts[label2]
                 
                 # remove label 2 from neighbor:
                 self.Cells[neighbor].neighbors.pop(label2)
                 self.Cells[neighbor].neighbors_weights.pop(label2)
+                self.Cells[neighbor].neighbors_counts.pop(label2)
                 
             else:
                 raise AssertionError("Shouldnt happen. One of the above "
@@ -1181,6 +1521,7 @@ class MorseCells:
         # remove label 2 from label 1:
         self.Cells[label1].neighbors.pop(label2)
         self.Cells[label1].neighbors_weights.pop(label2)
+        self.Cells[label1].neighbors_counts.pop(label2, None)
         
         # remove label 2 cell completely (optional due to dictionary size change) 
         # need to remove after looping sometimes
@@ -1205,10 +1546,12 @@ class MorseCells:
                 # just have to add vertices, as boundary will vanish once 
                 # merged (and boundary is contained in vertices)
                 self.Cells[neighbor].vertices.update(cell.vertices)
+                self._merge_user_label_counts(neighbor, label, cell.boundary)
                 
                 # remove enclosure from neighborhood of surrounding
                 self.Cells[neighbor].neighbors.pop(label)
                 self.Cells[neighbor].neighbors_weights.pop(label)
+                self.Cells[neighbor].neighbors_counts.pop(label, None)
                 
                 # remove enclosure completely (outside the dictionary loop, 
                 # cause cant change dictionary size)
@@ -1244,7 +1587,8 @@ class MorseCells:
                 size_threshold: int = 500, 
                 conforming = False, 
                 UserLabels=None,
-                plotting=False):
+                plotting=False,
+                vertex_user_labels: np.ndarray = None):
         """! @brief Makes this MorseCells object a Segmentation, based 
         on the salient edge points stored in this MorseCells object 
         and a given merge_threshold and minim_labels number.
@@ -1253,6 +1597,7 @@ class MorseCells:
         points. Based on those, the weights between neighboring cells 
         are calculated and then cells are merged using a Priority Queue 
         to make sure to merge cells first if they have a low weight. 
+        The weights of a merged cell are updated in the queue right away.
         Merging stops if either no more cell adjacencies have a weight 
         below the threshold or the minimum number of labels is 
         reached. This MorseCell object then becomes the segmentation.
@@ -1262,6 +1607,9 @@ class MorseCells:
         @param minimum_labels A minimum number of labels that will 
                stop the merging process if it is reached. (Otherwise 
                the merge threshold is the stopping criterium)
+        @param vertex_user_labels (Optional) Numpy array with the user label 
+               of every vertex (see Mesh.VertexUserLabels), used to count the 
+               user labels of the cells for conforming segmentations.
         """
         if self.salient_edge_points == None or self.threshold == None:
             raise AssertionError("Cannot segment if no salient edge "
@@ -1272,38 +1620,35 @@ class MorseCells:
                                  "order of functions somewhere.")
            
         # 1. calculate weights between cells
+        if conforming and vertex_user_labels is not None:
+            self.count_user_labels(vertex_user_labels)
         self.calculate_all_weights(conforming=conforming, UserLabels=UserLabels)
 
-        still_changing = True
+        # 2. create and fill Cancellation Queue with the adjacent cell pairs
+        queue = CancellationQueue()
+        for label, cell in self.Cells.items():
+            for neighbor, weight in cell.neighbors_weights.items():
+                if label < neighbor and weight < merge_threshold:
+                    queue.insert((label, neighbor), weight)
+
         # pop from queue until no more elements are below the merge threshold 
         # or we reach the minimum number of labels
         step_counter = 0
-        while len(self.Cells) > minimum_labels and still_changing:
-            # 2. create and fill Cancellation Queue
-            queue = CancellationQueue()
-            before = len(self.Cells)
-            for label, cell in self.Cells.items():
-                for neighbor, weight in cell.neighbors_weights.items():
-                    if weight < merge_threshold:
-                        queue.insert(tuple((weight,label, neighbor)))
-
-            while queue.length() != 0:
-                weight, label1, label2 = queue.pop_front()
-                
-                # need to make sure the popped tuple is still available 
-                # for merging and their weight is also the same.
-                if label1 in self.Cells.keys() and label2 in self.Cells.keys():
-                    if label2 in self.Cells[label1].neighbors.keys():
-                        if weight == self.Cells[label1].neighbors_weights[label2]:
-                            # can merge cells
-                            updated_weights = self.merge_cells(label1, label2, conforming=conforming, UserLabels=UserLabels)
-                            if plotting:
-                                if step_counter % 50 == 0:
-                                    write_labels_txt_file(self.Cells, "./test_plot/step_"+str(step_counter))
-                            step_counter+=1 # add 1 after check to include step 0
-            after = len(self.Cells)
-            if before == after:
-                still_changing = False
+        while queue.notEmpty() and len(self.Cells) > minimum_labels:
+            weight, (label1, label2) = queue.pop_front()
+            # the pairs of label2 vanish, the pairs of label1 get new weights
+            for neighbor in self.Cells[label2].neighbors.keys():
+                queue.remove(tuple(sorted((label2, neighbor))))
+            self.merge_cells(label1, label2, conforming=conforming, UserLabels=UserLabels)
+            for neighbor, new_weight in self.Cells[label1].neighbors_weights.items():
+                if new_weight < merge_threshold:
+                    queue.update(tuple(sorted((label1, neighbor))), new_weight)
+                else:
+                    queue.remove(tuple(sorted((label1, neighbor))))
+            if plotting:
+                if step_counter % 50 == 0:
+                    write_labels_txt_file(self.Cells, "./test_plot/step_"+str(step_counter))
+            step_counter+=1 # add 1 after check to include step 0
 
         if plotting:
             write_labels_txt_file(self.Cells, "./test_plot/step_"+str(step_counter))
@@ -1318,6 +1663,202 @@ class MorseCells:
         if plotting:
             write_labels_txt_file(self.Cells, "./test_plot/step_"+str(step_counter))
 
+class CellGraph:
+    """! @brief A compact representation of Morse cells: a vertex label array 
+    and the region adjacency graph of the cells.
+    
+    @details The adjacencies and the vertices bordering each adjacency are 
+    stored in CSR form, indexed by the cell labels. A Segmentation only 
+    stores a relabelling of the cells on top of a shared CellGraph, so 
+    several segmentations of the same Morse cells do not copy the cells.
+    """
+    ## @var labels
+    # Numpy int32 array with the cell label of every vertex (-1 if unlabelled).
+    ## @var n_labels
+    # The largest cell label, arrays indexed by label have n_labels+1 entries.
+    ## @var sizes
+    # Numpy array with the number of vertices of each cell.
+    ## @var adj_ptr
+    # CSR pointer array of the adjacencies of each cell.
+    ## @var adj_idx
+    # The neighboring labels of each cell, in the order of Cell.neighbors.
+    ## @var contact_ptr
+    # CSR pointer array of the bordering vertices of each adjacency.
+    ## @var contact_idx
+    # The vertices of the neighbor bordering the cell for each adjacency 
+    # (the sets Cell.neighbors[neighbor]).
+    ## @var source
+    # The MorseCells object the graph was created from.
+    
+    __slots__ = ("labels", "n_labels", "sizes", "adj_ptr", "adj_idx", 
+                 "contact_ptr", "contact_idx", "source")
+    
+    def __init__(self, morse_cells: MorseCells, n_vertices: int = None):
+        """! @brief Creates the CellGraph of some Morse cells.
+        @param morse_cells A MorseCells object.
+        @param n_vertices (Optional) The number of vertices of the mesh. 
+               Default is None, which uses the largest vertex index + 1.
+        """
+        self.source = morse_cells
+        self.n_labels = max(morse_cells.Cells.keys(), default=0)
+        if n_vertices is None:
+            n_vertices = max((max(cell.vertices) for cell in morse_cells.Cells.values() 
+                              if cell.vertices), default=-1) + 1
+        
+        self.labels = np.full(n_vertices, -1, dtype=np.int32)
+        adj_counts = np.zeros(self.n_labels + 1, dtype=np.int64)
+        adj_idx, contact_counts, contact_idx = [], [], []
+        for label in sorted(morse_cells.Cells.keys()):
+            cell = morse_cells.Cells[label]
+            self.labels[np.fromiter(cell.vertices, dtype=np.int64, count=len(cell.vertices))] = label
+            adj_counts[label] = len(cell.neighbors)
+            for neighbor, points in cell.neighbors.items():
+                adj_idx.append(neighbor)
+                contact_counts.append(len(points))
+                contact_idx.extend(points)
+        
+        self.sizes = np.bincount(self.labels[self.labels >= 0], minlength=self.n_labels + 1)
+        self.adj_ptr = np.concatenate(([0], np.cumsum(adj_counts)))
+        self.adj_idx = np.array(adj_idx, dtype=np.int32)
+        self.contact_ptr = np.concatenate(([0], np.cumsum(contact_counts, dtype=np.int64)))
+        self.contact_idx = np.array(contact_idx, dtype=np.int64)
+        
+    def neighbors(self, label: int) -> np.ndarray:
+        """! @brief Gives the labels of the cells adjacent to a cell.
+        @param label The label of the cell.
+        @return Numpy array of labels.
+        """
+        return self.adj_idx[self.adj_ptr[label]:self.adj_ptr[label + 1]]
+    
+    def to_morse_cells(self, relabel: np.ndarray = None) -> MorseCells:
+        """! @brief Creates the MorseCells for a relabelling of the cells.
+        
+        @details Cells with the same new label are joined. The boundary of a 
+        cell consists of its vertices bordering other cells, the weights are 
+        all 0.
+        
+        @param relabel (Optional) Numpy array with the new label for every 
+               label. Default is None, which keeps the labels.
+        
+        @return A MorseCells object.
+        """
+        if relabel is None:
+            relabel = np.arange(self.n_labels + 1)
+        vertex_labels = np.where(self.labels >= 0, relabel[self.labels], -1)
+        
+        morse_cells = MorseCells()
+        order = np.argsort(vertex_labels, kind="stable")
+        new_labels, starts = np.unique(vertex_labels[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        for i, label in enumerate(new_labels.tolist()):
+            if label < 0:
+                continue
+            cell = Cell(label)
+            cell.vertices = set(order[bounds[i]:bounds[i + 1]].tolist())
+            morse_cells.add_cell(cell)
+        
+        for label in range(self.n_labels + 1):
+            new_label = int(relabel[label])
+            for k in range(self.adj_ptr[label], self.adj_ptr[label + 1]):
+                new_neighbor = int(relabel[self.adj_idx[k]])
+                if new_neighbor == new_label:
+                    continue
+                points = self.contact_idx[self.contact_ptr[k]:self.contact_ptr[k + 1]].tolist()
+                cell = morse_cells.Cells[new_label]
+                if new_neighbor not in cell.neighbors:
+                    cell.neighbors[new_neighbor] = set()
+                    cell.neighbors_weights[new_neighbor] = 0
+                cell.neighbors[new_neighbor].update(points)
+                morse_cells.Cells[new_neighbor].boundary.update(points)
+        return morse_cells
+    
+    def __repr__(self) -> str:
+        """! @brief Gives info on this CellGraph.
+        @return Info as string.
+        """
+        return ("CellGraph(cells=" + str(int(np.count_nonzero(self.sizes))) 
+                + ", adjacencies=" + str(len(self.adj_idx)) + ")")
+
+class Segmentation:
+    """! @brief A segmentation of Morse cells, stored as relabelling of the 
+    cells of a shared CellGraph.
+    """
+    ## @var CellGraph
+    # The CellGraph of the segmented Morse cells.
+    ## @var relabel
+    # Numpy array giving the segment label for every cell label.
+    ## @var salient_mask
+    # Boolean numpy array of the salient edge points used for the 
+    # segmentation (shared with the MergeDendrogram) or None.
+    ## @var threshold
+    # Double threshold that was used to get these edge points. 
+    # A tuple of (large_thr, small_thr).
+    ## @var merge_threshold
+    # The merge threhsold that was used in the segmentation.
+    ## @var _cells
+    # The MorseCells of the segments, created by the first to_cells call.
+    
+    __slots__ = ("CellGraph", "relabel", "salient_mask", "threshold", "merge_threshold", "_cells")
+    
+    def __init__(self, 
+                 cell_graph: CellGraph, 
+                 relabel: np.ndarray, 
+                 salient_mask: np.ndarray = None, 
+                 threshold: tuple = None, 
+                 merge_threshold: float = None):
+        """! @brief The constructor of a Segmentation.
+        @param cell_graph The CellGraph of the segmented Morse cells.
+        @param relabel Numpy array with the segment label for every cell label.
+        @param salient_mask (Optional) The salient edge point mask used (not 
+               copied).
+        @param threshold (Optional) The double threshold of the edge points.
+        @param merge_threshold (Optional) The merge threshold used.
+        """
+        self.CellGraph = cell_graph
+        self.relabel = relabel
+        self.salient_mask = salient_mask
+        self.threshold = threshold
+        self.merge_threshold = merge_threshold
+        self._cells = None
+    
+    @classmethod
+    def from_morse_cells(cls, cell_graph: CellGraph, morse_cells: MorseCells, **kwargs):
+        """! @brief Gives the relabelling of the cell graph, that joins the 
+        cells as in the given (merged) Morse cells.
+        @param cell_graph The CellGraph of the unmerged Morse cells.
+        @param morse_cells MorseCells whose cells are unions of the cells 
+               of the graph.
+        @return A Segmentation object.
+        """
+        relabel = np.arange(cell_graph.n_labels + 1)
+        for label, cell in morse_cells.Cells.items():
+            vertices = np.fromiter(cell.vertices, dtype=np.int64, count=len(cell.vertices))
+            relabel[cell_graph.labels[vertices]] = label
+        return cls(cell_graph, relabel, **kwargs)
+    
+    @property
+    def labels(self) -> np.ndarray:
+        """! @brief The segment label of every vertex (-1 if unlabelled)."""
+        return np.where(self.CellGraph.labels >= 0, self.relabel[self.CellGraph.labels], -1)
+    
+    def to_cells(self) -> MorseCells:
+        """! @brief Gives the segments as MorseCells object (see 
+        CellGraph.to_morse_cells). It is created on the first call and cached.
+        """
+        if self._cells is None:
+            self._cells = self.CellGraph.to_morse_cells(self.relabel)
+        return self._cells
+    
+    @property
+    def Cells(self) -> dict:
+        """! @brief The segments as dictionary of Cell objects (see 
+        MorseCells.Cells and to_cells)."""
+        return self.to_cells().Cells
+    
+    def __len__(self) -> int:
+        """! @brief The number of segments."""
+        return len(np.unique(self.relabel[self.CellGraph.sizes > 0]))
+
 def write_header(file):
     file.write("# +-----------------------------------------------------+\n")
     file.write("# | txt file with labels                                |\n")
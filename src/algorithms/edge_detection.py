@@ -21,6 +21,12 @@
 #
 # @brief Contains functions for edge detection based on salient edges
 
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from .paths import path_array
+
 def ridge_detection(maxRedComp, 
                     thresh_high: float, 
                     thresh_low: float, 
@@ -29,7 +35,9 @@ def ridge_detection(maxRedComp,
                     face_dict: dict, 
                     min_length: int = 1, 
                     max_length: int=None,
-                    separatrix_type: str = "all"):
+                    separatrix_type: str = "all",
+                    mesh_arrays=None,
+                    return_mask: bool = False):
     """! @brief Uses double threshold to get strong and weak ridges and adds 
     weak ridges to strong ridges if they are adjacent to a strong ridge.
     
@@ -45,10 +53,28 @@ def ridge_detection(maxRedComp,
     @param separatrix_type Determines the type of separatrices to include. Can be 
            all ("all), only the ones that were cut off ("cutoff"), or only the
            ones that were reversed ("reverse"). Default is all.
+    @param mesh_arrays (Optional) The MeshArrays object of the mesh. If given, 
+           the separatrices are looked up in the SeparatrixTable of the complex 
+           and the weak ridges are added with hysteresis_mask.
+    @param return_mask (Optional) Whether to return a boolean mask over the 
+           vertices as well (needs mesh_arrays). Default is False.
     
     @return strong_edge The double thresholded edges stored as a single 
-            set of vertex indices.
+            set of vertex indices (and the boolean mask if return_mask).
     """
+    if mesh_arrays is not None:
+        table = maxRedComp.get_separatrix_table(separatrix_type, mesh_arrays)
+        strong, weak = table.query(thresh_high, 
+                                   thresh_low, 
+                                   mode=1, 
+                                   min_length=min_length, 
+                                   max_length=max_length)
+        mask = hysteresis_mask(strong, weak, mesh_arrays)
+        strong_ridge = set(np.flatnonzero(mask).tolist())
+        if return_mask:
+            return strong_ridge, mask
+        return strong_ridge
+    
     strong_ridge, weak_ridge = get_salient_sepa_indices(maxRedComp, 
                                                         thresh_high, 
                                                         thresh_low, 
@@ -87,7 +113,9 @@ def valley_detection(maxRedComp,
                      face_dict: dict, 
                      min_length: int=1, 
                      max_length: int=None,
-                     separatrix_type: str = "all"):
+                     separatrix_type: str = "all",
+                     mesh_arrays=None,
+                     return_mask: bool = False):
     """! @brief Uses double threshold to get strong and weak valleys and adds 
     weak valleys to strong valleys if they are adjacent to a strong valley.
     
@@ -103,10 +131,28 @@ def valley_detection(maxRedComp,
     @param separatrix_type Determines the type of separatrices to include. Can be 
            all ("all), only the ones that were cut off ("cutoff"), or only the
            ones that were reversed ("reverse"). Default is all.
+    @param mesh_arrays (Optional) The MeshArrays object of the mesh. If given, 
+           the separatrices are looked up in the SeparatrixTable of the complex 
+           and the weak valleys are added with hysteresis_mask.
+    @param return_mask (Optional) Whether to return a boolean mask over the 
+           vertices as well (needs mesh_arrays). Default is False.
     
     @return strong_valley The double thresholded valleys stored as a single 
-            set of vertex indices.
+            set of vertex indices (and the boolean mask if return_mask).
     """
+    if mesh_arrays is not None:
+        table = maxRedComp.get_separatrix_table(separatrix_type, mesh_arrays)
+        strong, weak = table.query(thresh_high, 
+                                   thresh_low, 
+                                   mode=2, 
+                                   min_length=min_length, 
+                                   max_length=max_length)
+        mask = hysteresis_mask(strong, weak, mesh_arrays)
+        strong_valley = set(np.flatnonzero(mask).tolist())
+        if return_mask:
+            return strong_valley, mask
+        return strong_valley
+    
     strong_valley, weak_valley = get_salient_sepa_indices(maxRedComp, 
                                                           thresh_high, 
                                                           thresh_low, 
@@ -137,6 +183,99 @@ def valley_detection(maxRedComp,
                     weak_valley.remove(nei)
     return strong_valley
 
+def hysteresis_mask(strong, weak, mesh_arrays) -> np.ndarray:
+    """! @brief Adds the weak edge points to the strong ones that are 
+    connected to a strong edge point via weak edge points.
+    
+    @details Computes the connected components of the subgraph of the mesh 
+    edges between strong or weak edge points and keeps the components that 
+    contain a strong edge point (same result as growing the strong edges 
+    with a breadth first search).
+    
+    @param strong Numpy array (or iterable) of the strong vertex indices.
+    @param weak Numpy array (or iterable) of the weak vertex indices.
+    @param mesh_arrays The MeshArrays object of the mesh.
+    
+    @return Boolean numpy array over the vertices, True for the edge points.
+    """
+    n_vertices = mesh_arrays.n_vertices
+    strong_mask = np.zeros(n_vertices, dtype=bool)
+    strong_mask[np.fromiter(strong, dtype=np.int64)] = True
+    weak_mask = np.zeros(n_vertices, dtype=bool)
+    weak_mask[np.fromiter(weak, dtype=np.int64)] = True
+    return hysteresis_masks([(strong_mask, weak_mask)], mesh_arrays)[0]
+
+def hysteresis_masks(layers: list, mesh_arrays) -> list:
+    """! @brief Applies hysteresis_mask to several pairs of strong and weak 
+    edge points at once.
+    
+    @details The subgraphs of all pairs are stacked into one graph (the 
+    vertices of the i-th pair are shifted by i*n_vertices), so a single 
+    connected components computation handles all of them.
+    
+    @param layers List of (strong, weak) tuples of boolean numpy arrays over 
+           the vertices.
+    @param mesh_arrays The MeshArrays object of the mesh.
+    
+    @return List of boolean numpy arrays over the vertices, one per pair.
+    """
+    n_vertices = mesh_arrays.n_vertices
+    if not any(weak.any() for _, weak in layers):
+        return [strong.copy() for strong, _ in layers]
+    
+    strong = np.concatenate([strong for strong, _ in layers])
+    mask = strong | np.concatenate([weak for _, weak in layers])
+    edges = []
+    for i in range(len(layers)):
+        layer = mask[i * n_vertices:(i + 1) * n_vertices]
+        edges.append(mesh_arrays.edges[layer[mesh_arrays.edges[:, 0]] & layer[mesh_arrays.edges[:, 1]]] 
+                     + i * n_vertices)
+    edges = np.concatenate(edges)
+    graph = csr_matrix((np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])), 
+                       shape=(len(mask), len(mask)))
+    _, components = connected_components(graph, directed=False)
+    keep = np.zeros(components.max() + 1, dtype=bool)
+    keep[components[strong]] = True
+    mask &= keep[components]
+    return [mask[i * n_vertices:(i + 1) * n_vertices] for i in range(len(layers))]
+
+def salient_edge_detection(maxRedComp, 
+                           thresh_high: float, 
+                           thresh_low: float, 
+                           mesh_arrays, 
+                           min_length: int = 1, 
+                           max_length: int = None,
+                           separatrix_type: str = "all"):
+    """! @brief Gets the ridges and valleys of a double threshold together. 
+    
+    @details Classifies every separatrix of the SeparatrixTable of the 
+    complex once as strong or weak ridge and valley and grows the weak 
+    ridges and valleys in one hysteresis_masks computation. The ridges and 
+    valleys are the same as the ones of ridge_detection and valley_detection.
+    
+    @param maxRedComp A maximally reduced Morse Complex (needed for the Separatrices).
+    @param thresh_high The high threshold.
+    @param thresh_low  The weak threshold.
+    @param mesh_arrays The MeshArrays object of the mesh.
+    @param min_length Minimum length each separatrix should have: Default 1
+    @param max_length Maximum length each separatrix should have: Default None.
+    @param separatrix_type Determines the type of separatrices to include. Can be 
+           all ("all), only the ones that were cut off ("cutoff"), or only the
+           ones that were reversed ("reverse"). Default is all.
+    
+    @return ridges, valleys, edges Boolean numpy arrays over the vertices 
+            for the ridges, the valleys and both.
+    """
+    table = maxRedComp.get_separatrix_table(separatrix_type, mesh_arrays)
+    ridge_classes, valley_classes = table.classify(thresh_high, 
+                                                   thresh_low, 
+                                                   min_length=min_length, 
+                                                   max_length=max_length)
+    ridges, valleys = hysteresis_masks([table.vertex_masks(ridge_classes, mesh_arrays.n_vertices), 
+                                        table.vertex_masks(valley_classes, mesh_arrays.n_vertices)], 
+                                       mesh_arrays)
+    return ridges, valleys, ridges | valleys
+
 def get_salient_sepa_indices(MorseComplex, 
                              thresh_high: float, 
                              thresh_low: float, 
@@ -145,7 +284,8 @@ def get_salient_sepa_indices(MorseComplex,
                              mode: int = 1, 
                              min_length: int = 1, 
                              max_length: int = None,
-                             separatrix_type: str = "all"):
+                             separatrix_type: str = "all",
+                             mesh_arrays=None):
     """! @brief Gets strong and weak edges based on Separatrix persistence.
     
     @details Separatrix persistence similar to Weinkauf and Günther 
@@ -164,12 +304,24 @@ https://www.researchgate.net/publication/227511709_Separatrix_Persistence_Extrac
     @param separatrix_type Determines the type of separatrices to include. Can be 
            all ("all), only the ones that were cut off ("cutoff"), or only the
            ones that were reversed ("reverse"). Default is all.
+    @param mesh_arrays (Optional) The MeshArrays object of the mesh. If given, 
+           the query is answered by the SeparatrixTable of the complex, which 
+           is sorted by persistence, instead of expanding all separatrices.
     
     @return strong_edge, weak edge Two sets of vertex indices containing 
             the vertices of the separatrices that had Separatrix persistences 
             above the high/low threshold.
     
     """
+    if mesh_arrays is not None:
+        table = MorseComplex.get_separatrix_table(separatrix_type, mesh_arrays)
+        strong_edge, weak_edge = table.query(thresh_high, 
+                                             thresh_low, 
+                                             mode=mode, 
+                                             min_length=min_length, 
+                                             max_length=max_length)
+        return set(strong_edge.tolist()), set(weak_edge.tolist())
+    
     attr_map = {
         "all": "Separatrices",
         "cutoff": "Separatrices_cutoff",
@@ -183,7 +335,7 @@ https://www.researchgate.net/publication/227511709_Separatrix_Persistence_Extrac
     for pers, sepa in getattr(MorseComplex, attr):
         if len(sepa.path) > min_length and len(sepa.path) < max_length:
             # add high persistence edge points
-            if mode == 1: # ridge detection
+            if mode == 1 or mode == 3: # ridge detection
                 if pers > thresh_high:
                     add_sepa_to_edge(sepa, strong_edge, edge_dict, face_dict)
                 
@@ -191,7 +343,7 @@ https://www.researchgate.net/publication/227511709_Separatrix_Persistence_Extrac
                 elif pers <= thresh_high and pers > thresh_low:
                     add_sepa_to_edge(sepa, weak_edge, edge_dict, face_dict)
 
-            elif mode == 2: # valley detection
+            if mode == 2 or mode == 3: # valley detection
                 if pers < -thresh_high:
                     add_sepa_to_edge(sepa, strong_edge, edge_dict, face_dict)
                 
@@ -201,17 +353,19 @@ https://www.researchgate.net/publication/227511709_Separatrix_Persistence_Extrac
     return strong_edge, weak_edge
 
 def add_sepa_to_edge(sepa, edge: set, edge_dict: dict, face_dict: dict):
+    path = path_array(sepa.path)
     if sepa.dimension == 1:
-        for count, elt in enumerate(sepa.path):
-            if count%2 == 1: # so a vertex
-                edge.add(elt)
-            if count%2 == 0: # so an edge
-                edge.update(edge_dict[elt].indices)
+        # vertices
+        edge.update(path[1::2].tolist())
+        # edges
+        for elt in path[::2].tolist():
+            edge.update(edge_dict[elt].indices)
 
     elif sepa.dimension == 2:
-        for count, elt in enumerate(sepa.path):
-            if count%2 == 0: #so a face
-                edge.update(face_dict[elt].indices)
-            if count%2 == 1: # so an edge
-                edge.update(edge_dict[elt].indices)
+        # faces
+        for elt in path[::2].tolist():
+            edge.update(face_dict[elt].indices)
+        # edges
+        for elt in path[1::2].tolist():
+            edge.update(edge_dict[elt].indices)
             
\ No newline at end of file
@@ -28,10 +28,18 @@
 #   - need CritVertex, CritEdge, CritFace, MorseComplex structures
 # - Tree module (local)
 #   - need Tree for path finding to get adjacency between critical cells in the MS complex
+# - Paths module (local)
+#   - need Path to store the separatrix paths in a flat buffer
+# - Parallel module (local)
+#   - need map_chunks to trace the paths of chunks of critical cells in a process pool
+
+import numpy as np
 
 from .tree import Tree, Node
 
-from .datastructures import CritEdge, CritFace, MorseComplex
+from .datastructures import Vertex, Simplex, CritVertex, CritEdge, CritFace, MorseComplex
+from .paths import Path
+from .parallel import map_chunks, chunk_ranges, get_n_workers
 
 def potential_cells(p: int, 
                     cell, #: CritEdge | CritFace 
@@ -175,4 +183,256 @@ def extract_morse_complex(vert_dict: dict,
                 initial_complex.CritEdges[C_index] = crit_cell
             else:
                 initial_complex.CritFaces[C_index] = crit_cell 
-    return initial_complex
\ No newline at end of file
+    return initial_complex
+def gradient_arrays(n_vertices: int, 
+                    n_edges: int, 
+                    n_faces: int, 
+                    V12: dict, 
+                    V23: dict, 
+                    C: dict) -> dict:
+    """! @brief Converts the discrete gradient into arrays indexed by simplex id.
+    
+    @param n_vertices The number of vertices.
+    @param n_edges The number of edges.
+    @param n_faces The number of faces.
+    @param V12 The dictionary containing all pairings between edges and vertices.
+    @param V23 The dictionary containing all pairings between faces and edges.
+    @param C The dictionary containing all critical vertices, edges and faces.
+    
+    @return A dictionary with the arrays 'V12' (edge paired with each vertex 
+            or -1), 'V23' (face paired with each edge or -1) and boolean masks 
+            'C0', 'C1', 'C2' of the critical simplices.
+    """
+    def to_array(pairs: dict, size: int) -> np.ndarray:
+        arr = np.full(size, -1, dtype=np.int64)
+        if pairs:
+            arr[np.fromiter(pairs.keys(), dtype=np.int64, count=len(pairs))] = \
+                np.fromiter(pairs.values(), dtype=np.int64, count=len(pairs))
+        return arr
+
+    def to_mask(crit: set, size: int) -> np.ndarray:
+        mask = np.zeros(size, dtype=bool)
+        mask[np.fromiter(crit, dtype=np.int64, count=len(crit))] = True
+        return mask
+
+    return {"V12": to_array(V12, n_vertices), 
+            "V23": to_array(V23, n_edges),
+            "C0": to_mask(C[0], n_vertices), 
+            "C1": to_mask(C[1], n_edges), 
+            "C2": to_mask(C[2], n_faces)}
+
+def trace_vpaths(roots: np.ndarray, 
+                 facets: np.ndarray, 
+                 pairs: np.ndarray, 
+                 crit_facets: np.ndarray):
+    """! @brief Follows all V-paths starting at the given critical cells.
+    
+    @details All paths are followed in lockstep: each step takes the facets of 
+    the current cells (except the one we came from), ends paths at critical 
+    facets and continues at facets that are paired with a higher cell. Every 
+    visited cell is stored as a node with a parent pointer (on a manifold 
+    the V-paths starting at a critical cell form a tree). Afterwards, the paths 
+    are written into one flat buffer by walking all parent pointers at once.
+    
+    @param roots The indices of the critical cells the paths start at.
+    @param facets Array with the facets (vertices of an edge or edges of a 
+           face) of every cell of the dimension of the roots.
+    @param pairs Array giving the higher cell paired with each facet or -1.
+    @param crit_facets Boolean mask of the critical facets.
+    
+    @return end_roots, end_cells, buffer, offsets For each found path the 
+            position of its root in roots, the critical facet it ends at and 
+            the path [root, facet, cell, facet, ..., end] as 
+            buffer[offsets[i]:offsets[i+1]]. Paths are sorted by root.
+    """
+    node_cell = [roots]
+    node_parent = [np.full(len(roots), -1, dtype=np.int64)]
+    node_depth = [np.zeros(len(roots), dtype=np.int64)]
+    node_root = [np.arange(len(roots), dtype=np.int64)]
+    n_nodes = len(roots)
+    end_nodes = []
+
+    # frontier: node ids of cells whose facets are checked next and the 
+    # facet the path came from (-1 for the roots)
+    front_nodes = np.arange(len(roots), dtype=np.int64)
+    front_cells = roots
+    front_from = np.full(len(roots), -1, dtype=np.int64)
+    front_depth = node_depth[0]
+    front_root = node_root[0]
+
+    width = facets.shape[1]
+    while len(front_nodes):
+        cand = facets[front_cells].ravel()
+        parent = np.repeat(front_nodes, width)
+        depth = np.repeat(front_depth, width) + 1
+        root = np.repeat(front_root, width)
+        valid = cand != np.repeat(front_from, width)
+        is_end = valid & crit_facets[cand]
+        is_next = valid & ~is_end & (pairs[cand] >= 0)
+
+        # store end nodes and step nodes (facet) in one block
+        keep = is_end | is_next
+        cand, parent, depth, root = cand[keep], parent[keep], depth[keep], root[keep]
+        is_end, is_next = is_end[keep], is_next[keep]
+        ids = n_nodes + np.arange(len(cand), dtype=np.int64)
+        n_nodes += len(cand)
+        node_cell.append(cand)
+        node_parent.append(parent)
+        node_depth.append(depth)
+        node_root.append(root)
+        end_nodes.append(ids[is_end])
+
+        # the paired higher cells become the next frontier
+        step_ids = ids[is_next]
+        front_cells = pairs[cand[is_next]]
+        front_nodes = n_nodes + np.arange(len(step_ids), dtype=np.int64)
+        n_nodes += len(step_ids)
+        front_from = cand[is_next]
+        front_depth = depth[is_next] + 1
+        front_root = root[is_next]
+        node_cell.append(front_cells)
+        node_parent.append(step_ids)
+        node_depth.append(front_depth)
+        node_root.append(front_root)
+
+    node_cell = np.concatenate(node_cell)
+    node_parent = np.concatenate(node_parent)
+    node_depth = np.concatenate(node_depth)
+    node_root = np.concatenate(node_root)
+    end_nodes = np.concatenate(end_nodes) if end_nodes else np.zeros(0, dtype=np.int64)
+    end_nodes = end_nodes[np.argsort(node_root[end_nodes], kind="stable")]
+
+    # write the paths back to front into the flat buffer
+    lengths = node_depth[end_nodes] + 1
+    offsets = np.zeros(len(end_nodes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    buffer = np.empty(offsets[-1], dtype=np.int64)
+    current = end_nodes
+    pos = offsets[:-1] + lengths - 1
+    while len(current):
+        buffer[pos] = node_cell[current]
+        current = node_parent[current]
+        active = current >= 0
+        current, pos = current[active], pos[active] - 1
+
+    return node_root[end_nodes], node_cell[end_nodes], buffer, offsets
+
+def _trace_vpaths_chunk(arrays: dict, first: int, end: int):
+    end_roots, end_cells, buffer, offsets = trace_vpaths(arrays["roots"][first:end],
+                                                         arrays["facets"],
+                                                         arrays["pairs"],
+                                                         arrays["crit_facets"])
+    return end_roots + first, end_cells, buffer, offsets
+
+def trace_vpaths_parallel(roots: np.ndarray, 
+                          facets: np.ndarray, 
+                          pairs: np.ndarray, 
+                          crit_facets: np.ndarray,
+                          n_workers: int = None):
+    """! @brief Runs trace_vpaths on chunks of the critical cells in a process pool.
+    
+    @details The arrays are shared read-only between the processes. The paths 
+    of different critical cells are independent, so the results of the chunks 
+    are simply concatenated in chunk order, which gives exactly the output 
+    of trace_vpaths on all roots.
+    
+    @param roots The indices of the critical cells the paths start at.
+    @param facets Array with the facets of every cell of the dimension of the roots.
+    @param pairs Array giving the higher cell paired with each facet or -1.
+    @param crit_facets Boolean mask of the critical facets.
+    @param n_workers (Optional) Number of processes. Default None uses all cores.
+    
+    @return end_roots, end_cells, buffer, offsets As in trace_vpaths.
+    """
+    n_chunks = 4 * get_n_workers(n_workers)
+    chunks = chunk_ranges(np.arange(len(roots) + 1), n_chunks)
+    arrays = {"roots": roots, "facets": facets, "pairs": pairs, "crit_facets": crit_facets}
+    results = map_chunks(_trace_vpaths_chunk, arrays, chunks, n_workers=n_workers)
+    if not results:
+        return trace_vpaths(roots, facets, pairs, crit_facets)
+
+    end_roots = np.concatenate([res[0] for res in results])
+    end_cells = np.concatenate([res[1] for res in results])
+    buffer = np.concatenate([res[2] for res in results])
+    shifts = np.cumsum([0] + [len(res[2]) for res in results[:-1]])
+    offsets = np.concatenate([res[3][:-1] + shift for res, shift in zip(results, shifts)] 
+                             + [[len(buffer)]])
+    return end_roots, end_cells, buffer, offsets
+
+def extract_morse_complex_arrays(mesh_arrays, 
+                                 V12: dict, 
+                                 V23: dict, 
+                                 C: dict,
+                                 n_workers: int = 1):
+    """! @brief Array version of extract_morse_complex.
+    
+    @details Follows the V-paths of all critical edges and faces with 
+    trace_vpaths on integer arrays instead of Tree and Node objects and 
+    stores the paths as Path views into one flat buffer per dimension. 
+    The connections are the same as with extract_morse_complex, only the 
+    order of the connected cells may differ.
+    
+    @param mesh_arrays The MeshArrays object (function values need to be set).
+    @param V12 The dictionary containing all pairings between edges and vertices.
+    @param V23 The dictionary containing all pairings between faces and edges.
+    @param C The dictionary containing all critical vertices, edges and faces.
+    @param n_workers (Optional) Number of processes used to trace the paths.
+           Default is 1 (serial), None uses all cores.
+    
+    @return initial_complex The initial (unreduced) Morse complex.
+    """
+    grad = gradient_arrays(mesh_arrays.n_vertices, mesh_arrays.n_edges, 
+                           mesh_arrays.n_faces, V12, V23, C)
+    initial_complex = MorseComplex()
+
+    fun_val = mesh_arrays.fun_val.tolist()
+    for ind in sorted(C[0]):
+        initial_complex.CritVertices[ind] = CritVertex(Vertex(fun_val=fun_val[ind], index=ind))
+
+    crit_edges = np.array(sorted(C[1]), dtype=np.int64)
+    crit_faces = np.array(sorted(C[2]), dtype=np.int64)
+    for dim, roots, facets, pairs, crit_facets, simplices, simplex_fun_vals in (
+            (1, crit_edges, mesh_arrays.edges, grad["V12"], grad["C0"], 
+             mesh_arrays.edges, mesh_arrays.edge_fun_vals),
+            (2, crit_faces, mesh_arrays.face_edges, grad["V23"], grad["C1"],
+             mesh_arrays.faces, mesh_arrays.face_fun_vals)):
+        if n_workers == 1:
+            end_roots, end_cells, buffer, offsets = trace_vpaths(roots, 
+                                                                 facets.astype(np.int64), 
+                                                                 pairs, 
+                                                                 crit_facets)
+        else:
+            end_roots, end_cells, buffer, offsets = trace_vpaths_parallel(roots, 
+                                                                          facets.astype(np.int64), 
+                                                                          pairs, 
+                                                                          crit_facets,
+                                                                          n_workers=n_workers)
+        crit_cells = []
+        for ind, indices, vals in zip(roots.tolist(), 
+                                      simplices[roots].tolist(), 
+                                      simplex_fun_vals[roots].tolist()):
+            simplex = Simplex(indices=set(indices), index=ind)
+            simplex.fun_val = vals
+            crit_cell = CritEdge(simplex) if dim == 1 else CritFace(simplex)
+            crit_cells.append(crit_cell)
+            if dim == 1:
+                initial_complex.CritEdges[ind] = crit_cell
+            else:
+                initial_complex.CritFaces[ind] = crit_cell
+
+        offsets = offsets.tolist()
+        for i, (root, end) in enumerate(zip(end_roots.tolist(), end_cells.tolist())):
+            crit_cell = crit_cells[root]
+            # p=1: connect min and saddle, p=2: connect max and saddle
+            if dim == 1:
+                initial_complex.CritVertices[end].connected_saddles.append(crit_cell.index)
+                crit_cell.connected_minima.append(end)
+            else:
+                initial_complex.CritEdges[end].connected_maxima.append(crit_cell.index)
+                crit_cell.connected_saddles.append(end)
+            path = Path(buffer, offsets[i], offsets[i+1])
+            if end not in crit_cell.paths.keys():
+                crit_cell.paths[end] = path
+            else:
+                crit_cell.paths[end] = [crit_cell.paths[end], path]
+    return initial_complex
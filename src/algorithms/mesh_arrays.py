@@ -0,0 +1,453 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file mesh_arrays.py
+#
+# @brief Contains the MeshArrays class, a compact NumPy representation of a
+# triangle mesh.
+#
+# @section description_mesh_arrays Description
+# Instead of one Python object per vertex, edge and face, the mesh is stored
+# in a few flat arrays: coordinates, function values, triangle and edge index
+# arrays and CSR (compressed sparse row) adjacency lists from each vertex to
+# its edges, faces and neighbors. The Vertex/Simplex dictionaries can still
+# be built from it as a view for legacy code and the GUI.
+#
+# @section libraries_mesh_arrays Libraries/Modules
+# - numpy standard library
+# - scipy.sparse
+# - Datastructure module (local)
+#   - need Vertex and Simplex for the dictionary view
+
+# imports
+import numpy as np
+import scipy.sparse
+
+from .datastructures import Vertex, Simplex
+
+def index_dtype(n: int):
+    """! @brief Gives the smallest integer type used to store indices up to n.
+    @param n The number of elements that should be indexable.
+    @return np.int32 if n fits into it, np.int64 otherwise.
+    """
+    if n < np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+def build_csr(rows: np.ndarray, cols: np.ndarray, n_rows: int):
+    """! @brief Builds a CSR adjacency (pointer and index array) from pairs.
+
+    @details Groups the entries of cols by the value in rows with a single
+    stable sort, so the order of cols within a row is preserved.
+
+    @param rows The row (e.g. vertex) index of each pair.
+    @param cols The column (e.g. edge) index of each pair.
+    @param n_rows The number of rows.
+
+    @return ptr, idx The entries of row i are idx[ptr[i]:ptr[i+1]].
+    """
+    order = np.argsort(rows, kind="stable")
+    ptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=ptr[1:])
+    idx = cols[order].astype(index_dtype(max(n_rows, len(cols))), copy=False)
+    return ptr, idx
+
+def pair_keys(a: np.ndarray, b: np.ndarray, n: int) -> np.ndarray:
+    """! @brief Encodes unordered index pairs as a single int64 key.
+    @param a First indices of the pairs.
+    @param b Second indices of the pairs.
+    @param n Upper bound (exclusive) of the indices.
+    @return keys Array of keys lo*n + hi, equal for (a,b) and (b,a).
+    """
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    return np.minimum(a, b) * n + np.maximum(a, b)
+
+
+def _float_to_ordered_int(values: np.ndarray) -> np.ndarray:
+    """! @brief Maps float64 values to int64 keys with the same order, such that
+    neighboring keys are neighboring floats (one unit in the last place apart).
+    @param values The float64 values.
+    @return The int64 keys.
+    """
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, -(bits & np.int64(0x7FFFFFFFFFFFFFFF)), bits)
+
+def _ordered_int_to_float(keys: np.ndarray) -> np.ndarray:
+    """! @brief Inverse of _float_to_ordered_int.
+    @param keys The int64 keys.
+    @return The float64 values.
+    """
+    bits = np.where(keys < 0, (-keys) | np.int64(-0x8000000000000000), keys)
+    return bits.astype(np.int64).view(np.float64)
+
+def make_unique_by_rank(values: np.ndarray):
+    """! @brief Computes a total order of the vertices and makes the function
+    values strictly increasing along it.
+
+    @details Equal values are ordered by their vertex index (symbolic
+    perturbation). The float values of such ties are then separated by the
+    smallest possible steps (units in the last place of float64), so comparing
+    the float values gives the same order as comparing the ranks.
+
+    @param values The function values of the vertices.
+
+    @return fun_val, rank The unique float64 function values and the rank
+            (position in the total order) of each vertex.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(values, kind="stable")
+    rank = np.empty(len(values), dtype=index_dtype(len(values)))
+    rank[order] = np.arange(len(values))
+
+    keys = _float_to_ordered_int(values[order])
+    steps = np.arange(len(keys), dtype=np.int64)
+    unique_keys = np.maximum.accumulate(keys - steps) + steps
+    fun_val = np.empty(len(values), dtype=np.float64)
+    if np.array_equal(unique_keys, keys):
+        fun_val[:] = values
+    else:
+        fun_val[order] = _ordered_int_to_float(unique_keys)
+    return fun_val, rank
+
+def sorted_simplex_fun_vals(simplices: np.ndarray, fun_val: np.ndarray, rank: np.ndarray):
+    """! @brief Gives the function values of each simplex sorted from largest to
+    smallest together with the index of its highest vertex.
+
+    @param simplices (k,d) array of vertex indices per simplex.
+    @param fun_val The function values of the vertices.
+    @param rank The rank of each vertex in the total order.
+
+    @return sorted_vals, max_index A (k,d) array of function values and a (k,)
+            array of vertex indices.
+    """
+    col_order = np.argsort(-rank[simplices], axis=1)
+    sorted_verts = np.take_along_axis(simplices, col_order, axis=1)
+    return fun_val[sorted_verts], sorted_verts[:, 0]
+
+
+class MeshArrays:
+    """! @brief Compact array-backed storage of a triangle mesh.
+
+    @details Vertices are implicitly indexed 0..n-1, edges 0..k-1 and faces
+    0..m-1. Edge rows are sorted (lower vertex index first). Adjacencies are
+    stored in CSR form, so e.g. the edges in the star of vertex v are
+    vert_edge_idx[vert_edge_ptr[v]:vert_edge_ptr[v+1]].
+    """
+    ## @var coords
+    # (n,3) float array of vertex coordinates.
+    ## @var quality
+    # (n,) array of the quality field of the vertices (or None).
+    ## @var fun_val
+    # (n,) float array of the Morse function values of the vertices (or None).
+    ## @var faces
+    # (m,3) integer array of the vertex indices of each triangle.
+    ## @var edges
+    # (k,2) integer array of the vertex indices of each edge, sorted per row.
+    ## @var face_edges
+    # (m,3) integer array of the edge indices of each triangle.
+    ## @var rank
+    # (n,) integer array with the position of each vertex in the total order
+    # of the function values (ties broken by vertex index).
+    ## @var edge_fun_vals
+    # (k,2) array of the function values of each edge, sorted descending.
+    ## @var edge_max_index
+    # (k,) array with the highest vertex of each edge.
+    ## @var face_fun_vals
+    # (m,3) array of the function values of each face, sorted descending.
+    ## @var face_max_index
+    # (m,) array with the highest vertex of each face.
+    ## @var vert_edge_ptr
+    # CSR pointer array vertex -> edges in its star.
+    ## @var vert_edge_idx
+    # CSR index array vertex -> edges in its star.
+    ## @var vert_face_ptr
+    # CSR pointer array vertex -> faces in its star.
+    ## @var vert_face_idx
+    # CSR index array vertex -> faces in its star.
+    ## @var vert_nbr_ptr
+    # CSR pointer array vertex -> one-ring neighbors.
+    ## @var vert_nbr_idx
+    # CSR index array vertex -> one-ring neighbors.
+
+    __slots__ = ("coords", "quality", "fun_val", "faces", "edges", "face_edges",
+                 "rank", "edge_fun_vals", "edge_max_index", "face_fun_vals", "face_max_index",
+                 "vert_edge_ptr", "vert_edge_idx", "vert_face_ptr", "vert_face_idx",
+                 "vert_nbr_ptr", "vert_nbr_idx")
+
+    def __init__(self,
+                 coords: np.ndarray,
+                 faces: np.ndarray,
+                 edges: np.ndarray,
+                 face_edges: np.ndarray,
+                 quality: np.ndarray = None,
+                 fun_val: np.ndarray = None):
+        """! @brief The constructor of the MeshArrays.
+        @param coords (n,3) array of vertex coordinates.
+        @param faces (m,3) array of vertex indices per triangle.
+        @param edges (k,2) array of vertex indices per edge.
+        @param face_edges (m,3) array of edge indices per triangle.
+        @param quality (Optional) The quality field of the vertices.
+        @param fun_val (Optional) The Morse function values of the vertices. Ties
+               are made unique, see set_fun_val.
+        """
+        n = len(coords)
+        dtype = index_dtype(n)
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.quality = quality
+        self.faces = np.asarray(faces).astype(dtype, copy=False)
+        self.edges = np.sort(np.asarray(edges), axis=1).astype(dtype, copy=False)
+        self.face_edges = np.asarray(face_edges).astype(index_dtype(len(self.edges)),
+                                                        copy=False)
+        self.build_adjacency()
+        self.set_fun_val(fun_val)
+
+    def set_fun_val(self, fun_val: np.ndarray):
+        """! @brief Sets the Morse function values of the vertices.
+
+        @details Makes the values unique (see make_unique_by_rank) and computes
+        the sorted function values and the highest vertex of every edge and
+        face.
+
+        @param fun_val The function values of the vertices (or None to unset).
+        """
+        if fun_val is None:
+            self.fun_val = None
+            self.rank = None
+            self.edge_fun_vals, self.edge_max_index = None, None
+            self.face_fun_vals, self.face_max_index = None, None
+            return
+        self.fun_val, self.rank = make_unique_by_rank(fun_val)
+        self.edge_fun_vals, self.edge_max_index = sorted_simplex_fun_vals(self.edges,
+                                                                          self.fun_val,
+                                                                          self.rank)
+        self.face_fun_vals, self.face_max_index = sorted_simplex_fun_vals(self.faces,
+                                                                          self.fun_val,
+                                                                          self.rank)
+
+    def build_adjacency(self):
+        """! @brief Builds the CSR vertex->edge, vertex->face and vertex->neighbor
+        adjacencies from the edge and face arrays.
+        """
+        n, k, m = self.n_vertices, self.n_edges, self.n_faces
+        self.vert_edge_ptr, self.vert_edge_idx = build_csr(self.edges.ravel(),
+                                                           np.repeat(np.arange(k), 2),
+                                                           n)
+        self.vert_face_ptr, self.vert_face_idx = build_csr(self.faces.ravel(),
+                                                           np.repeat(np.arange(m), 3),
+                                                           n)
+        self.vert_nbr_ptr, self.vert_nbr_idx = build_csr(self.edges.ravel(),
+                                                         self.edges[:, ::-1].ravel(),
+                                                         n)
+
+    @property
+    def n_vertices(self) -> int:
+        """! @brief The number of vertices."""
+        return len(self.coords)
+
+    @property
+    def n_edges(self) -> int:
+        """! @brief The number of edges."""
+        return len(self.edges)
+
+    @property
+    def n_faces(self) -> int:
+        """! @brief The number of faces."""
+        return len(self.faces)
+
+    def star_edges(self, v: int) -> np.ndarray:
+        """! @brief Gives the edge indices in the star of a vertex.
+        @param v The vertex index.
+        @return Array of edge indices.
+        """
+        return self.vert_edge_idx[self.vert_edge_ptr[v]:self.vert_edge_ptr[v+1]]
+
+    def star_faces(self, v: int) -> np.ndarray:
+        """! @brief Gives the face indices in the star of a vertex.
+        @param v The vertex index.
+        @return Array of face indices.
+        """
+        return self.vert_face_idx[self.vert_face_ptr[v]:self.vert_face_ptr[v+1]]
+
+    def neighbors(self, v: int) -> np.ndarray:
+        """! @brief Gives the one-ring neighbors of a vertex.
+        @param v The vertex index.
+        @return Array of vertex indices.
+        """
+        return self.vert_nbr_idx[self.vert_nbr_ptr[v]:self.vert_nbr_ptr[v+1]]
+
+    def adjacency_matrix(self):
+        """! @brief Gives the vertex adjacency (one-ring) as a sparse matrix.
+        @return A symmetric (n,n) scipy.sparse.csr_matrix with boolean entries.
+        """
+        n = self.n_vertices
+        data = np.ones(len(self.vert_nbr_idx), dtype=bool)
+        return scipy.sparse.csr_matrix((data, self.vert_nbr_idx, self.vert_nbr_ptr),
+                                       shape=(n, n))
+
+    def face_areas(self) -> np.ndarray:
+        """! @brief Computes the area of every triangle.
+        @return (m,) array of triangle areas.
+        """
+        pts = self.coords[self.faces]
+        cross = np.cross(pts[:, 1] - pts[:, 0], pts[:, 2] - pts[:, 0])
+        return 0.5 * np.linalg.norm(cross, axis=1)
+
+    @classmethod
+    def from_faces(cls,
+                   coords: np.ndarray,
+                   faces: np.ndarray,
+                   quality: np.ndarray = None,
+                   fun_val: np.ndarray = None):
+        """! @brief Builds the array representation from the vertex coordinates
+        and the triangles only.
+
+        @details The edges are derived from the three sides of every triangle:
+        each side is encoded as one integer key and np.unique gives the edge
+        array (sorted by key) together with the edge index of every side.
+
+        @param coords (n,3) array of vertex coordinates.
+        @param faces (m,3) array of vertex indices per triangle.
+        @param quality (Optional) The quality field of the vertices.
+        @param fun_val (Optional) The Morse function values of the vertices.
+
+        @return A MeshArrays object.
+        """
+        n = len(coords)
+        faces = np.asarray(faces).reshape(-1, 3)
+        side_keys = pair_keys(faces[:, [0, 1, 2]].ravel(), faces[:, [1, 2, 0]].ravel(), n)
+        edge_keys, face_edges = np.unique(side_keys, return_inverse=True)
+        edges = np.stack((edge_keys // n, edge_keys % n), axis=1)
+        return cls(coords, faces, edges, face_edges.reshape(-1, 3),
+                   quality=quality, fun_val=fun_val)
+
+    @classmethod
+    def from_dicts(cls, vert_dict: dict, edge_dict: dict, face_dict: dict):
+        """! @brief Builds the array representation from the vertex, edge and
+        face dictionaries.
+
+        @details Keeps the indices of the dictionaries, which therefore have
+        to be contiguous (0..n-1, 0..k-1 and 0..m-1).
+
+        @param vert_dict Dictionary containing all vertices.
+        @param edge_dict Dictionary containing all edges.
+        @param face_dict Dictionary containing all faces.
+
+        @return A MeshArrays object.
+        """
+        for name, dic in (("vertex", vert_dict), ("edge", edge_dict), ("face", face_dict)):
+            if len(dic) and (min(dic.keys()) != 0 or max(dic.keys()) != len(dic) - 1):
+                raise ValueError("The " + name + " indices need to be contiguous "
+                                 "to build the array representation!")
+        n = len(vert_dict)
+        coords = np.array([[vert_dict[i].x, vert_dict[i].y, vert_dict[i].z]
+                           for i in range(n)], dtype=np.float64)
+        quality = np.array([vert_dict[i].quality for i in range(n)])
+        fun_val = np.array([vert_dict[i].fun_val for i in range(n)], dtype=np.float64)
+        edges = np.array([sorted(edge_dict[i].indices) for i in range(len(edge_dict))],
+                         dtype=np.int64).reshape(-1, 2)
+        faces = np.array([sorted(face_dict[i].indices) for i in range(len(face_dict))],
+                         dtype=np.int64).reshape(-1, 3)
+
+        # look up the edge index of each triangle side
+        edge_keys = pair_keys(edges[:, 0], edges[:, 1], n)
+        order = np.argsort(edge_keys)
+        side_keys = pair_keys(faces[:, [0, 1, 2]].ravel(), faces[:, [1, 2, 0]].ravel(), n)
+        pos = np.searchsorted(edge_keys, side_keys, sorter=order)
+        face_edges = order[np.minimum(pos, len(order) - 1)].reshape(-1, 3)
+        if len(faces) and np.any(edge_keys[face_edges.ravel()] != side_keys):
+            raise ValueError("Some face sides are not contained in the edges!")
+
+        return cls(coords, faces, edges, face_edges, quality=quality, fun_val=fun_val)
+
+    def to_dicts(self):
+        """! @brief Builds the Vertex and Simplex dictionaries from the arrays.
+
+        @details This is the object view used by the GUI and the legacy
+        algorithms. It is expensive in memory for large meshes, so it should
+        only be built when needed (see vertex_dict, edge_dict and face_dict 
+        to build only one of them).
+
+        @return vert_dict, edge_dict, face_dict The three dictionaries.
+        """
+        return self.vertex_dict(), self.edge_dict(), self.face_dict()
+
+    def vertex_dict(self) -> dict:
+        """! @brief Builds the Vertex dictionary from the arrays.
+        @return Dictionary with the Vertex objects, keys are the indices.
+        """
+        n = self.n_vertices
+        coords = self.coords.tolist()
+        quality = self.quality.tolist() if self.quality is not None else [None] * n
+        fun_val = self.fun_val.tolist() if self.fun_val is not None else [None] * n
+
+        vert_dict = {}
+        e_ptr, e_idx = self.vert_edge_ptr.tolist(), self.vert_edge_idx.tolist()
+        f_ptr, f_idx = self.vert_face_ptr.tolist(), self.vert_face_idx.tolist()
+        n_ptr, n_idx = self.vert_nbr_ptr.tolist(), self.vert_nbr_idx.tolist()
+        for ind in range(n):
+            x, y, z = coords[ind]
+            vert = Vertex(x=x, y=y, z=z, quality=quality[ind],
+                          fun_val=fun_val[ind], index=ind)
+            vert.star["E"] = e_idx[e_ptr[ind]:e_ptr[ind+1]]
+            vert.star["F"] = f_idx[f_ptr[ind]:f_ptr[ind+1]]
+            vert.neighbors = set(n_idx[n_ptr[ind]:n_ptr[ind+1]])
+            vert_dict[ind] = vert
+        return vert_dict
+
+    def edge_dict(self) -> dict:
+        """! @brief Builds the Simplex dictionary of the edges from the arrays.
+        @return Dictionary with the Simplex objects, keys are the indices.
+        """
+        edge_dict = {ind: Simplex(indices=set(indices), index=ind)
+                     for ind, indices in enumerate(self.edges.tolist())}
+        if self.fun_val is not None:
+            self.update_simplex_fun_vals(edge_dict, None)
+        return edge_dict
+
+    def face_dict(self) -> dict:
+        """! @brief Builds the Simplex dictionary of the faces from the arrays.
+        @return Dictionary with the Simplex objects, keys are the indices.
+        """
+        face_dict = {ind: Simplex(indices=set(indices), index=ind)
+                     for ind, indices in enumerate(self.faces.tolist())}
+        if self.fun_val is not None:
+            self.update_simplex_fun_vals(None, face_dict)
+        return face_dict
+
+    def update_simplex_fun_vals(self, edge_dict: dict, face_dict: dict):
+        """! @brief Writes the sorted function values and the highest vertex of
+        every edge and face into the Simplex objects of the dictionary view.
+        @param edge_dict Dictionary containing all edges (or None to skip).
+        @param face_dict Dictionary containing all faces (or None to skip).
+        """
+        for simplex_dict, vals, max_index in ((edge_dict, self.edge_fun_vals, self.edge_max_index),
+                                              (face_dict, self.face_fun_vals, self.face_max_index)):
+            if simplex_dict is None:
+                continue
+            for ind, (val, max_ind) in enumerate(zip(vals.tolist(), max_index.tolist())):
+                simplex_dict[ind].fun_val = val
+                simplex_dict[ind].max_fun_val_index = max_ind
+
+    def __repr__(self) -> str:
+        """! @brief Gives the sizes of the stored arrays.
+        @return Info as string.
+        """
+        return ("MeshArrays(" + str(self.n_vertices) + " vertices, "
+                + str(self.n_edges) + " edges, " + str(self.n_faces) + " faces)")
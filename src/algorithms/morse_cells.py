@@ -17,35 +17,38 @@
 """
 
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 
 from .datastructures import Cell, MorseCells
+from .paths import path_array
+from .parallel import get_n_workers, map_chunks
 
 def get_boundary(MorseComplex, vert_dict, edge_dict, face_dict):
     bd_points = set()
     
     for vert_ind in MorseComplex.CritVertices.keys():
         bd_points.add(vert_ind)
-        vert_dict[vert_ind].boundary = True
     for edge in MorseComplex.CritEdges.values():
         minima = Counter(edge.connected_minima)
         for mini, nb in minima.items():
             if nb == 1:
-                for count, elt in enumerate(edge.paths[mini]):
+                for count, elt in enumerate(path_array(edge.paths[mini]).tolist()):
                     # only need to add edge indices, cause the vertices in 
                     # between are alread considered then
                     if count%2 == 0:
                         bd_points.update(edge_dict[elt].indices)
-                        for ind in edge_dict[elt].indices:
-                            vert_dict[ind].boundary = True
             if nb == 2:
                 for i in range(2):
-                    for count, elt in enumerate(edge.paths[mini][i]):
+                    for count, elt in enumerate(path_array(edge.paths[mini][i]).tolist()):
                         # only need to add edge indices, cause the vertices 
                         # in between are alread considered then
                         if count%2 == 0:
                             bd_points.update(edge_dict[elt].indices)
-                            for ind in edge_dict[elt].indices:
-                                vert_dict[ind].boundary = True
                         
     # only add faces of the path, as edges should be contained that way already
     '''new: only one of the faces added as bd '''
@@ -53,100 +56,75 @@ def get_boundary(MorseComplex, vert_dict, edge_dict, face_dict):
         saddles = Counter(face.connected_saddles)
         for sad, nb in saddles.items():
             if nb==1:
-                for count, elt in enumerate(face.paths[sad]):
+                for count, elt in enumerate(path_array(face.paths[sad]).tolist()):
                     if count%2 == 0: # add all faces
                         bd_points.add(face_dict[elt].get_max_fun_val_index())
-                        vert_dict[face_dict[elt].get_max_fun_val_index()].boundary = True
                     elif count%2 == 1: # add all edges
                         bd_points.add(edge_dict[elt].get_max_fun_val_index())
-                        vert_dict[edge_dict[elt].get_max_fun_val_index()].boundary = True
             if nb==2:
                 for i in range(2):
-                    for count, elt in enumerate(face.paths[sad][i]):
+                    for count, elt in enumerate(path_array(face.paths[sad][i]).tolist()):
                         if count%2 == 0: # add all faces
                             bd_points.add(face_dict[elt].get_max_fun_val_index())
-                            vert_dict[face_dict[elt].get_max_fun_val_index()].boundary = True
                         elif count%2 == 1: # add all edges
                             bd_points.add(edge_dict[elt].get_max_fun_val_index())
-                            vert_dict[edge_dict[elt].get_max_fun_val_index()].boundary = True
                         
     return bd_points                
 
-def get_morse_cells(MorseComplex, vert_dict, edge_dict, face_dict):
-    if MorseComplex._flag_MorseCells == True:
-        print("Morse cells have been computed for this persistence "
-              "already, but will be overwritten now.")
-        MorseComplex.MorseCells = MorseCells()
-        
-    # boundary_points stored in a set. contains all vert that are either 
-    # boundary themselves or contained in a boundary edge or face
-    boundary_points = get_boundary(MorseComplex, vert_dict, edge_dict, face_dict)
-    
-    # find cells and label without looking at boundary points
-    label = 1 # start labelling with label 1
-    for vert in vert_dict.values():
-        if vert.boundary or vert.label != -1:
-            continue
-        else:
-            MorseComplex.MorseCells.add_cell(Cell(label))
-            
-            queue = set()
-            queue.add(vert)
-            
-            while len(queue) != 0:
-                # pop one elt from queue
-                queue_elt = queue.pop()
-                queue_elt.label = label
-                
-                for ind in queue_elt.neighbors:
-                    # only treat non boundary points:
-                    if vert_dict[ind].boundary == False:
-                        # two cases: 1. unlabelled; 2. already labeled
-                        # so if not unlabelled or the same label, sth went wrong
-                        if vert_dict[ind].label == -1:
-                            queue.add(vert_dict[ind])
-                        elif vert_dict[ind].label != label:
-                            raise ValueError("Trying to find Morse cells, but seem to "
-                                             "have an open cell... "
-                                             "(dont know what went wrong)")
-                # add popped elt to current Morse cell
-                MorseComplex.MorseCells.add_vertex_to_label(label, queue_elt.index)
-            # worked down the whole queue -> continue with next cell
-            label +=1
-    
-    second_it = set()
-    # now treat boundary points:
-    for bd_ind in boundary_points:
-        if vert_dict[bd_ind].label != -1:
-            print("ind ", bd_ind, " has label ", vert_dict[bd_ind].label)
+def neighbor_labels(index: int, vert_dict: dict, labels: np.ndarray) -> tuple:
+    """! @brief Gives the occuring neighbor labels and a list of the occurences 
+    (see Vertex.has_neighbor_label), using a label array instead of the 
+    labels stored in the vertices.
+
+    @param index The vertex index.
+    @param vert_dict A dictionary containing the vertices of the mesh.
+    @param labels Numpy array of the vertex labels, -1 for unlabelled.
+    @return neighbor_labels, neighbor_indices A set of the occuring labels in the 
+            1-ring neighborhood and a list of (index, label) 
+            tuples giving the occurences.
+    """
+    neighbor_labels = set()
+    neighbor_indices = []
+    for elt in vert_dict[index].neighbors:
+        if labels[elt] != -1 and labels[elt] != labels[index]:
+            neighbor_indices.append([elt, int(labels[elt])])
+            neighbor_labels.add(int(labels[elt]))
+    return neighbor_labels, neighbor_indices
+
+def _label_boundary_points(MorseComplex, points, vert_dict: dict, labels: np.ndarray) -> set:
+    """! @brief Adds the boundary points with labelled neighbors to the Morse 
+    cells (one pass of get_morse_cells).
+    @return The set of points that had no labelled neighbors.
+    """
+    unlabelled = set()
+    for bd_ind in points:
+        if labels[bd_ind] != -1:
+            print("ind ", bd_ind, " has label ", labels[bd_ind])
             raise ValueError("Should not be possible to have a labelled "
                              "vertex in the unlabelled bd_pts...")
         # check surrounding for other labels
         # neighb_labels is set of neighboring labels
         # neighb_ind is list of [elt, label] tuples of the neighboring labels
-        neighb_labels, neighb_ind = vert_dict[bd_ind].has_neighbor_label(vert_dict)
+        neighb_labels, neighb_ind = neighbor_labels(bd_ind, vert_dict, labels)
         # Cases:
         # 1. no labelled neighbors -> surrounded by other bd pts -> add for 
-        #    second iteration and continue for now
+        #    next iteration and continue for now
         # 2. one neighbor label -> this point can be added to that label 
         #    and marked as no bd
         # 3. more than one label -> add as neighbors and boundary of the cells
         if len(neighb_labels) == 0:
-            second_it.add(bd_ind)
+            unlabelled.add(bd_ind)
             continue
         elif len(neighb_labels) == 1:
-            vert_dict[bd_ind].boundary = False
-            vert_dict[bd_ind].label = neighb_ind[0][1]
+            labels[bd_ind] = neighb_ind[0][1]
             MorseComplex.MorseCells.add_vertex_to_label(neighb_ind[0][1], bd_ind)
         else:
             counts = Counter([t[1] for t in neighb_ind])
             most_common_label = counts.most_common(1)[0][0]
             
-            vert_dict[bd_ind].label = most_common_label
+            labels[bd_ind] = most_common_label
             MorseComplex.MorseCells.add_vertex_to_label(most_common_label, bd_ind)
-            #MorseComplex.MorseCells[most_common_label].vertices.add(bd_ind)
             MorseComplex.MorseCells.add_boundary_to_label(most_common_label, bd_ind)
-            #MorseComplex.MorseCells[most_common_label].boundary.add(bd_ind)
             
             for elt_ind, elt_label in neighb_ind:
                 if elt_label != most_common_label:
@@ -154,100 +132,273 @@ def get_morse_cells(MorseComplex, vert_dict, edge_dict, face_dict):
                                                                         bd_ind, 
                                                                         elt_label, 
                                                                         elt_ind)
+    return unlabelled
+
+def get_morse_cells(MorseComplex, vert_dict, edge_dict, face_dict):
+    """! @brief Computes the Morse cells of a Morse complex by flooding the 
+    mesh and stores them in its MorseCells.
+
+    @details The labels and boundary flags are kept in arrays of this call, 
+    the Vertex objects are not changed, so several complexes can be 
+    processed at the same time.
+    """
+    if MorseComplex._flag_MorseCells == True:
+        print("Morse cells have been computed for this persistence "
+              "already, but will be overwritten now.")
+        MorseComplex.MorseCells = MorseCells()
+        
+    # boundary_points stored in a set. contains all vert that are either 
+    # boundary themselves or contained in a boundary edge or face
+    boundary_points = get_boundary(MorseComplex, vert_dict, edge_dict, face_dict)
+    labels = np.full(len(vert_dict), -1, dtype=np.int64)
+    boundary = np.zeros(len(vert_dict), dtype=bool)
+    boundary[list(boundary_points)] = True
     
-    count_no_label_after_2it = 0
-    third_it = set()
-    # now treat boundary points in second iteration that had no 
-    # labelled neighbors before:
-    for bd_ind in second_it:
-        if vert_dict[bd_ind].label != -1:
-            raise ValueError("Should not be possible to have a labelled "
-                             "vertex in the unlabelled bd_pts...")
-        # check surrounding for other labels
-        # neighb_labels is set of neighboring labels
-        # neighb_ind is list of [elt, label] tuples of the neighboring labels
-        neighb_labels, neighb_ind = vert_dict[bd_ind].has_neighbor_label(vert_dict)
-        # Cases:
-        # 1. no labelled neighbors -> surrounded by other bd pts -> continue for now
-        # 2. one neighbor label -> this point can be added to 
-        #    that label and marked as no bd
-        # 3. more than one label -> add as neighbors and boundary of the cells
-        if len(neighb_labels) == 0:
-            third_it.add(bd_ind)
-            count_no_label_after_2it += 1
-            continue
-        elif len(neighb_labels) == 1:
-            vert_dict[bd_ind].boundary = False
-            vert_dict[bd_ind].label = neighb_ind[0][1]
-            MorseComplex.MorseCells.add_vertex_to_label(neighb_ind[0][1], bd_ind)
-            #MorseComplex.MorseCells[neighb_ind[0][1]].vertices.add(bd_ind)
-        else:
-            counts = Counter([t[1] for t in neighb_ind])
-            most_common_label = counts.most_common(1)[0][0]
-            
-            vert_dict[bd_ind].label = most_common_label
-            MorseComplex.MorseCells.add_vertex_to_label(most_common_label, bd_ind)
-            #MorseComplex.MorseCells[most_common_label].vertices.add(bd_ind)
-            MorseComplex.MorseCells.add_boundary_to_label(most_common_label, bd_ind)
-            #MorseComplex.MorseCells[most_common_label].boundary.add(bd_ind)
-            
-            for elt_ind, elt_label in neighb_ind:
-                if elt_label != most_common_label:
-                    MorseComplex.MorseCells.add_neighboring_cell_labels(most_common_label, 
-                                                                        bd_ind, 
-                                                                        elt_label, 
-                                                                        elt_ind)
-                    
-    count_no_label_after_3it = 0
-    # now treat boundary points in second iteration that had 
-    # no labelled neighbors before:
-    for bd_ind in third_it:
-        if vert_dict[bd_ind].label != -1:
-            raise ValueError("Should not be possible to have a labelled "
-                             "vertex in the unlabelled bd_pts...")
-        # check surrounding for other labels
-        # neighb_labels is set of neighboring labels
-        # neighb_ind is list of [elt, label] tuples of the neighboring labels
-        neighb_labels, neighb_ind = vert_dict[bd_ind].has_neighbor_label(vert_dict)
-        # Cases:
-        # 1. no labelled neighbors -> surrounded by other bd pts -> continue for now
-        # 2. one neighbor label -> this point can be added to that 
-        #    label and marked as no bd
-        # 3. more than one label -> add as neighbors and boundary of the cells
-        if len(neighb_labels) == 0:
-            count_no_label_after_3it += 1
+    # find cells and label without looking at boundary points
+    label = 1 # start labelling with label 1
+    for vert in vert_dict.values():
+        if boundary[vert.index] or labels[vert.index] != -1:
             continue
-        elif len(neighb_labels) == 1:
-            vert_dict[bd_ind].boundary = False
-            vert_dict[bd_ind].label = neighb_ind[0][1]
-            MorseComplex.MorseCells.add_vertex_to_label(neighb_ind[0][1], bd_ind)
-            #MorseComplex.MorseCells[neighb_ind[0][1]].vertices.add(bd_ind)
         else:
-            counts = Counter([t[1] for t in neighb_ind])
-            most_common_label = counts.most_common(1)[0][0]
+            MorseComplex.MorseCells.add_cell(Cell(label))
             
-            vert_dict[bd_ind].label = most_common_label
-            MorseComplex.MorseCells.add_vertex_to_label(most_common_label, bd_ind)
-            #MorseComplex.MorseCells[most_common_label].vertices.add(bd_ind)
-            MorseComplex.MorseCells.add_boundary_to_label(most_common_label, bd_ind)
-            #MorseComplex.MorseCells[most_common_label].boundary.add(bd_ind)
+            queue = set()
+            queue.add(vert.index)
             
-            for elt_ind, elt_label in neighb_ind:
-                if elt_label != most_common_label:
-                    MorseComplex.MorseCells.add_neighboring_cell_labels(most_common_label, 
-                                                                        bd_ind, 
-                                                                        elt_label, 
-                                                                        elt_ind)
+            while len(queue) != 0:
+                # pop one elt from queue
+                queue_ind = queue.pop()
+                labels[queue_ind] = label
+                
+                for ind in vert_dict[queue_ind].neighbors:
+                    # only treat non boundary points:
+                    if not boundary[ind]:
+                        # two cases: 1. unlabelled; 2. already labeled
+                        # so if not unlabelled or the same label, sth went wrong
+                        if labels[ind] == -1:
+                            queue.add(ind)
+                        elif labels[ind] != label:
+                            raise ValueError("Trying to find Morse cells, but seem to "
+                                             "have an open cell... "
+                                             "(dont know what went wrong)")
+                # add popped elt to current Morse cell
+                MorseComplex.MorseCells.add_vertex_to_label(label, queue_ind)
+            # worked down the whole queue -> continue with next cell
+            label +=1
+    
+    # now treat boundary points in (at most) three iterations, points 
+    # without labelled neighbors are postponed to the next one
+    unlabelled = boundary_points
+    for _ in range(3):
+        unlabelled = _label_boundary_points(MorseComplex, unlabelled, vert_dict, labels)
     
-    if count_no_label_after_3it > 0:
-        print("Have ", count_no_label_after_3it, " boundary points "
+    if len(unlabelled) > 0:
+        print("Have ", len(unlabelled), " boundary points "
               "that could not be labelled in 3 iterations...")
     
-    # cleanup: 
-    # mark that we have Morse cells for this complex and
-    # need to reset boundary and labels as they are only part of the original mesh class
+    # mark that we have Morse cells for this complex
+    MorseComplex._flag_MorseCells = True
+    return MorseComplex.MorseCells
+
+
+def _iter_paths(paths: dict, connected: list):
+    """! @brief Yields the single paths of a paths dictionary (paths to an 
+    extremum connected twice are stored as list of two paths).
+    """
+    for extremum, nb in Counter(connected).items():
+        if nb == 1:
+            yield paths[extremum]
+        elif nb == 2:
+            yield from paths[extremum]
+
+def get_boundary_mask(MorseComplex, mesh_arrays) -> np.ndarray:
+    """! @brief Gives the vertices on the separatrices of the Morse complex 
+    as boolean mask (see get_boundary).
+    
+    @param MorseComplex The Morse complex.
+    @param mesh_arrays The MeshArrays object of the mesh.
+    
+    @return Boolean numpy array over the vertices.
+    """
+    boundary = np.zeros(mesh_arrays.n_vertices, dtype=bool)
+    boundary[np.fromiter(MorseComplex.CritVertices.keys(), dtype=np.int64, 
+                         count=len(MorseComplex.CritVertices))] = True
+    
+    # minimal lines: all vertices of the edges
+    edge_paths = [path_array(path)[::2] for crit_edge in MorseComplex.CritEdges.values() 
+                  for path in _iter_paths(crit_edge.paths, crit_edge.connected_minima)]
+    if edge_paths:
+        boundary[mesh_arrays.edges[np.concatenate(edge_paths)].ravel()] = True
+    
+    # maximal lines: only the highest vertex of the faces and edges
+    face_paths = [path_array(path) for crit_face in MorseComplex.CritFaces.values() 
+                  for path in _iter_paths(crit_face.paths, crit_face.connected_saddles)]
+    if face_paths:
+        boundary[mesh_arrays.face_max_index[np.concatenate([path[::2] for path in face_paths])]] = True
+        boundary[mesh_arrays.edge_max_index[np.concatenate([path[1::2] for path in face_paths])]] = True
+    return boundary
+
+def label_morse_cells(MorseComplex, mesh_arrays) -> dict:
+    """! @brief Labels the Morse cells of a Morse complex on vertex arrays.
+    
+    @details The vertices not on a separatrix are labelled by the connected 
+    components of the one-ring graph restricted to them. Labels start at 1 
+    and are ordered by the smallest vertex of the cell, as in get_morse_cells. 
+    Then the separatrix vertices are labelled in rounds: in each round every 
+    unlabelled vertex with labelled neighbors takes the most common label 
+    of them (the smallest label for ties). Finally every mesh edge whose 
+    endpoints got different labels is a contact of the two cells and both 
+    endpoints are boundary vertices (including edges between two separatrix 
+    vertices labelled in the same round). Nothing is written to the Vertex 
+    objects of the mesh.
+    
+    This is the boundary get_morse_cells records as well: it labels the 
+    separatrix vertices one at a time, so every edge between two cells is 
+    added (with both endpoints) when its later endpoint is labelled. The 
+    boundaries, and with them the weights of the segmentation, only differ 
+    where the separatrix vertices get different labels, as a round labels 
+    all its vertices at once from the labels of the previous rounds.
+    
+    @param MorseComplex The Morse complex.
+    @param mesh_arrays The MeshArrays object of the mesh.
+    
+    @return Dictionary with "labels" (numpy array, -1 for vertices that 
+            could not be labelled), "n_labels", "boundary" (boolean numpy 
+            array of the cell boundary vertices) and "contacts" (numpy array 
+            of (label1, vertex1, label2, vertex2) rows: vertex1 with label1 
+            borders vertex2 with label2).
+    """
+    return label_cells(get_boundary_mask(MorseComplex, mesh_arrays), mesh_arrays.edges)
+
+def label_cells(separatrix: np.ndarray, edges: np.ndarray) -> dict:
+    """! @brief Labels the Morse cells given by the separatrix vertices (see 
+    label_morse_cells). Only needs arrays, so it can run in a worker process 
+    with the edges in shared memory.
+    
+    @param separatrix Boolean numpy array, True for the vertices on a 
+           separatrix (see get_boundary_mask).
+    @param edges Numpy array (n_edges, 2) with the vertex indices of the edges.
+    
+    @return Dictionary as label_morse_cells.
+    """
+    n = len(separatrix)
+    
+    # 1. connected components of the vertices not on separatrices
+    inner = ~separatrix[edges[:, 0]] & ~separatrix[edges[:, 1]]
+    graph = csr_matrix((np.ones(int(inner.sum()), dtype=np.int8), 
+                        (edges[inner, 0], edges[inner, 1])), shape=(n, n))
+    _, components = connected_components(graph, directed=False)
+    interior = np.flatnonzero(~separatrix)
+    _, first, inverse = np.unique(components[interior], return_index=True, return_inverse=True)
+    # order the labels by the smallest vertex of each cell
+    order = np.empty(len(first), dtype=np.int64)
+    order[np.argsort(first, kind="stable")] = np.arange(len(first))
+    labels = np.full(n, -1, dtype=np.int64)
+    labels[interior] = order[inverse] + 1
+    n_labels = len(first)
+    
+    # 2. label the separatrix vertices in rounds by majority vote
+    sources = np.concatenate((edges[:, 0], edges[:, 1]))
+    targets = np.concatenate((edges[:, 1], edges[:, 0]))
+    while True:
+        candidate = (labels[sources] == -1) & (labels[targets] != -1)
+        if not candidate.any():
+            break
+        u = sources[candidate]
+        w = targets[candidate]
+        neighbor_labels = labels[w]
+        keys, counts = np.unique(u * (n_labels + 1) + neighbor_labels, return_counts=True)
+        key_vertices = keys // (n_labels + 1)
+        key_labels = keys % (n_labels + 1)
+        # most common label per vertex, smallest label for ties
+        order = np.lexsort((key_labels, -counts, key_vertices))
+        is_first = np.ones(len(order), dtype=bool)
+        is_first[1:] = key_vertices[order][1:] != key_vertices[order][:-1]
+        new_vertices = key_vertices[order][is_first]
+        new_labels = key_labels[order][is_first]
+        labels[new_vertices] = new_labels
+    
+    # 3. cells border each other along the edges with differently labelled 
+    # endpoints (one of them is always on a separatrix, as the interior 
+    # vertices of a cell are connected)
+    contact = ((labels[sources] != labels[targets]) & (labels[sources] != -1) 
+               & (labels[targets] != -1))
+    u = sources[contact]
+    w = targets[contact]
+    contacts = np.unique(np.stack((labels[u], u, labels[w], w), axis=1), axis=0)
+    boundary = np.zeros(n, dtype=bool)
+    boundary[u] = True
+    boundary[w] = True
+    
+    unlabelled = int(np.count_nonzero(labels == -1))
+    if unlabelled > 0:
+        print("Have ", unlabelled, " boundary points that could not be labelled...")
+    return {"labels": labels, "n_labels": n_labels, "boundary": boundary, "contacts": contacts}
+
+def _label_cells_chunk(arrays: dict, separatrix: np.ndarray) -> dict:
+    """! @brief Runs label_cells in a worker (see parallel.map_chunks)."""
+    return label_cells(separatrix, arrays["edges"])
+
+def label_cells_concurrently(separatrix_masks: list, 
+                             edges: np.ndarray, 
+                             n_workers: int = None, 
+                             use_processes: bool = False) -> list:
+    """! @brief Runs label_cells for several separatrix masks concurrently.
+    
+    @param separatrix_masks List of boolean numpy arrays (see get_boundary_mask).
+    @param edges Numpy array (n_edges, 2) with the vertex indices of the edges.
+    @param n_workers (Optional) Number of threads or processes. Default is 
+           None, which uses all cores.
+    @param use_processes (Optional) Whether to use processes, which get only 
+           the masks and attach to the edges in shared memory (see 
+           parallel.map_chunks). Default is False, which uses threads.
+    
+    @return List of dictionaries as label_morse_cells, one per mask.
+    """
+    if use_processes:
+        return map_chunks(_label_cells_chunk, {"edges": edges}, 
+                          [(mask,) for mask in separatrix_masks], n_workers=n_workers)
+    n_workers = min(get_n_workers(n_workers), max(len(separatrix_masks), 1))
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(label_cells, separatrix_masks, itertools.repeat(edges)))
+
+def morse_cells_from_labels(cells: dict) -> MorseCells:
+    """! @brief Creates the MorseCells object from the result of label_morse_cells.
+    
+    @param cells Dictionary as returned by label_morse_cells.
+    
+    @return The MorseCells object.
+    """
+    morse_cells = MorseCells()
+    labels = cells["labels"]
+    
+    # group vertices by label
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(1, cells["n_labels"] + 2))
+    for label in range(1, cells["n_labels"] + 1):
+        cell = Cell(label)
+        cell.vertices = set(order[bounds[label - 1]:bounds[label]].tolist())
+        morse_cells.add_cell(cell)
+    
+    boundary = np.flatnonzero(cells["boundary"])
+    for label, index in zip(labels[boundary].tolist(), boundary.tolist()):
+        morse_cells.Cells[label].boundary.add(index)
+    for label1, v1, label2, v2 in cells["contacts"].tolist():
+        morse_cells.add_neighboring_cell_labels(label1, v1, label2, v2)
+    return morse_cells
+
+def get_morse_cells_arrays(MorseComplex, mesh_arrays):
+    """! @brief Computes the Morse cells of a Morse complex using the vertex 
+    arrays (see label_morse_cells) and stores them in its MorseCells.
+    
+    @param MorseComplex The Morse complex.
+    @param mesh_arrays The MeshArrays object of the mesh.
+    
+    @return The MorseCells object of the Morse complex.
+    """
+    if MorseComplex._flag_MorseCells == True:
+        print("Morse cells have been computed for this persistence "
+              "already, but will be overwritten now.")
+    MorseComplex.MorseCells = morse_cells_from_labels(label_morse_cells(MorseComplex, mesh_arrays))
     MorseComplex._flag_MorseCells = True
-    for vertex in vert_dict.values():
-        vertex.boundary = False
-        vertex.label = -1
     return MorseComplex.MorseCells
@@ -0,0 +1,153 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file parallel.py
+#
+# @brief Helpers to run array algorithms on chunks in a process pool.
+#
+# @section description_parallel Description
+# The input arrays are placed in shared memory once, so the worker processes
+# can read them without pickling. Each worker process attaches to the shared
+# memory in its initializer and then runs the given function on chunks. The
+# results are returned in the order of the chunks, so merging them is
+# deterministic.
+#
+# @section libraries_parallel Libraries/Modules
+# - os standard library
+# - concurrent.futures standard library
+# - multiprocessing.shared_memory standard library
+# - numpy standard library
+
+# imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+## Arrays of the current worker process, attached in _init_worker.
+_worker_arrays = {}
+## Shared memory handles of the current worker process (kept alive).
+_worker_handles = []
+
+def get_n_workers(n_workers: int = None) -> int:
+    """! @brief Gives the number of worker processes to use.
+    @param n_workers The requested number. None or values < 1 use all cores.
+    @return The number of worker processes.
+    """
+    if n_workers is None or n_workers < 1:
+        return os.cpu_count() or 1
+    return n_workers
+
+def chunk_ranges(ptr: np.ndarray, n_chunks: int) -> list:
+    """! @brief Splits the rows of a CSR pointer array into contiguous chunks
+    with about the same number of entries.
+    @param ptr The CSR pointer array (length number of rows + 1).
+    @param n_chunks The number of chunks.
+    @return A list of (first row, end row) tuples covering all rows.
+    """
+    n_rows = len(ptr) - 1
+    targets = np.linspace(0, ptr[-1], n_chunks + 1)[1:-1]
+    bounds = np.unique(np.concatenate(([0], np.searchsorted(ptr, targets), [n_rows])))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+class SharedArrays:
+    """! @brief Copies a dictionary of numpy arrays into shared memory.
+
+    @details Use as context manager, the shared memory is released on exit.
+    The spec attribute can be passed to worker processes to attach to
+    the arrays (see attach_shared_arrays).
+    """
+    ## @var spec
+    # Dictionary name -> (shared memory name, shape, dtype string).
+    ## @var handles
+    # The SharedMemory objects owned by this object.
+
+    def __init__(self, arrays: dict):
+        """! @brief Creates the shared memory blocks and copies the arrays.
+        @param arrays Dictionary of numpy arrays.
+        """
+        self.spec = {}
+        self.handles = []
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            self.handles.append(shm)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            self.spec[name] = (shm.name, arr.shape, arr.dtype.str)
+
+    def close(self):
+        """! @brief Releases the shared memory blocks."""
+        for shm in self.handles:
+            shm.close()
+            shm.unlink()
+        self.handles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def attach_shared_arrays(spec: dict, handles: list) -> dict:
+    """! @brief Attaches to arrays created by SharedArrays.
+    @param spec The spec attribute of a SharedArrays object.
+    @param handles A list the SharedMemory handles are appended to. They have
+           to be kept alive as long as the arrays are used.
+    @return Dictionary of numpy arrays backed by the shared memory.
+    """
+    arrays = {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return arrays
+
+def _init_worker(spec: dict):
+    _worker_arrays.update(attach_shared_arrays(spec, _worker_handles))
+
+def _run_worker(function, chunk, kwargs):
+    return function(_worker_arrays, *chunk, **kwargs)
+
+def map_chunks(function, arrays: dict, chunks: list, n_workers: int = None, **kwargs) -> list:
+    """! @brief Runs function(arrays, *chunk, **kwargs) for every chunk.
+
+    @details With more than one worker the arrays are put into shared memory
+    and the chunks are distributed over a process pool. The function has to
+    be defined at module level (picklable) and must not write to the arrays.
+
+    @param function The function to be run on each chunk.
+    @param arrays Dictionary of numpy arrays read by the function.
+    @param chunks A list of argument tuples, one per chunk.
+    @param n_workers The number of worker processes (None uses all cores).
+    @param kwargs Further keyword arguments passed to the function.
+
+    @return The list of results in the order of the chunks.
+    """
+    n_workers = min(get_n_workers(n_workers), len(chunks))
+    if n_workers <= 1:
+        return [function(arrays, *chunk, **kwargs) for chunk in chunks]
+
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 initializer=_init_worker,
+                                 initargs=(shared.spec,)) as pool:
+            futures = [pool.submit(_run_worker, function, chunk, kwargs) for chunk in chunks]
+            return [future.result() for future in futures]
@@ -0,0 +1,272 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file paths.py
+#
+# @brief Contains the Path class, a read-only list view on a flat buffer of
+# simplex indices used to store separatrix paths, and the PathRope class,
+# which concatenates paths without copying them.
+#
+# @section description_paths Description
+# All paths found by extract_morse_complex_arrays are stored back to back in
+# one integer array. A Path only stores the buffer and its start and stop
+# offsets, but behaves like the list of indices it represents (len,
+# indexing, slicing, iteration, concatenation with lists), so the
+# reduction and segmentation code can use it like the legacy lists.
+#
+# Cancelling critical pairs joins paths (new saddle to old minimum, old
+# minimum to old saddle reversed, old saddle to new minimum). A PathRope
+# stores such a path as a sequence of references to (parts of, possibly
+# reversed) immutable paths, so joining costs O(number of parts) instead of
+# copying all indices. It is only turned into an index array (path_array)
+# when the indices are actually needed.
+#
+# @section libraries_paths Libraries/Modules
+# - numpy standard library
+
+# imports
+import numpy as np
+
+class Path:
+    """! @brief Read-only list view on a part of a flat index buffer.
+
+    @details Slicing returns a normal list, concatenation a PathRope. Since 
+    a Path cannot be changed, copying it (also with deepcopy) returns the 
+    same object.
+    """
+    ## @var buffer
+    # The flat numpy array containing the indices of many paths.
+    ## @var start
+    # The offset of the first index of this path in the buffer.
+    ## @var stop
+    # The offset after the last index of this path in the buffer.
+
+    __slots__ = ("buffer", "start", "stop")
+
+    def __init__(self, buffer: np.ndarray, start: int, stop: int):
+        """! @brief The constructor of a Path.
+        @param buffer The flat numpy index array.
+        @param start The offset of the first index of this path.
+        @param stop The offset after the last index of this path.
+        """
+        self.buffer = buffer
+        self.start = start
+        self.stop = stop
+
+    def tolist(self) -> list:
+        """! @brief Gives the path as list.
+        @return A list of the simplex indices of the path.
+        """
+        return self.buffer[self.start:self.stop].tolist()
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.tolist()[key]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("Path index out of range")
+        return int(self.buffer[self.start + key])
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __reversed__(self):
+        return reversed(self.tolist())
+
+    def __contains__(self, index) -> bool:
+        return index in self.tolist()
+
+    def toarray(self) -> np.ndarray:
+        """! @brief Gives the path as numpy array (a view on the buffer).
+        @return A numpy array of the simplex indices of the path.
+        """
+        return self.buffer[self.start:self.stop]
+
+    def __add__(self, other):
+        return concat_paths(self, other)
+
+    def __radd__(self, other):
+        return concat_paths(other, self)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Path, PathRope, list)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __hash__(self):
+        # equal paths (also a Path and a PathRope) have the same indices
+        return hash(tuple(self.tolist()))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return "Path(" + str(self.tolist()) + ")"
+
+
+class PathRope:
+    """! @brief Immutable path given by a concatenation of parts of other paths.
+
+    @details The parts are (source, start, stop, reverse) tuples, where
+    source is a Path, PathRope or list that is never changed afterwards.
+    Joining ropes therefore never copies indices, ropes can share parts
+    with each other (they form a DAG). The index array is computed on
+    demand by walking the parts and is cached.
+    """
+    ## @var parts
+    # Tuple of (source, start, stop, reverse) tuples.
+    ## @var length
+    # The number of indices in the path.
+    ## @var _array
+    # The cached index array or None.
+
+    __slots__ = ("parts", "length", "_array")
+
+    def __init__(self, parts: tuple):
+        """! @brief The constructor of a PathRope.
+        @param parts Tuple of (source, start, stop, reverse) tuples, each
+               giving the indices source[start:stop] (reversed if reverse).
+        """
+        self.parts = tuple(part for part in parts if part[2] > part[1])
+        self.length = sum(stop - start for _, start, stop, _ in self.parts)
+        self._array = None
+
+    def toarray(self) -> np.ndarray:
+        """! @brief Gives the path as numpy array.
+        @return A numpy array of the simplex indices of the path.
+        """
+        if self._array is None:
+            chunks = list(_iter_chunks(self, 0, self.length, False))
+            if chunks:
+                self._array = np.concatenate(chunks)
+            else:
+                self._array = np.zeros(0, dtype=np.int64)
+        return self._array
+
+    def tolist(self) -> list:
+        """! @brief Gives the path as list.
+        @return A list of the simplex indices of the path.
+        """
+        return self.toarray().tolist()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.tolist()[key]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("Path index out of range")
+        return int(self.toarray()[key])
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __reversed__(self):
+        return reversed(self.tolist())
+
+    def __contains__(self, index) -> bool:
+        return index in self.tolist()
+
+    def __add__(self, other):
+        return concat_paths(self, other)
+
+    def __radd__(self, other):
+        return concat_paths(other, self)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Path, PathRope, list)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self.tolist()))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return "PathRope(" + str(self.tolist()) + ")"
+
+def _iter_chunks(source, start: int, stop: int, reverse: bool):
+    """! @brief Yields the index arrays of source[start:stop] (reversed if
+    reverse) in order, walking nested ropes with a stack instead of recursion.
+    """
+    stack = [(source, start, stop, reverse)]
+    while stack:
+        source, start, stop, reverse = stack.pop()
+        if isinstance(source, PathRope) and source._array is None:
+            children = []
+            offset = 0
+            for child, c_start, c_stop, c_reverse in source.parts:
+                n = c_stop - c_start
+                low = max(start - offset, 0)
+                high = min(stop - offset, n)
+                if low < high:
+                    if c_reverse:
+                        children.append((child, c_stop - high, c_stop - low, not reverse))
+                    else:
+                        children.append((child, c_start + low, c_start + high, reverse))
+                offset += n
+            # the stack pops the last element first
+            if not reverse:
+                children.reverse()
+            stack.extend(children)
+        else:
+            if isinstance(source, (Path, PathRope)):
+                chunk = source.toarray()[start:stop]
+            else:
+                chunk = np.asarray(source[start:stop], dtype=np.int64)
+            yield chunk[::-1] if reverse else chunk
+
+def concat_paths(*paths) -> PathRope:
+    """! @brief Concatenates paths without copying their indices.
+    @param paths Paths (Path, PathRope or list objects).
+    @return A PathRope of the concatenated paths.
+    """
+    return PathRope(tuple((path, 0, len(path), False) for path in paths))
+
+def reversed_inner_path(path) -> PathRope:
+    """! @brief Gives the path reversed and without its first and last index
+    (path[1:-1][::-1]) without copying its indices.
+    @param path A Path, PathRope or list.
+    @return A PathRope of the reversed inner path.
+    """
+    return PathRope(((path, 1, len(path) - 1, True),))
+
+def path_array(path) -> np.ndarray:
+    """! @brief Gives the indices of a path as numpy array.
+    @param path A Path, PathRope or list.
+    @return A numpy array of the simplex indices of the path.
+    """
+    if isinstance(path, (Path, PathRope)):
+        return path.toarray()
+    return np.asarray(path, dtype=np.int64)
@@ -0,0 +1,148 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file persistence_hierarchy.py
+#
+# @brief Contains the PersistenceHierarchy class, which stores the ordered
+# cancellations of one reduction and gives reduced Morse complexes for any
+# lower persistence.
+#
+# @section description_persistence_hierarchy Description
+# The Morse complex is reduced once up to the largest persistence of interest
+# while all cancellations are recorded. The complex at a lower persistence is
+# then obtained by replaying the cancellations below that persistence, which
+# needs no cancellation queue and no distance computations. Replayed
+# complexes are cached by the number of cancellations, so a sweep over
+# increasing persistences only replays each cancellation once.
+#
+# @section libraries_persistence_hierarchy Libraries/Modules
+# - numpy standard library
+# - reduce_morse_complex
+
+# imports
+import numpy as np
+
+from .reduce_morse_complex import cancel_critical_pairs, cancel_critical_conforming_pairs
+from .reduce_morse_complex import replay_cancellations
+
+class PersistenceHierarchy:
+    """! @brief The ordered cancellations of a Morse complex up to a persistence.
+    """
+    ## @var MorseComplex
+    # The unreduced Morse complex the cancellations start from.
+    ## @var persistence
+    # The persistence up to which the Morse complex was reduced.
+    ## @var conforming
+    # Boolean whether the conforming cancellations (respecting user labels)
+    # were used.
+    ## @var cancellations
+    # List of (persistence, saddle index, extremum index, extremum dimension)
+    # tuples in the order of cancellation.
+    ## @var persistences
+    # Numpy array with the running maximum of the cancellation persistences,
+    # used to find the cancellations below a given persistence.
+    ## @var _prefix_complexes
+    # Dictionary number of cancellations -> reduced Morse complex.
+
+    def __init__(self,
+                 MorseComplex,
+                 persistence: float,
+                 vert_dict: dict,
+                 edge_dict: dict,
+                 face_dict: dict,
+                 labels: dict = None,
+                 mesh_arrays=None):
+        """! @brief Reduces the Morse complex up to the persistence and records
+        the cancellations.
+
+        @param MorseComplex The unreduced Morse complex.
+        @param persistence The persistence up to which the complex is reduced.
+        @param vert_dict The dictionary of Vertex objects.
+        @param edge_dict The dictionary of Simplex objects of the edges.
+        @param face_dict The dictionary of Simplex objects of the faces.
+        @param labels (Optional) User labels for the conforming cancellations.
+               Default is None, which uses the normal cancellations.
+        @param mesh_arrays (Optional) The MeshArrays object of the mesh, used
+               to compute the separatrix persistences in bulk.
+        """
+        self.MorseComplex = MorseComplex
+        self.persistence = persistence
+        self.conforming = labels is not None
+
+        self._vert_dict = vert_dict
+        self._edge_dict = edge_dict
+        self._face_dict = face_dict
+        self._mesh_arrays = mesh_arrays
+
+        self.cancellations = []
+        if self.conforming:
+            reduced = cancel_critical_conforming_pairs(MorseComplex, persistence,
+                                                       vert_dict, edge_dict, face_dict,
+                                                       labels,
+                                                       cancellations=self.cancellations,
+                                                       mesh_arrays=mesh_arrays)
+        else:
+            reduced = cancel_critical_pairs(MorseComplex, persistence,
+                                            vert_dict, edge_dict, face_dict,
+                                            cancellations=self.cancellations,
+                                            mesh_arrays=mesh_arrays)
+
+        self.persistences = np.maximum.accumulate(np.array([dist for dist, _, _, _ in self.cancellations],
+                                                           dtype=float))
+        self._prefix_complexes = {0: MorseComplex, len(self.cancellations): reduced}
+
+    def n_cancellations(self, persistence: float) -> int:
+        """! @brief Gives the number of cancellations below the persistence.
+        @param persistence The persistence.
+        @return The length of the prefix of cancellations to be applied.
+        """
+        if persistence >= self.persistence:
+            return len(self.cancellations)
+        return int(np.searchsorted(self.persistences, persistence, side="left"))
+
+    def reduced_complex(self, persistence: float):
+        """! @brief Gives the Morse complex reduced up to the persistence.
+
+        @details Replays the cancellations below the persistence, starting from
+        the largest cached prefix. The returned complex is a copy on write of
+        the cached one, so Morse cells and segmentations can be added to it.
+
+        @param persistence The persistence. Has to be at most the persistence
+               of the hierarchy.
+
+        @return The reduced MorseComplex object.
+        """
+        if persistence > self.persistence:
+            raise ValueError("The persistence hierarchy only reaches up to "
+                             + str(self.persistence) + "!")
+        n = self.n_cancellations(persistence)
+        if n not in self._prefix_complexes:
+            start = max(key for key in self._prefix_complexes.keys() if key <= n)
+            self._prefix_complexes[n] = replay_cancellations(self._prefix_complexes[start],
+                                                             self.cancellations[start:n],
+                                                             self._vert_dict,
+                                                             self._edge_dict,
+                                                             self._face_dict,
+                                                             mesh_arrays=self._mesh_arrays)
+        return self._prefix_complexes[n].copy_on_write(persistence=persistence)
+
+    def __repr__(self):
+        """! @brief Prints the persistence and number of cancellations."""
+        return ("PersistenceHierarchy(persistence=" + str(self.persistence)
+                + ", cancellations=" + str(len(self.cancellations)) + ")")
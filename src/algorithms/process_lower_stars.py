@@ -24,11 +24,22 @@
 # https://www.researchgate.net/publication/51131057_Theory_and_Algorithms_for_Constructing_Discrete_Morse_Complexes_from_Grayscale_Digital_Images
 #
 # @section libraries_process_lower_stars Libraries/Modules
+# - heapq standard library
+# - numpy standard library
 # - PriorityQueue module (local)
 #   - PriorityQueue
+# - mesh_arrays module (local)
+#   - need build_csr for the lower star arrays
+# - parallel module (local)
+#   - need map_chunks to process vertex chunks in a process pool
 
 # imports
+import heapq
+import numpy as np
+
 from .PriorityQueue import PriorityQueue
+from .mesh_arrays import build_csr
+from .parallel import map_chunks, chunk_ranges, get_n_workers
 
 def lower_star(vertex, edges_dict: dict, faces_dict: dict):
     """! @brief Extracts the lower star of a vertex.
@@ -173,4 +184,235 @@ def process_lower_stars(vertices_dict: dict,
                         if (num_unpaired_faces(face, PQzero) == 1 
                             and face.has_face(gamma_simplex)):
                             
-                            PQone.insert(tuple((face, Findex)))
\ No newline at end of file
+                            PQone.insert(tuple((face, Findex)))
+def lower_star_arrays(mesh_arrays, vertex_labels: np.ndarray = None) -> dict:
+    """! @brief Precomputes the lower stars of all vertices as arrays.
+    
+    @details Edges get the cell ids 0..k-1 and faces the cell ids k..k+m-1. 
+    All edges and faces are sorted by (highest vertex, rank of the second 
+    highest vertex, rank of the third highest vertex), where edges count as 
+    higher than faces with the same first two vertices (as in compare_heights).
+    The lower star of vertex v then is the slice ptr[v]:ptr[v+1] of the 
+    sorted cells, ordered from low to high, so the position of a cell in 
+    this array can be used as its priority. All other arrays are indexed by 
+    these positions, so the lower stars of a range of vertices only need a 
+    contiguous slice of each array.
+    
+    @param mesh_arrays The MeshArrays object (function values need to be set).
+    @param vertex_labels (Optional) Array with a label per vertex. If given, 
+           the pairings are restricted to conform to the labels (see 
+           conforming_gradient_arrays).
+    
+    @return A dictionary with the arrays:
+            - ptr: CSR pointer vertex -> positions of its lower star
+            - cells: cell id at each position
+            - lower_edges: (N,2) positions of the two lower star edges of the 
+              face at each position (-1 for edges)
+            - match: (N,2) whether these edges may be paired with the face
+            - conform: whether the edge at each position may be paired with
+              its vertex
+            - cof_ptr, cof_pos: CSR arrays from the position of an edge to 
+              the positions of the faces in its lower star
+    """
+    n, k, m = mesh_arrays.n_vertices, mesh_arrays.n_edges, mesh_arrays.n_faces
+    rank = mesh_arrays.rank
+
+    edge_owner = mesh_arrays.edge_max_index
+    edge_second = np.where(mesh_arrays.edges[:, 0] == edge_owner, 
+                           mesh_arrays.edges[:, 1], mesh_arrays.edges[:, 0])
+    face_ranks = -np.sort(-rank[mesh_arrays.faces], axis=1)
+
+    owner = np.concatenate((edge_owner, mesh_arrays.face_max_index))
+    key2 = np.concatenate((rank[edge_second], face_ranks[:, 1]))
+    key3 = np.concatenate((np.full(k, n, dtype=face_ranks.dtype), face_ranks[:, 2]))
+    cells = np.lexsort((key3, key2, owner))
+    position = np.empty(k + m, dtype=np.int64)
+    position[cells] = np.arange(k + m)
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=n), out=ptr[1:])
+
+    # the two edges of a face containing its highest vertex
+    in_lower_star = edge_owner[mesh_arrays.face_edges] == mesh_arrays.face_max_index[:, None]
+    col_order = np.argsort(~in_lower_star, axis=1, kind="stable")[:, :2]
+    face_lower_edges = np.take_along_axis(mesh_arrays.face_edges, col_order, axis=1)
+
+    if vertex_labels is None:
+        face_match = np.ones((m, 2), dtype=bool)
+        edge_conform = np.ones(k, dtype=bool)
+    else:
+        # the label sets of face and edge are equal, if the vertex opposite 
+        # to the edge has the label of one of the edge vertices
+        edge_labels = vertex_labels[mesh_arrays.edges]
+        opposite = mesh_arrays.faces.sum(axis=1)[:, None] - mesh_arrays.edges[face_lower_edges].sum(axis=2)
+        face_match = np.any(edge_labels[face_lower_edges] == vertex_labels[opposite][:, :, None], axis=2)
+        edge_conform = edge_labels[:, 0] == edge_labels[:, 1]
+
+    lower_edges = np.full((k + m, 2), -1, dtype=np.int64)
+    lower_edges[position[k:]] = position[face_lower_edges]
+    match = np.zeros((k + m, 2), dtype=bool)
+    match[position[k:]] = face_match
+    conform = np.zeros(k + m, dtype=bool)
+    conform[position[:k]] = edge_conform
+
+    cof_ptr, cof_pos = build_csr(position[face_lower_edges].ravel(),
+                                 np.repeat(position[k:], 2), k + m)
+    return {"ptr": ptr, "cells": cells, "lower_edges": lower_edges, "match": match,
+            "conform": conform, "cof_ptr": cof_ptr, "cof_pos": cof_pos}
+
+def _process_lower_star_range(arrays: dict, first: int, end: int, k: int):
+    """! @brief Processes the lower stars of the vertices first..end-1.
+    
+    @details Works on the arrays from lower_star_arrays. The state of the 
+    cells is kept in lists indexed by position - offset, so different vertex 
+    ranges can be processed independently (e.g. in different processes).
+    
+    @param arrays The dictionary from lower_star_arrays.
+    @param first The first vertex of the range.
+    @param end The end (exclusive) of the vertex range.
+    @param k The number of edges.
+    
+    @return crit_vertices, crit_positions, v12, v23 The critical vertices, 
+            the positions of the critical edges and faces, and the pairs as 
+            lists of (vertex, edge position) and (edge position, face position).
+    """
+    ptr = arrays["ptr"][first:end+1].tolist()
+    offset, stop = ptr[0], ptr[-1]
+    cells = arrays["cells"][offset:stop].tolist()
+    lower_edges = (arrays["lower_edges"][offset:stop] - offset).tolist()
+    match = arrays["match"][offset:stop].tolist()
+    conform = arrays["conform"][offset:stop].tolist()
+    cof_ptr = (arrays["cof_ptr"][offset:stop+1] - arrays["cof_ptr"][offset]).tolist()
+    cof_pos = (arrays["cof_pos"][arrays["cof_ptr"][offset]:arrays["cof_ptr"][stop]] - offset).tolist()
+
+    # number of (matching) unpaired lower star edges of each face
+    unpaired = [match_pair[0] + match_pair[1] for match_pair in match]
+    removed = [False] * (stop - offset)
+    visited = [False] * (stop - offset)
+
+    crit_vertices, crit_positions, v12, v23 = [], [], [], []
+
+    def remove_edge(edge, PQone):
+        removed[edge] = True
+        for face in cof_pos[cof_ptr[edge]:cof_ptr[edge+1]]:
+            e0 = lower_edges[face][0]
+            if match[face][0 if e0 == edge else 1]:
+                unpaired[face] -= 1
+            if unpaired[face] == 1:
+                heapq.heappush(PQone, face)
+                visited[face] = True
+
+    for vertex in range(first, end):
+        start, stop_v = ptr[vertex-first] - offset, ptr[vertex-first+1] - offset
+        if start == stop_v:
+            crit_vertices.append(vertex)
+            continue
+
+        PQzero = []
+        PQone = []
+        delta = -1
+        for pos in range(start, stop_v):
+            if cells[pos] < k:
+                if delta == -1 and conform[pos]:
+                    delta = pos
+                else:
+                    # positions are increasing, so this is a valid heap
+                    PQzero.append(pos)
+        
+        if delta == -1:
+            crit_vertices.append(vertex)
+        else:
+            v12.append((vertex, delta + offset))
+            remove_edge(delta, PQone)
+
+        while PQone or PQzero:
+            while PQone:
+                alpha = heapq.heappop(PQone)
+                if unpaired[alpha] == 0:
+                    heapq.heappush(PQzero, alpha)
+                else:
+                    e0, e1 = lower_edges[alpha]
+                    m0, m1 = match[alpha]
+                    pair_edge = e0 if (m0 and not removed[e0]) else e1
+                    v23.append((pair_edge + offset, alpha + offset))
+                    remove_edge(pair_edge, PQone)
+
+            while PQzero:
+                gamma = heapq.heappop(PQzero)
+                if cells[gamma] >= k:
+                    crit_positions.append(gamma + offset)
+                    break
+                if not removed[gamma]:
+                    crit_positions.append(gamma + offset)
+                    remove_edge(gamma, PQone)
+                    break
+
+        # all leftover faces are critical (only happens with labels)
+        for pos in range(start, stop_v):
+            if cells[pos] >= k and not visited[pos]:
+                crit_positions.append(pos + offset)
+
+    return crit_vertices, crit_positions, v12, v23
+
+def compute_gradient_arrays(mesh_arrays,
+                            vertex_labels: np.ndarray,
+                            C: dict,
+                            V12: dict,
+                            V23: dict,
+                            n_workers: int = 1):
+    """! @brief Computes the (label conforming) discrete gradient from the 
+    array representation and writes it into C, V12 and V23.
+    
+    @param mesh_arrays The MeshArrays object (function values need to be set).
+    @param vertex_labels Array with a label per vertex or None.
+    @param C The dictionary that will store all critical vertices, edges and faces.
+    @param V12 The dictionary that will store pairings between edges and vertices.
+    @param V23 The dictionary that will store pairings between faces and edges.
+    @param n_workers (Optional) Number of processes. Default is 1 (serial), 
+           None uses all cores.
+    """
+    k = mesh_arrays.n_edges
+    arrays = lower_star_arrays(mesh_arrays, vertex_labels)
+    n_chunks = 1 if n_workers == 1 else 4 * get_n_workers(n_workers)
+    chunks = [chunk + (k,) for chunk in chunk_ranges(arrays["ptr"], n_chunks)]
+    results = map_chunks(_process_lower_star_range, arrays, chunks, n_workers=n_workers)
+
+    cells = arrays["cells"]
+    for crit_vertices, crit_positions, v12, v23 in results:
+        C[0].update(crit_vertices)
+        crit = cells[crit_positions].tolist() if crit_positions else []
+        C[1].update(cell for cell in crit if cell < k)
+        C[2].update(cell - k for cell in crit if cell >= k)
+        if v12:
+            v12 = np.array(v12, dtype=np.int64)
+            V12.update(zip(v12[:, 0].tolist(), cells[v12[:, 1]].tolist()))
+        if v23:
+            v23 = np.array(v23, dtype=np.int64)
+            V23.update(zip(cells[v23[:, 0]].tolist(), (cells[v23[:, 1]] - k).tolist()))
+
+def process_lower_stars_arrays(mesh_arrays, 
+                               C: dict, 
+                               V12: dict, 
+                               V23: dict,
+                               n_workers: int = 1):
+    """! @brief Array version of process_lower_stars with the same output.
+    
+    @details Uses the precomputed lower stars from lower_star_arrays. Instead 
+    of scanning the queue for the unpaired faces of a triangle, each triangle 
+    keeps a counter of its lower star edges that are still unpaired, and 
+    paired edges are removed lazily from the queue. The queues only store 
+    the positions of cells in the sorted lower star array, which gives the 
+    same priorities as comparing the function values. Total cost is near 
+    linear in the number of simplices.
+    Since each lower star is processed independently, the vertices can be 
+    split into chunks that are processed by a pool of n_workers processes.
+    
+    @param mesh_arrays The MeshArrays object (function values need to be set).
+    @param C The dictionary that will store all critical vertices, edges and faces.
+    @param V12 The dictionary that will store pairings between edges and vertices.
+    @param V23 The dictionary that will store pairings between faces and edges.
+    @param n_workers (Optional) Number of processes. Default is 1 (serial), 
+           None uses all cores.
+    
+    @return Updated C, V12 and V23.
+    """
+    compute_gradient_arrays(mesh_arrays, None, C, V12, V23, n_workers=n_workers)
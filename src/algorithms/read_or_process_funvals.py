@@ -24,13 +24,53 @@
 #
 # @section libraries_read_ply Libraries/Modules
 # - numpy standard library
-# - collections standard library
-#   - need Counter for unique values
+# - warnings standard library
+# - mesh_arrays module (local)
+#   - need make_unique_by_rank for unique values
 
 #Imports
-from collections import Counter
+import warnings
 import numpy as np
 
+from .mesh_arrays import make_unique_by_rank
+
+def _sign_median(arr: np.ndarray) -> np.ndarray:
+    return np.where(np.median(arr, axis=1) < 0, arr.min(axis=1), arr.max(axis=1))
+
+## Operations to get a scalar value from each row of a feature vector array.
+# Note that maxabs and minabs give the absolute value (sign times value).
+_operations = {
+    "max": lambda arr: arr.max(axis=1),
+    "min": lambda arr: arr.min(axis=1),
+    "maxabs": lambda arr: np.abs(arr).max(axis=1),
+    "minabs": lambda arr: np.abs(arr).min(axis=1),
+    "std": lambda arr: arr.std(axis=1),
+    "mean": lambda arr: arr.mean(axis=1),
+    "median": lambda arr: np.median(arr, axis=1),
+    "sign_median": _sign_median
+}
+
+def read_feature_vector_values(filename: str, operation: str = "max"):
+    """! @brief Reads a feature vector file and reduces each vector to a scalar.
+    
+    @param filename The feature vector file to be read. Each line contains 
+           the vertex index followed by the feature vector, lines starting 
+           with # are skipped.
+    @param operation The function used to get a scalar value from the feature
+           vector array. Default is "max".
+    
+    @return indices, values Arrays with the vertex indices and scalar values.
+    """
+    try:
+        function = _operations[operation]
+    except KeyError:
+        warnings.warn("Chosen operation is not defined! Gonna use max now instead...")
+        function = _operations["max"]
+
+    data = np.loadtxt(filename, comments="#", ndmin=2)
+    indices = data[:, 0].astype(np.int64)
+    return indices, function(data[:, 1:])
+
 def read_funvals(filename: str, 
                  vertices_dict: dict, 
                  edges_dict: dict, 
@@ -39,8 +79,8 @@ def read_funvals(filename: str,
     """! @brief Reads a feature vector file and uses the max of each vector 
     as new Morse function values.
     
-    @details CURRENTLY JUST SUPPORTS THE MAX OF A FEATURE VECTOR...... might 
-    be updated in future to also enable min or other metrics.
+    @details Other operations than max can be chosen, see 
+    read_feature_vector_values.
     
     @param filename The feature vector file to be read for new function values.
     @param vertices_dict The vertices dictionary to be updated with new function values.
@@ -53,64 +93,34 @@ def read_funvals(filename: str,
     @return Despite updating the dictionaries, returns the minimum and maximum 
             function value as min, max.
     """
-    def max_arr(arr):
-        return max(arr)
-    def min_arr(arr):
-        return min(arr)
-    def maxabs_arr(arr):
-        abs_arr = [abs(x) for x in arr]
-        index = abs_arr.index(max(abs_arr))
-        return (arr[index]/abs(arr[index]))*arr[index] # sign times value
-    def minabs_arr(arr):
-        abs_arr = [abs(x) for x in arr]
-        index = abs_arr.index(min(abs_arr))
-        return (arr[index]/abs(arr[index]))*arr[index] # sign times value
-    def std_dev_arr(arr):
-        return np.std(arr)
-    def mean_arr(arr):
-        return np.mean(arr)
-    def median_arr(arr):
-        return np.median(arr)
-    def sign_median_arr(arr):
-        if np.median(arr) < 0:
-            return min(arr)
-        else:
-            return max(arr)
-
-    func_dict = {
-        "max": max_arr,
-        "min": min_arr,
-        "maxabs": maxabs_arr,
-        "minabs": minabs_arr,
-        "std": std_dev_arr,
-        "mean": mean_arr,
-        "median": median_arr,
-        "sign_median": sign_median_arr
-    }
+    indices, vals = read_feature_vector_values(filename, operation)
+    for ind, val in zip(indices.tolist(), vals.tolist()):
+        vertices_dict[ind].fun_val = val
     
-    try:
-        function = func_dict[operation]
-    except KeyError:
-        import warnings
-        warnings.warn("Chosen operation is not defined! Gonna use max now instead...")
-        function = func_dict["max"]
-
-    vals = []
-    with open(filename, "r") as f:
-        for line in f:
-            if line[0] == "#":
-                continue
-            else:
-                ind = int(line.split()[0])
-                feature_vec = [float(x) for x in line.split()[1:]]
-                
-                vertices_dict[ind].fun_val = function(feature_vec)
-                vals.append(function(feature_vec))
-    
-    min_funval, max_funval = make_vert_funvals_unique(vertices_dict, vals)        
+    make_vert_funvals_unique(vertices_dict)
     update_edges_and_faces_funvals(vertices_dict, edges_dict, faces_dict)
 
-    return min_funval, max_funval 
+    return float(vals.min()), float(vals.max())
+
+def read_funvals_arrays(filename: str, mesh_arrays, operation: str = "max"):
+    """! @brief Array version of read_funvals: reads a feature vector file and 
+    sets the new Morse function values in a MeshArrays object.
+    
+    @details The function values of edges and faces are updated in a batch by
+    MeshArrays.set_fun_val.
+    
+    @param filename The feature vector file to be read for new function values.
+    @param mesh_arrays The MeshArrays object to be updated.
+    @param operation The function used to get a scalar value from the feature
+           vector array. Default is "max".
+    
+    @return The minimum and maximum function value read as min, max.
+    """
+    indices, vals = read_feature_vector_values(filename, operation)
+    fun_val = mesh_arrays.fun_val.copy()
+    fun_val[indices] = vals
+    mesh_arrays.set_fun_val(fun_val)
+    return float(vals.min()), float(vals.max())
 
 def update_edges_and_faces_funvals(vert_dict: dict, edge_dict: dict, face_dict: dict):
     for edge in edge_dict.values():
@@ -119,12 +129,16 @@ def update_edges_and_faces_funvals(vert_dict: dict, edge_dict: dict, face_dict:
         face.set_fun_val(vert_dict)
 
 def make_vert_funvals_unique(vert_dict: dict, vals: list = None):
+    """! @brief Makes the function values of the vertices unique. Ties are 
+    broken by the order of the dictionary, see mesh_arrays.make_unique_by_rank.
+    @param vert_dict The vertices dictionary.
+    @param vals (Optional) The function values in the order of the dictionary.
+    @return The minimum and maximum function value as min, max.
+    """
     if vals == None:
         vals = [vert.fun_val for vert in vert_dict.values()]
-    counts = Counter(vals)
-    for vert in vert_dict.values():
-        if counts[vert.fun_val] > 1:
-            tmp = vert.fun_val
-            vert.fun_val = vert.fun_val + (counts[vert.fun_val] - 1) * 0.0000001
-            counts[tmp] = counts[tmp] - 1
-    return min(vals), max(vals)
\ No newline at end of file
+    vals = np.asarray(vals, dtype=np.float64)
+    fun_vals, _ = make_unique_by_rank(vals)
+    for vert, fun_val in zip(vert_dict.values(), fun_vals.tolist()):
+        vert.fun_val = fun_val
+    return float(vals.min()), float(vals.max())
@@ -20,6 +20,7 @@ import collections
 import numpy as np
 
 from .datastructures import Vertex, Simplex
+from .mesh_arrays import MeshArrays, make_unique_by_rank
 
 # from ply specification, and additional dtypes found in the wild
 _dtypes = {
@@ -103,6 +104,35 @@ def load_ply(file_obj,
 
     return min_val, max_val
 
+def load_ply_arrays(file_obj,
+                    morse_function: str = "quality",
+                    inverted: bool = False):
+    """
+    Load a PLY file from an open file object into the array representation.
+    Parameters
+    ---------
+    file_obj : an open file- like object
+      Source data, ASCII or binary PLY
+    morse_function : str
+      The vertex property used as Morse function (quality, x, y or z)
+    inverted : bool
+      Whether to negate the function values
+    Returns
+    ---------
+    mesh_arrays : MeshArrays
+      The vertices, edges, faces and adjacencies of the mesh
+    min_val, max_val : float
+      The range of the function values
+    """
+    elements, is_ascii = _parse_header(file_obj)
+
+    if is_ascii:
+        _ply_ascii(elements, file_obj)
+    else:
+        _ply_binary(elements, file_obj)
+
+    return _elements_to_arrays(elements, morse_function, inverted)
+
 def _parse_header(file_obj):
     """
     Read the ASCII header of a PLY file, and leave the file object
@@ -439,111 +469,108 @@ def distance_to_end(file_obj):
     distance = position_end - position_current
     return distance
 
-def _elements_to_dicts(elements, 
-                       vert_dict: dict, 
-                       edge_dict: dict, 
-                       face_dict: dict, 
-                       morse_function: str, 
-                       inverted: bool):
+def _element_column(element, name):
+    """
+    Get one property of a loaded element as flat array, both for the
+    structured arrays of binary files and the column dicts of ascii files.
+    """
+    return np.asarray(element['data'][name]).reshape(-1)
+
+def _face_array(element):
+    """
+    Get the (m, 3) vertex index array of a loaded face element.
+    """
+    name = next(iter(element['properties']))
+    data = element['data'][name]
+    if data.dtype.names is not None:
+        # binary list property: (list length, list data)
+        data = data[data.dtype.names[-1]]
+    if data.dtype == object or data.ndim != 2 or data.shape[1] != 3:
+        raise ValueError('Only triangle meshes are supported!')
+    return data.astype(np.int64, copy=False)
+
+def _elements_to_arrays(elements, 
+                        morse_function: str, 
+                        inverted: bool):
     """
-    Given an elements data structure, extract the keyword
-    arguments that a Trimesh object constructor will expect.
+    Given an elements data structure, build the array representation of
+    the mesh. Edges and adjacencies are derived from the face array in a
+    vectorized way (see MeshArrays.from_faces).
     Parameters
     ------------
     elements : OrderedDict object
       With fields and data loaded
-    fix_texture : bool
-      If True, will re- index vertices and faces
-      so vertices with different UV coordinates
-      are disconnected.
-    image : PIL.Image
-      Image to be viewed
-    prefer_color : None, 'vertex', or 'face'
-      Which kind of color to prefer if both defined
+    morse_function : str
+      The vertex property used as Morse function (quality, x, y or z)
+    inverted : bool
+      Whether to negate the function values
     Returns
     -----------
-    kwargs : dict
-      Keyword arguments for Trimesh constructor
+    mesh_arrays : MeshArrays
+      The array representation of the mesh
+    min_val, max_val : float
+      The range of the function values
     """
-
     if 'vertex' in elements and elements['vertex']['length']:
-        vert_dict.update({ind: Vertex(x=elements['vertex']['data']['x'][ind],
-                                y=elements['vertex']['data']['y'][ind],
-                                z=elements['vertex']['data']['z'][ind],
-                                quality=elements['vertex']['data']['quality'][ind],
-                                index=ind) 
-                                for ind in range(elements['vertex']['length'])})
-        min_val, max_val = make_discrete_morse_function(vert_dict=vert_dict, 
-                                                        function=morse_function, 
-                                                        inverted=inverted)
+        vertex = elements['vertex']
+        coords = np.stack([_element_column(vertex, axis) for axis in 'xyz'], axis=1)
+        quality = _element_column(vertex, 'quality')
+        fun_val = _element_column(vertex, morse_function).astype(np.float64)
+        if inverted:
+            fun_val = -fun_val
+        min_val, max_val = float(fun_val.min()), float(fun_val.max())
     else:
         raise ValueError('No vertices in the plyfile!')
 
     if 'face' in elements and elements['face']['length']:
-        face_dict.update({face_ind: Simplex(indices=set(elements['face']['data'][face_ind][0][1]),
-                                            index=face_ind) 
-                            for face_ind in range(elements['face']['length'])})
+        faces = _face_array(elements['face'])
     else:
         raise ValueError('No faces in the plyfile!')
 
-    '''
-    st = timeit.default_timer()
-
-    face_arr = [list(face.indices) for face in face_dict.values()]
-
-    print(face_arr)
-    print(np.array(elements['face']['data']))
-
-    face_arr = np.asanyarray(face_arr)
-
-    # each face has three edges
-    edges = face_arr[:, [0, 1, 1, 2, 2, 0]].reshape((-1, 2))
-
-    # remove duplicates
-    set_lst = map(set, edges)
-    lst = map(tuple, set_lst)
-    rem_dup = set(lst)
-
-    for e_index, edge_indices in enumerate(rem_dup):
-        edge = Simplex(set(edge_indices), e_index)
-        edge_dict[e_index] = edge
-        #vert_dict[edge_indices[0]].star["E"].append(e_index)
-        #vert_dict[edge_indices[1]].star["E"].append(e_index)
-        #vert_dict[edge_indices[0]].neighbors.add(edge_indices[1])
-        #vert_dict[edge_indices[1]].neighbors.add(edge_indices[0])
-
-
-    end = timeit.default_timer()
-
-    print("get edges: ",(end-st))
-    '''
-
-    eindex = 0
-    unique_edges = set()
-    for findex, face in face_dict.items():
-        for ind in face.indices:
-            subset = face.indices.copy()
-            subset.remove(ind)
-            vert_dict[ind].star["F"].append(findex)
-            
-            vert_dict[ind].neighbors.update(subset)
-            
-            if subset not in unique_edges:
-                edge = Simplex(indices=subset, index=eindex)
-                
-                edge_dict[eindex] = edge
-                for tmp_ed_ind in subset:
-                    vert_dict[tmp_ed_ind].star["E"].append(eindex)
-                eindex+=1
-                
-                unique_edges.add(frozenset(subset))
-    
-    set_edge_and_face_fun_vals(vert_dict, edge_dict, face_dict)
+    mesh_arrays = MeshArrays.from_faces(coords, faces, quality=quality, fun_val=fun_val)
+    return mesh_arrays, min_val, max_val
+
+def _elements_to_dicts(elements, 
+                       vert_dict: dict, 
+                       edge_dict: dict, 
+                       face_dict: dict, 
+                       morse_function: str, 
+                       inverted: bool):
+    """
+    Given an elements data structure, fill the vertex, edge and face
+    dictionaries. Builds the array representation first and converts it.
+    Parameters
+    ------------
+    elements : OrderedDict object
+      With fields and data loaded
+    vert_dict, edge_dict, face_dict : dict
+      Dictionaries that are filled with Vertex and Simplex objects
+    morse_function : str
+      The vertex property used as Morse function (quality, x, y or z)
+    inverted : bool
+      Whether to negate the function values
+    Returns
+    -----------
+    min_val, max_val : float
+      The range of the function values
+    """
+    mesh_arrays, min_val, max_val = _elements_to_arrays(elements, 
+                                                        morse_function, 
+                                                        inverted)
+    verts, edges, faces = mesh_arrays.to_dicts()
+    vert_dict.update(verts)
+    edge_dict.update(edges)
+    face_dict.update(faces)
     return min_val, max_val
 
 def make_discrete_morse_function(vert_dict: dict, 
                                  function: str = "quality", 
                                  inverted: bool = False):
+    """
+    Sets the function values of the vertices from one of their attributes
+    and makes them unique (see mesh_arrays.make_unique_by_rank).
+    Returns the range of the function values as min_val, max_val.
+    """
     # load fun_vals:
     attr_map = {
         "quality": "quality",
@@ -552,21 +579,15 @@ def make_discrete_morse_function(vert_dict: dict,
         "z": "z"
     }
     attr = attr_map[function]
-    vals=[]
-    for vert in vert_dict.values():
-        vert.fun_val = getattr(vert, attr)
-        if inverted:
-            vert.fun_val = -vert.fun_val
-        vals.append(vert.fun_val)
+    vals = np.array([getattr(vert, attr) for vert in vert_dict.values()], dtype=np.float64)
+    if inverted:
+        vals = -vals
 
     # make unique function values
-    counts = collections.Counter(vals)
-    for vert in vert_dict.values():
-        if counts[vert.fun_val] > 1:
-            tmp = vert.fun_val
-            vert.fun_val = vert.fun_val + (counts[vert.fun_val] - 1) * 0.0000001
-            counts[tmp] -= 1
-    return min(vals), max(vals)
+    fun_vals, _ = make_unique_by_rank(vals)
+    for vert, fun_val in zip(vert_dict.values(), fun_vals.tolist()):
+        vert.fun_val = fun_val
+    return float(vals.min()), float(vals.max())
 
 def set_edge_and_face_fun_vals(vert_dict: dict, edge_dict: dict, face_dict: dict):
     for face in face_dict.values():
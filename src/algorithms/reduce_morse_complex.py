@@ -21,6 +21,9 @@ from copy import deepcopy
 
 from .cancellation_queue import CancellationQueue
 from .datastructures import Separatrix, MorseCells
+from .paths import concat_paths, reversed_inner_path, path_array
+from .salient_paths import SalientPathCounter
+from .separatrix_persistence import separatrix_persistences, simplex_values
 
 def get_closest_extremum(crit_edge, 
                          crit_faces_dict: dict, 
@@ -35,10 +38,6 @@ def get_closest_extremum(crit_edge,
     for face_ind, nb in face_counter.items():
         # cannot cancel loops, so only if there is a single path we can add the extremum
         if nb==1:
-            # check for valuebale edge-min connections:
-            min_dist = []
-            for elt in crit_edge.connected_minima:
-                min_dist.append(vert_dict[elt].fun_val)
             # take absolute value btw the two highest vertices 
             # of edge and face respectively
             distances.append(tuple((face_ind, 
@@ -51,11 +50,6 @@ def get_closest_extremum(crit_edge,
     for vert_ind, nb in vert_counter.items():
         # cannot cancel loops, so only if there is a single path we can add the extremum
         if nb==1:
-            #check for valuable max-edge connections:
-            max_dist = []
-            for elt in crit_edge.connected_maxima:
-                max_dist.append(face_dict[elt].fun_val[0])
-                
             # take absolute value btw the highest vertex of edge 
             # and the value of the vertex
             distances.append(tuple((vert_ind, 
@@ -63,28 +57,41 @@ def get_closest_extremum(crit_edge,
                                     abs(crit_edge.fun_val[0]
                                         -vert_dict[vert_ind].fun_val)))) 
             
-    if sorted(distances, key=lambda item: item[2]):
-        if salient_edge_pts != None:
-            for closest, dim, distance in sorted(distances, key=lambda item: item[2]):
-                if dim == 0:
-                    if len(get_indices(crit_edge.paths[closest], 
-                                       edge_dict, 
-                                       face_dict, 
-                                       dim=1).intersection(salient_edge_pts)) < 3:
-                        return closest, dim, distance
-                elif dim == 2:
-                    if len(get_indices(crit_faces_dict[closest].paths[crit_edge.index], 
-                                       edge_dict, 
-                                       face_dict, 
-                                       dim=2).intersection(salient_edge_pts)) < 3:
-                        return closest, dim, distance
-                    
-            return None
-        else:    
-            closest, dim, distance = sorted(distances, key=lambda item: item[2])[0] 
-            return closest, dim, distance
-    else: 
+    return _closest_candidate(crit_edge, distances, crit_faces_dict, 
+                              edge_dict, face_dict, salient_edge_pts, 3)
+
+def _closest_candidate(crit_edge, 
+                       distances: list, 
+                       crit_faces_dict: dict, 
+                       edge_dict: dict, 
+                       face_dict: dict, 
+                       salient_edge_pts: set, 
+                       max_salient: int):
+    """! @brief Picks the closest extremum out of the candidates.
+    @details The candidates are sorted by distance once (stable, so ties keep 
+    the order maxima before minima). With salient edge points, the closest 
+    extremum whose path contains less than max_salient salient edge points 
+    is taken. The salient edge points can be given as set or as 
+    SalientPathCounter, which caches the counts of the paths.
+    @return Tuple of (index, dimension, distance) or None.
+    """
+    distances.sort(key=lambda item: item[2])
+    if not distances:
         return None
+    if salient_edge_pts == None:
+        return distances[0]
+    for closest, dim, distance in distances:
+        if dim == 0:
+            path = crit_edge.paths[closest]
+        else:
+            path = crit_faces_dict[closest].paths[crit_edge.index]
+        if isinstance(salient_edge_pts, SalientPathCounter):
+            n_salient = salient_edge_pts.count(path, max(dim, 1))
+        else:
+            n_salient = len(get_indices(path, edge_dict, face_dict, dim=max(dim, 1)).intersection(salient_edge_pts))
+        if n_salient < max_salient:
+            return closest, dim, distance
+    return None
     
 def get_indices(path: list, 
                 edge_dict: dict, 
@@ -93,21 +100,19 @@ def get_indices(path: list,
     indices = set()
     # edge-vert separatrix -> only need to add edge indices
     if dim == 1:
-        for i, elt in enumerate(path):
-            if i%2 == 0:
-                indices.update(edge_dict[elt].indices)
+        for elt in path_array(path)[::2].tolist():
+            indices.update(edge_dict[elt].indices)
     # face-edge separatrix -> only need to add face indices        
     elif dim == 2:
-        for i, elt in enumerate(path):
-            if i%2 == 0:
-                indices.update(face_dict[elt].indices)
+        for elt in path_array(path)[::2].tolist():
+            indices.update(face_dict[elt].indices)
     return indices
     
 def compute_min_sad_persistence(path: list, 
                                 vert_dict: dict, 
                                 edge_dict: dict):
     distances = []
-    for i, elt in enumerate(path):
+    for i, elt in enumerate(path_array(path).tolist()):
         if i%2 == 0:
             distances.append(edge_dict[elt].fun_val[0]) #min_maximum_val
         elif i%2 == 1:
@@ -118,12 +123,57 @@ def compute_max_sad_persistence(path: list,
                                 edge_dict: dict, 
                                 face_dict: dict):
     distances = []
-    for i, elt in enumerate(path):
+    for i, elt in enumerate(path_array(path).tolist()):
         if i%2 == 0:
             distances.append(face_dict[elt].fun_val[0]) #max_minimum_val
         elif i%2 == 1:
             distances.append(edge_dict[elt].fun_val[0]) #max_minimum_val
     return sum(distances)/len(distances)
+
+def _add_separatrix(MorseComplex, 
+                    origin: int, 
+                    destination: int, 
+                    dimension: int, 
+                    path, 
+                    second_list: str, 
+                    vert_dict: dict, 
+                    edge_dict: dict, 
+                    face_dict: dict, 
+                    pending: list = None):
+    """! @brief Adds a separatrix to the Separatrices and to a second list of
+    the Morse complex.
+    @param second_list Name of the second list ("Separatrices_cutoff" or 
+           "Separatrices_reversed").
+    @param pending (Optional) If given, the separatrix and the name of the 
+           second list are appended to it instead and the separatrix 
+           persistence is computed later for all pending separatrices at once 
+           (see _add_pending_separatrices).
+    """
+    if pending is not None:
+        pending.append(tuple((Separatrix(origin, destination, dimension, path, None), 
+                              second_list)))
+        return
+    if dimension == 1:
+        persistence = compute_min_sad_persistence(path, vert_dict, edge_dict)
+    else:
+        persistence = compute_max_sad_persistence(path, edge_dict, face_dict)
+    separatrix = Separatrix(origin, destination, dimension, path, persistence)
+    MorseComplex.Separatrices.append(tuple((persistence, separatrix)))
+    getattr(MorseComplex, second_list).append(tuple((persistence, separatrix)))
+
+def _add_pending_separatrices(MorseComplex, pending: list, values: tuple):
+    """! @brief Computes the separatrix persistences of the pending 
+    separatrices in bulk (see separatrix_persistences) and adds them to the 
+    Morse complex in the order they were created.
+    @param pending List of (Separatrix, name of the second list) tuples.
+    @param values Tuple of the vertex, edge and face values (see simplex_values).
+    """
+    persistences = separatrix_persistences([separatrix for separatrix, _ in pending], 
+                                           values)["average"].tolist()
+    for persistence, (separatrix, second_list) in zip(persistences, pending):
+        separatrix.separatrix_persistence = persistence
+        MorseComplex.Separatrices.append(tuple((persistence, separatrix)))
+        getattr(MorseComplex, second_list).append(tuple((persistence, separatrix)))
             
 # saddle and minimum given as CritEdge and CritVertex objects
 def cancel_one_critical_pair_min(saddle, 
@@ -131,12 +181,18 @@ def cancel_one_critical_pair_min(saddle,
                                  MorseComplex, 
                                  vert_dict: dict, 
                                  edge_dict: dict, 
-                                 face_dict: dict):
+                                 face_dict: dict, 
+                                 touched_saddles: set = None, 
+                                 pending: list = None):
     """
     Cancels a saddle and minimum pair of the MorseComplex
         saddle: a CritEdge object
         minimum: a CritVertex object
         MorseComplex: a MorseComplex object, that will be changed accordingly
+        touched_saddles: (optional) a set the indices of the saddles whose 
+            connections change are added to
+        pending: (optional) a list the new separatrices are collected in, 
+            their persistences are computed later (see _add_separatrix)
     """
     #list of the maximal function values connected to saddle that is 
     # about to be cancelled we require the minimum of this list 
@@ -147,44 +203,23 @@ def cancel_one_critical_pair_min(saddle,
     # be removed (need None argument for second iteration)
     for conn_max in saddle.connected_maxima:
         #maximal_values_list.append(MorseComplex.CritFaces[conn_max].fun_val[0])
-        MorseComplex.CritFaces[conn_max].connected_saddles.remove(saddle.index)
-        if saddle.index in MorseComplex.CritFaces[conn_max].paths.keys():
+        # the paths are only read, the maximum is copied for the changes below
+        max_paths = MorseComplex.CritFaces[conn_max].paths
+        if saddle.index in max_paths.keys():
             if saddle.connected_maxima.count(conn_max) == 2:
                 for i in range(2):
-                    max_cancel_line_persistence = compute_max_sad_persistence(MorseComplex.CritFaces[conn_max].paths[saddle.index][i], 
-                                                                              edge_dict, 
-                                                                              face_dict)
-                    max_cancel_line = Separatrix(conn_max, 
-                                                 saddle.index, 
-                                                 2, 
-                                                 MorseComplex.CritFaces[conn_max].paths[saddle.index][i], 
-                                                 max_cancel_line_persistence)
-                    MorseComplex.Separatrices.append(
-                        tuple((max_cancel_line_persistence,
-                               max_cancel_line))
-                    )
-                    MorseComplex.Separatrices_cutoff.append(
-                        tuple((max_cancel_line_persistence,
-                               max_cancel_line))
-                    )
+                    _add_separatrix(MorseComplex, conn_max, saddle.index, 2, 
+                                    max_paths[saddle.index][i], 
+                                    "Separatrices_cutoff", vert_dict, edge_dict, face_dict, 
+                                    pending=pending)
             else:
-                max_cancel_line_persistence = compute_max_sad_persistence(MorseComplex.CritFaces[conn_max].paths[saddle.index], 
-                                                                          edge_dict, 
-                                                                          face_dict)
-                max_cancel_line = Separatrix(conn_max, 
-                                             saddle.index, 
-                                             2, 
-                                             MorseComplex.CritFaces[conn_max].paths[saddle.index], 
-                                             max_cancel_line_persistence)
-                MorseComplex.Separatrices.append(
-                    tuple((max_cancel_line_persistence,
-                           max_cancel_line))
-                )
-                MorseComplex.Separatrices_cutoff.append(
-                        tuple((max_cancel_line_persistence,
-                               max_cancel_line))
-                )
-        MorseComplex.CritFaces[conn_max].paths.pop(saddle.index, None)
+                _add_separatrix(MorseComplex, conn_max, saddle.index, 2, 
+                                max_paths[saddle.index], 
+                                "Separatrices_cutoff", vert_dict, edge_dict, face_dict, 
+                                pending=pending)
+        conn_face = MorseComplex.writable_face(conn_max)
+        conn_face.connected_saddles.remove(saddle.index)
+        conn_face.paths.pop(saddle.index, None)
         
     # find new saddles and minima:
     new_saddles = []
@@ -195,30 +230,18 @@ def cancel_one_critical_pair_min(saddle,
     for conn_min in saddle.connected_minima:
         if conn_min != minimum.index:
             new_minima.append(conn_min)
+    if touched_saddles is not None:
+        touched_saddles.update(new_saddles)
             
     # save original path for separatrix persistence for later:
     original_path = saddle.paths[minimum.index]
-    minimal_line_persistence = compute_min_sad_persistence(original_path, 
-                                                           vert_dict, 
-                                                           edge_dict)
-    
-    minimal_line = Separatrix(saddle.index, 
-                              minimum.index, 
-                              1, 
-                              original_path, 
-                              minimal_line_persistence)
-    MorseComplex.Separatrices.append(
-        tuple((minimal_line_persistence, 
-               minimal_line))
-    )
-    MorseComplex.Separatrices_reversed.append(
-        tuple((minimal_line_persistence,
-               minimal_line))
-    )
+    _add_separatrix(MorseComplex, saddle.index, minimum.index, 1, original_path, 
+                    "Separatrices_reversed", vert_dict, edge_dict, face_dict, 
+                    pending=pending)
     
     # save the inverted path between sadle and minimum:
     # reverse path and remove first and last elt (min and saddle otherwise duplicated)
-    inverted_cropped_path = saddle.paths[minimum.index][1:-1][::-1]
+    inverted_cropped_path = reversed_inner_path(saddle.paths[minimum.index])
     
     new_saddles_counts = Counter(new_saddles)
     new_minima_counts = Counter(new_minima)
@@ -226,11 +249,12 @@ def cancel_one_critical_pair_min(saddle,
         # save paths from new saddle to minimum 
         # (want to pop the minimum from the new saddle paths afterwards)
         new_saddle_paths = MorseComplex.CritEdges[new_sad].paths[minimum.index]
+        new_edge = MorseComplex.writable_edge(new_sad)
         
         # remove all instances of minimum from new saddles connections and paths
         for i in range(nb_sad):
-            MorseComplex.CritEdges[new_sad].connected_minima.remove(minimum.index)
-            MorseComplex.CritEdges[new_sad].paths.pop(minimum.index, None)
+            new_edge.connected_minima.remove(minimum.index)
+            new_edge.paths.pop(minimum.index, None)
             
         # now loop over new minima to connect new paths and remove 
         # saddle from new min connections
@@ -243,15 +267,15 @@ def cancel_one_critical_pair_min(saddle,
                 # then: add new min to new saddle connection and take the single path:
                 # new_sad-old_min + old_min-old_sad(reversed) + old_sad-new_min 
                 if nb_sad == 1:
-                    MorseComplex.CritEdges[new_sad].connected_minima.append(new_min)
-                    MorseComplex.CritVertices[new_min].connected_saddles.append(new_sad)
-                    if new_min not in MorseComplex.CritEdges[new_sad].paths.keys():
-                        MorseComplex.CritEdges[new_sad].paths[new_min] = (new_saddle_paths 
-                                                                          + inverted_cropped_path 
-                                                                          + saddle.paths[new_min])
+                    new_edge.connected_minima.append(new_min)
+                    MorseComplex.writable_vertex(new_min).connected_saddles.append(new_sad)
+                    if new_min not in new_edge.paths.keys():
+                        new_edge.paths[new_min] = concat_paths(new_saddle_paths, 
+                                                               inverted_cropped_path, 
+                                                               saddle.paths[new_min])
                     else:
-                        MorseComplex.CritEdges[new_sad].paths[new_min] = [MorseComplex.CritEdges[new_sad].paths[new_min], 
-                                                                          new_saddle_paths + inverted_cropped_path + saddle.paths[new_min]]
+                        new_edge.paths[new_min] = [new_edge.paths[new_min], 
+                                                   concat_paths(new_saddle_paths, inverted_cropped_path, saddle.paths[new_min])]
                     
                 
                 # new saddle had 2 connections to old min, 
@@ -259,12 +283,12 @@ def cancel_one_critical_pair_min(saddle,
                 elif nb_sad == 2:
                     # add to connection twice
                     for k in range(nb_sad):
-                        MorseComplex.CritEdges[new_sad].connected_minima.append(new_min)
-                        MorseComplex.CritVertices[new_min].connected_saddles.append(new_sad)
+                        new_edge.connected_minima.append(new_min)
+                        MorseComplex.writable_vertex(new_min).connected_saddles.append(new_sad)
                     # add both paths to the paths to new_min (only differ 
                     # in the first part from new_sad to old_min)
-                    MorseComplex.CritEdges[new_sad].paths[new_min] = [new_saddle_paths[0] + inverted_cropped_path + saddle.paths[new_min], 
-                                                                      new_saddle_paths[1] + inverted_cropped_path + saddle.paths[new_min]]
+                    new_edge.paths[new_min] = [concat_paths(new_saddle_paths[0], inverted_cropped_path, saddle.paths[new_min]), 
+                                               concat_paths(new_saddle_paths[1], inverted_cropped_path, saddle.paths[new_min])]
                     
             else:
                 print("Saddle should only be able to connect "
@@ -274,7 +298,7 @@ def cancel_one_critical_pair_min(saddle,
     # needs to be put out oif the new saddles loop, otherwise repeated for each sadddle
     for new_min, nb_min in new_minima_counts.items():
         for j in range(nb_min):
-            MorseComplex.CritVertices[new_min].connected_saddles.remove(saddle.index)
+            MorseComplex.writable_vertex(new_min).connected_saddles.remove(saddle.index)
                 
     # now pop old saddle and old min from complex, as they 
     # have been cancelled and reconnected:
@@ -289,12 +313,18 @@ def cancel_one_critical_pair_max(saddle,
                                  MorseComplex, 
                                  vert_dict: dict, 
                                  edge_dict: dict, 
-                                 face_dict: dict):
+                                 face_dict: dict, 
+                                 touched_saddles: set = None, 
+                                 pending: list = None):
     """
     Cancels a saddle and maximum pair of the MorseComplex
         saddle: a CritEdge object
         maximum: a CritFace object
         MorseComplex: a MorseComplex object, that will be changed accordingly
+        touched_saddles: (optional) a set the indices of the saddles whose 
+            connections change are added to
+        pending: (optional) a list the new separatrices are collected in, 
+            their persistences are computed later (see _add_separatrix)
     """
     #list of the minimal function values connected to saddle that is 
     # about to be cancelled we require the maximum of this list for 
@@ -306,36 +336,16 @@ def cancel_one_critical_pair_max(saddle,
         if conn_min in saddle.paths.keys():
             if saddle.connected_minima.count(conn_min) == 2:
                 for i in range(2):
-                    min_cancel_line_persistence = compute_min_sad_persistence(saddle.paths[conn_min][i], 
-                                                                              vert_dict, 
-                                                                              edge_dict)
-                    min_cancel_line = Separatrix(saddle.index, 
-                                                 conn_min, 
-                                                 1, 
-                                                 saddle.paths[conn_min][i], 
-                                                 min_cancel_line_persistence)
-                    MorseComplex.Separatrices.append(tuple((min_cancel_line_persistence, 
-                                                            min_cancel_line)))
-                    MorseComplex.Separatrices_cutoff.append(
-                        tuple((min_cancel_line_persistence,
-                               min_cancel_line))
-                    )
+                    _add_separatrix(MorseComplex, saddle.index, conn_min, 1, 
+                                    saddle.paths[conn_min][i], 
+                                    "Separatrices_cutoff", vert_dict, edge_dict, face_dict, 
+                                    pending=pending)
             else:
-                min_cancel_line_persistence = compute_min_sad_persistence(saddle.paths[conn_min], 
-                                                                          vert_dict, 
-                                                                          edge_dict)
-                min_cancel_line = Separatrix(saddle.index, 
-                                             conn_min, 
-                                             1, 
-                                             saddle.paths[conn_min], 
-                                             min_cancel_line_persistence)
-                MorseComplex.Separatrices.append(tuple((min_cancel_line_persistence, 
-                                                        min_cancel_line)))
-                MorseComplex.Separatrices_cutoff.append(
-                    tuple((min_cancel_line_persistence,
-                           min_cancel_line))
-                )
-        MorseComplex.CritVertices[conn_min].connected_saddles.remove(saddle.index)
+                _add_separatrix(MorseComplex, saddle.index, conn_min, 1, 
+                                saddle.paths[conn_min], 
+                                "Separatrices_cutoff", vert_dict, edge_dict, face_dict, 
+                                pending=pending)
+        MorseComplex.writable_vertex(conn_min).connected_saddles.remove(saddle.index)
         
     # find new saddles and maxima:
     new_saddles = []
@@ -346,28 +356,18 @@ def cancel_one_critical_pair_max(saddle,
     for conn_max in saddle.connected_maxima:
         if conn_max != maximum.index:
             new_maxima.append(conn_max)
+    if touched_saddles is not None:
+        touched_saddles.update(new_saddles)
             
     # save original path for separatrix persistence for later:
     original_path = maximum.paths[saddle.index]
-    maximal_line_persistence = compute_max_sad_persistence(original_path, 
-                                                           edge_dict, 
-                                                           face_dict)
-    
-    maximal_line = Separatrix(maximum.index, 
-                              saddle.index, 
-                              2, 
-                              original_path, 
-                              maximal_line_persistence)
-    MorseComplex.Separatrices.append(tuple((maximal_line_persistence, 
-                                            maximal_line)))
-    MorseComplex.Separatrices_reversed.append(
-        tuple((maximal_line_persistence,
-               maximal_line))
-    )
+    _add_separatrix(MorseComplex, maximum.index, saddle.index, 2, original_path, 
+                    "Separatrices_reversed", vert_dict, edge_dict, face_dict, 
+                    pending=pending)
     
     # save the inverted path between sadle and maximum:
     # reverse path and remove first and last elt (max and saddle otherwise duplicated)
-    inverted_cropped_path = maximum.paths[saddle.index][1:-1][::-1]
+    inverted_cropped_path = reversed_inner_path(maximum.paths[saddle.index])
     
     new_saddles_counts = Counter(new_saddles)
     new_maxima_counts = Counter(new_maxima)
@@ -375,11 +375,12 @@ def cancel_one_critical_pair_max(saddle,
         # save paths from new maximum to saddle 
         # (want to pop the saddle from the new max paths afterwards)
         new_max_paths = MorseComplex.CritFaces[new_max].paths[saddle.index]
+        new_face = MorseComplex.writable_face(new_max)
         
         # remove all instances of saddle from new max connections and paths
         for i in range(nb_max):
-            MorseComplex.CritFaces[new_max].connected_saddles.remove(saddle.index)
-            MorseComplex.CritFaces[new_max].paths.pop(saddle.index, None)
+            new_face.connected_saddles.remove(saddle.index)
+            new_face.paths.pop(saddle.index, None)
             
         # now loop over new saddles to connect new paths and 
         # remove maximum from new saddle connections
@@ -390,31 +391,31 @@ def cancel_one_critical_pair_max(saddle,
             # 3. one path new_max-old_sad and two paths old_max-new_sad
             # 4. two paths new_max-old_sad and two paths old_max-new_sad
             if nb_sad == 1 and nb_max == 1:
-                MorseComplex.CritFaces[new_max].connected_saddles.append(new_sad)
-                MorseComplex.CritEdges[new_sad].connected_maxima.append(new_max)
-                if new_sad not in MorseComplex.CritFaces[new_max].paths.keys():
-                    MorseComplex.CritFaces[new_max].paths[new_sad] = (new_max_paths 
-                                                                      + inverted_cropped_path 
-                                                                      + maximum.paths[new_sad])
+                new_face.connected_saddles.append(new_sad)
+                MorseComplex.writable_edge(new_sad).connected_maxima.append(new_max)
+                if new_sad not in new_face.paths.keys():
+                    new_face.paths[new_sad] = concat_paths(new_max_paths, 
+                                                           inverted_cropped_path, 
+                                                           maximum.paths[new_sad])
                 else:
-                    MorseComplex.CritFaces[new_max].paths[new_sad] = [MorseComplex.CritFaces[new_max].paths[new_sad], 
-                                                                      new_max_paths + inverted_cropped_path + maximum.paths[new_sad]]
+                    new_face.paths[new_sad] = [new_face.paths[new_sad], 
+                                               concat_paths(new_max_paths, inverted_cropped_path, maximum.paths[new_sad])]
                 
             elif nb_sad == 1 and nb_max == 2:
                 for p in range(2):
-                    MorseComplex.CritFaces[new_max].connected_saddles.append(new_sad)
-                    MorseComplex.CritEdges[new_sad].connected_maxima.append(new_max)
+                    new_face.connected_saddles.append(new_sad)
+                    MorseComplex.writable_edge(new_sad).connected_maxima.append(new_max)
                 # add two paths: first part from new_max to saddle is different
-                MorseComplex.CritFaces[new_max].paths[new_sad] = [new_max_paths[0] + inverted_cropped_path + maximum.paths[new_sad], 
-                                                                  new_max_paths[1] + inverted_cropped_path + maximum.paths[new_sad]]
+                new_face.paths[new_sad] = [concat_paths(new_max_paths[0], inverted_cropped_path, maximum.paths[new_sad]), 
+                                           concat_paths(new_max_paths[1], inverted_cropped_path, maximum.paths[new_sad])]
                 
             elif nb_sad == 2 and nb_max == 1:
                 for p in range(2):
-                    MorseComplex.CritFaces[new_max].connected_saddles.append(new_sad)
-                    MorseComplex.CritEdges[new_sad].connected_maxima.append(new_max)
+                    new_face.connected_saddles.append(new_sad)
+                    MorseComplex.writable_edge(new_sad).connected_maxima.append(new_max)
                 # add two paths: last part from max to new_sad is different
-                MorseComplex.CritFaces[new_max].paths[new_sad] = [new_max_paths + inverted_cropped_path + maximum.paths[new_sad][0], 
-                                                                  new_max_paths + inverted_cropped_path + maximum.paths[new_sad][1]]
+                new_face.paths[new_sad] = [concat_paths(new_max_paths, inverted_cropped_path, maximum.paths[new_sad][0]), 
+                                           concat_paths(new_max_paths, inverted_cropped_path, maximum.paths[new_sad][1])]
                 
             elif nb_sad == 2 and nb_max == 2:
                 '''
@@ -425,13 +426,13 @@ def cancel_one_critical_pair_max(saddle,
                 them such that we expect max 2 paths between two critical simplices
                 '''
                 for _ in range(2):
-                    MorseComplex.CritFaces[new_max].connected_saddles.append(new_sad)
-                    MorseComplex.CritEdges[new_sad].connected_maxima.append(new_max)
+                    new_face.connected_saddles.append(new_sad)
+                    MorseComplex.writable_edge(new_sad).connected_maxima.append(new_max)
                 # add two paths: last part from max to new_sad and first 
                 # part from new_max to sad are different,
                 # we take one of each to reduce the cases from 4 to 2
-                MorseComplex.CritFaces[new_max].paths[new_sad] = [new_max_paths[0] + inverted_cropped_path + maximum.paths[new_sad][0], 
-                                                                  new_max_paths[1] + inverted_cropped_path + maximum.paths[new_sad][1]]
+                new_face.paths[new_sad] = [concat_paths(new_max_paths[0], inverted_cropped_path, maximum.paths[new_sad][0]), 
+                                           concat_paths(new_max_paths[1], inverted_cropped_path, maximum.paths[new_sad][1])]
                 
             else:
                 print("More than 2 paths between new_max and saddle "
@@ -441,7 +442,7 @@ def cancel_one_critical_pair_max(saddle,
     # needs to be put out of new_max loop, otherwise repeated to often
     for new_sad, nb_sad in new_saddles_counts.items():
         for _ in range(nb_sad):
-            MorseComplex.CritEdges[new_sad].connected_maxima.remove(maximum.index)
+            MorseComplex.writable_edge(new_sad).connected_maxima.remove(maximum.index)
                 
     # now pop old saddle and old min from complex, as they 
     # have been cancelled and reconnected:
@@ -455,8 +456,32 @@ def cancel_critical_pairs(MorseComplex,
                           vert_dict: dict, 
                           edge_dict: dict, 
                           face_dict: dict, 
-                          salient_edge_pts: set = None):
-    redMorseComplex = deepcopy(MorseComplex) 
+                          salient_edge_pts: set = None,
+                          copy_on_write: bool = True,
+                          cancellations: list = None,
+                          mesh_arrays=None):
+    redMorseComplex = _reduction_copy(MorseComplex, threshold, copy_on_write)
+    
+    def closest_extremum(crit_edge):
+        return get_closest_extremum(crit_edge, 
+                                    redMorseComplex.CritFaces, 
+                                    vert_dict, 
+                                    edge_dict, 
+                                    face_dict, 
+                                    salient_edge_pts=salient_edge_pts)
+    
+    return _cancel_pairs(redMorseComplex, threshold, closest_extremum, 
+                         vert_dict, edge_dict, face_dict, cancellations, 
+                         mesh_arrays=mesh_arrays)
+
+def _reduction_copy(MorseComplex, threshold: float, copy_on_write: bool):
+    """! @brief Copies the Morse complex for a reduction and resets Morse 
+    cells, segmentations and Betti numbers if necessary.
+    """
+    if copy_on_write:
+        redMorseComplex = MorseComplex.copy_on_write()
+    else:
+        redMorseComplex = deepcopy(MorseComplex) 
     redMorseComplex.persistence = threshold
     
     # reset Morse cells, Segmentation and Betti numbers if necessary
@@ -468,51 +493,93 @@ def cancel_critical_pairs(MorseComplex,
         redMorseComplex.BettiNumbers = None
         redMorseComplex.partners = None
         redMorseComplex._flag_BettiNumbers = False
+    return redMorseComplex
+
+def _cancel_pairs(redMorseComplex, 
+                  threshold: float, 
+                  closest_extremum, 
+                  vert_dict: dict, 
+                  edge_dict: dict, 
+                  face_dict: dict, 
+                  cancellations: list = None, 
+                  mesh_arrays=None):
+    """! @brief Works down the cancellation queue on the given complex.
     
+    @details The closest extremum of each saddle is cached and only computed 
+    again for saddles whose connections or paths were changed by a 
+    cancellation (the new saddles of cancel_one_critical_pair_min/max). 
+    Their priorities in the queue are updated right away, so the queue 
+    always contains exactly the saddles closer than the threshold to an 
+    extremum. Ties are broken by the saddle index, therefore the reduction 
+    up to a lower threshold is a prefix of the reduction up to a higher one.
     
+    @param redMorseComplex The Morse complex to be reduced (changed in place).
+    @param threshold Only pairs closer than this are cancelled.
+    @param closest_extremum Function giving (index, dimension, distance) or 
+           None for a saddle.
+    @param vert_dict The dictionary of Vertex objects.
+    @param edge_dict The dictionary of Simplex objects of the edges.
+    @param face_dict The dictionary of Simplex objects of the faces.
+    @param cancellations (Optional) List the applied cancellations are 
+           appended to.
+    @param mesh_arrays (Optional) The MeshArrays object of the mesh. If given, 
+           the separatrix persistences of the new separatrices are computed 
+           in bulk after the cancellations.
+    
+    @return The reduced Morse complex.
+    """
     CancelPairs = CancellationQueue()
+    candidates = {}
+    touched_saddles = set()
+    pending = [] if mesh_arrays is not None else None
     
     # fill queue
     for crit_edge in redMorseComplex.CritEdges.values():
-        closest_extremum = get_closest_extremum(crit_edge, 
-                                                redMorseComplex.CritFaces, 
-                                                vert_dict, 
-                                                edge_dict, 
-                                                face_dict, 
-                                                salient_edge_pts=salient_edge_pts)
-        if closest_extremum != None:
-            index, dim, dist = closest_extremum
+        closest = closest_extremum(crit_edge)
+        candidates[crit_edge.index] = closest
+        if closest != None:
+            index, dim, dist = closest
             if dist < threshold:
-                CancelPairs.insert(tuple((dist, id(crit_edge), crit_edge)))
+                CancelPairs.insert(crit_edge.index, dist)
     
-    # work down queue
+    # work down queue: the priorities are always up to date, so the front 
+    # saddle can be cancelled with its closest extremum directly
     while CancelPairs.notEmpty():
-        prio, obj_id, saddle = CancelPairs.pop_front()
-        check = get_closest_extremum(saddle, 
-                                     redMorseComplex.CritFaces, 
-                                     vert_dict, 
-                                     edge_dict, 
-                                     face_dict, 
-                                     salient_edge_pts=salient_edge_pts)
-        if check != None:
-            closest, dim, dist = check
-            if dist <= CancelPairs.check_distance():
-                if dim == 0:
-                    redMorseComplex = cancel_one_critical_pair_min(saddle, 
-                                                                   redMorseComplex.CritVertices[closest], 
-                                                                   redMorseComplex, 
-                                                                   vert_dict, 
-                                                                   edge_dict, 
-                                                                   face_dict)
-                elif dim == 2:
-                    redMorseComplex = cancel_one_critical_pair_max(saddle, 
-                                                                   redMorseComplex.CritFaces[closest], 
-                                                                   redMorseComplex, 
-                                                                   vert_dict, 
-                                                                   edge_dict, 
-                                                                   face_dict)
+        dist, saddle_index = CancelPairs.pop_front()
+        # look the saddle up again, it might have been copied on write
+        saddle = redMorseComplex.CritEdges[saddle_index]
+        closest, dim, dist = candidates.pop(saddle_index)
+        if cancellations is not None:
+            cancellations.append(tuple((dist, saddle_index, closest, dim)))
+        if dim == 0:
+            redMorseComplex = cancel_one_critical_pair_min(saddle, 
+                                                           redMorseComplex.CritVertices[closest], 
+                                                           redMorseComplex, 
+                                                           vert_dict, 
+                                                           edge_dict, 
+                                                           face_dict, 
+                                                           touched_saddles=touched_saddles, 
+                                                           pending=pending)
+        elif dim == 2:
+            redMorseComplex = cancel_one_critical_pair_max(saddle, 
+                                                           redMorseComplex.CritFaces[closest], 
+                                                           redMorseComplex, 
+                                                           vert_dict, 
+                                                           edge_dict, 
+                                                           face_dict, 
+                                                           touched_saddles=touched_saddles, 
+                                                           pending=pending)
+        # update the saddles whose connections changed
+        for index in sorted(touched_saddles):
+            check = closest_extremum(redMorseComplex.CritEdges[index])
+            candidates[index] = check
+            if check != None and check[2] < threshold:
+                CancelPairs.update(index, check[2])
             else:
-                CancelPairs.insert(tuple((dist, obj_id, saddle)))
+                CancelPairs.remove(index)
+        touched_saddles.clear()
+    if pending:
+        _add_pending_separatrices(redMorseComplex, pending, simplex_values(mesh_arrays))
     return redMorseComplex
     
 
@@ -530,10 +597,6 @@ def get_closest_conforming_extremum(crit_edge,
     for face_ind, nb in face_counter.items():
         # cannot cancel loops, so only if there is a single path we can add the extremum
         if (labels['edges'][crit_edge.index] == labels['faces'][face_ind]) and nb==1:
-            # check for valuebale edge-min connections:
-            min_dist = []
-            for elt in crit_edge.connected_minima:
-                min_dist.append(vert_dict[elt].fun_val)
             # take absolute value btw the two highest vertices of edge and face respectively
             distances.append(tuple((face_ind, 2, abs(face_dict[face_ind].fun_val[0]-crit_edge.fun_val[0])))) 
                                
@@ -542,30 +605,11 @@ def get_closest_conforming_extremum(crit_edge,
     for vert_ind, nb in vert_counter.items():
         # cannot cancel loops, so only if there is a single path we can add the extremum
         if (labels['edges'][crit_edge.index] == {labels['vertices'][vert_ind]}) and nb==1:
-            #check for valuable max-edge connections:
-            max_dist = []
-            for elt in crit_edge.connected_maxima:
-                max_dist.append(face_dict[elt].fun_val[0])
-                
             # take absolute value btw the highest vertex of edge and the value of the vertex
             distances.append(tuple((vert_ind, 0, abs(crit_edge.fun_val[0]-vert_dict[vert_ind].fun_val)))) 
             
-    if sorted(distances, key=lambda item: item[2]):
-        if salient_edge_pts != None:
-            for closest, dim, distance in sorted(distances, key=lambda item: item[2]):
-                if dim == 0:
-                    if len(get_indices(crit_edge.paths[closest], edge_dict, face_dict, dim=1).intersection(salient_edge_pts)) < 6:
-                            return closest, dim, distance
-                elif dim == 2:
-                    if len(get_indices(crit_faces_dict[closest].paths[crit_edge.index], edge_dict, face_dict, dim=2).intersection(salient_edge_pts)) < 6:
-                            return closest, dim, distance
-                    
-            return None
-        else:    
-            closest, dim, distance = sorted(distances, key=lambda item: item[2])[0] 
-            return closest, dim, distance
-    else: 
-        return None
+    return _closest_candidate(crit_edge, distances, crit_faces_dict, 
+                              edge_dict, face_dict, salient_edge_pts, 6)
 
 
 
@@ -575,64 +619,70 @@ def cancel_critical_conforming_pairs(MorseComplex,
                                      edge_dict, 
                                      face_dict, 
                                      labels, 
-                                     salient_edge_pts=None):
-    redMorseComplex = deepcopy(MorseComplex) 
-    redMorseComplex.persistence = threshold
+                                     salient_edge_pts=None, 
+                                     copy_on_write=True, 
+                                     cancellations=None, 
+                                     mesh_arrays=None):
+    redMorseComplex = _reduction_copy(MorseComplex, threshold, copy_on_write)
     
-    # reset Morse cells, Segmentation and Betti numbers if necessary
-    if redMorseComplex._flag_MorseCells:
-        redMorseComplex.MorseCells = MorseCells()
-        redMorseComplex._flag_MorseCells = False
-        redMorseComplex.Segmentations = {}
-    if redMorseComplex._flag_BettiNumbers:
-        redMorseComplex.BettiNumbers = None
-        redMorseComplex.partners = None
-        redMorseComplex._flag_BettiNumbers = False
+    def closest_extremum(crit_edge):
+        return get_closest_conforming_extremum(crit_edge, 
+                                               redMorseComplex.CritFaces, 
+                                               vert_dict, 
+                                               edge_dict, 
+                                               face_dict, 
+                                               labels, 
+                                               salient_edge_pts=salient_edge_pts)
     
+    return _cancel_pairs(redMorseComplex, threshold, closest_extremum, 
+                         vert_dict, edge_dict, face_dict, cancellations, 
+                         mesh_arrays=mesh_arrays)
+
+
+def replay_cancellations(MorseComplex, 
+                         cancellations: list, 
+                         vert_dict: dict, 
+                         edge_dict: dict, 
+                         face_dict: dict, 
+                         mesh_arrays=None):
+    """! @brief Applies recorded cancellations to a copy of the Morse complex.
     
-    CancelPairs = CancellationQueue()
+    @details The cancellations are the ones recorded by cancel_critical_pairs 
+    or cancel_critical_conforming_pairs (cancellations parameter), so no 
+    queue or distances have to be computed again.
     
-    # fill queue
-    for crit_edge in redMorseComplex.CritEdges.values():
-        closest_extremum = get_closest_conforming_extremum(crit_edge, 
-                                                           redMorseComplex.CritFaces, 
+    @param MorseComplex The Morse complex the cancellations were recorded on 
+           (or a complex reduced by a prefix of them).
+    @param cancellations List of (persistence, saddle index, extremum index, 
+           extremum dimension) tuples in the order they are applied.
+    @param vert_dict The dictionary of Vertex objects.
+    @param edge_dict The dictionary of Simplex objects of the edges.
+    @param face_dict The dictionary of Simplex objects of the faces.
+    @param mesh_arrays (Optional) The MeshArrays object of the mesh. If given, 
+           the separatrix persistences are computed in bulk (see _cancel_pairs).
+    
+    @return The reduced Morse complex (a copy on write of the given one).
+    """
+    redMorseComplex = MorseComplex.copy_on_write()
+    pending = [] if mesh_arrays is not None else None
+    for dist, saddle_index, closest, dim in cancellations:
+        saddle = redMorseComplex.CritEdges[saddle_index]
+        if dim == 0:
+            redMorseComplex = cancel_one_critical_pair_min(saddle, 
+                                                           redMorseComplex.CritVertices[closest], 
+                                                           redMorseComplex, 
                                                            vert_dict, 
                                                            edge_dict, 
                                                            face_dict, 
-                                                           labels, 
-                                                           salient_edge_pts=salient_edge_pts)
-        if closest_extremum != None:
-            index, dim, dist = closest_extremum
-            if dist < threshold:
-                CancelPairs.insert(tuple((dist, id(crit_edge), crit_edge)))
-    
-    # work down queue
-    while CancelPairs.notEmpty():
-        prio, obj_id, saddle = CancelPairs.pop_front()
-        check = get_closest_conforming_extremum(saddle, 
-                                                redMorseComplex.CritFaces, 
-                                                vert_dict, 
-                                                edge_dict, 
-                                                face_dict, 
-                                                labels, 
-                                                salient_edge_pts=salient_edge_pts)
-        if check != None:
-            closest, dim, dist = check
-            if dist <= CancelPairs.check_distance():
-                if dim == 0:
-                    redMorseComplex = cancel_one_critical_pair_min(saddle, 
-                                                                   redMorseComplex.CritVertices[closest], 
-                                                                   redMorseComplex, 
-                                                                   vert_dict, 
-                                                                   edge_dict,
-                                                                   face_dict)
-                elif dim == 2:
-                    redMorseComplex = cancel_one_critical_pair_max(saddle, 
-                                                                   redMorseComplex.CritFaces[closest], 
-                                                                   redMorseComplex, 
-                                                                   vert_dict,
-                                                                   edge_dict, 
-                                                                   face_dict)
-            else:
-                CancelPairs.insert(tuple((dist, obj_id, saddle)))
-    return redMorseComplex
\ No newline at end of file
+                                                           pending=pending)
+        elif dim == 2:
+            redMorseComplex = cancel_one_critical_pair_max(saddle, 
+                                                           redMorseComplex.CritFaces[closest], 
+                                                           redMorseComplex, 
+                                                           vert_dict, 
+                                                           edge_dict, 
+                                                           face_dict, 
+                                                           pending=pending)
+    if pending:
+        _add_pending_separatrices(redMorseComplex, pending, simplex_values(mesh_arrays))
+    return redMorseComplex
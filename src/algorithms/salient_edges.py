@@ -0,0 +1,210 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file salient_edges.py
+#
+# @brief Contains the SalientEdgeTracker class, which updates the salient
+# edge points of a double threshold incrementally when the thresholds change.
+#
+# @section description_salient_edges Description
+# The rows of a SeparatrixTable are sorted by separatrix persistence, so
+# moving a threshold only moves the separatrices between the old and the
+# new threshold in or out of the strong or weak separatrices. The tracker
+# counts for every vertex the strong and weak separatrices containing it and
+# only updates the counts of the vertices of these separatrices. The weak
+# points connected to strong points (see hysteresis_mask) are recomputed on
+# the connected components of strong and weak points around these vertices
+# only, so an update does not depend on the size of the mesh. The changed
+# vertices are reported, e.g. to recolor only them.
+#
+# @section libraries_salient_edges Libraries/Modules
+# - numpy standard library
+# - separatrix_table
+
+# imports
+import numpy as np
+
+from .separatrix_table import gather_csr
+
+class SalientEdgeTracker:
+    """! @brief Keeps the salient edge points (ridges or valleys) of a double
+    threshold up to date while the thresholds change.
+    """
+    ## @var table
+    # The SeparatrixTable of the separatrices.
+    ## @var mesh_arrays
+    # The MeshArrays object of the mesh.
+    ## @var mode
+    # 1 for ridges, 2 for valleys (see get_salient_sepa_indices).
+    ## @var valid
+    # Boolean numpy array over the rows of the table, True for the
+    # separatrices within the length limits.
+    ## @var strong_count
+    # Numpy array with the number of strong separatrices of every vertex.
+    ## @var weak_count
+    # Numpy array with the number of weak separatrices of every vertex.
+    ## @var candidates
+    # Sorted numpy array of the vertices on a strong or weak separatrix.
+    ## @var points
+    # Sorted numpy array of the current salient edge points.
+    ## @var rows
+    # The (high, low) row indices of the current thresholds (see
+    # SeparatrixTable.threshold_rows).
+    ## @var thresholds
+    # The current (thresh_high, thresh_low) or None.
+
+    __slots__ = ("table", "mesh_arrays", "mode", "valid", "strong_count", "weak_count",
+                 "candidates", "points", "rows", "thresholds", "_local")
+
+    def __init__(self,
+                 table,
+                 mesh_arrays,
+                 mode: int = 1,
+                 min_length: int = 1,
+                 max_length: int = None):
+        """! @brief The constructor of a SalientEdgeTracker, starting without
+        salient edge points.
+        @param table The SeparatrixTable of the separatrices.
+        @param mesh_arrays The MeshArrays object of the mesh.
+        @param mode (Optional) 1 for ridges, 2 for valleys. Default is 1.
+        @param min_length (Optional) Minimum length of the separatrices.
+        @param max_length (Optional) Maximum length of the separatrices.
+        """
+        self.table = table
+        self.mesh_arrays = mesh_arrays
+        self.mode = mode
+        self.valid = table.valid_rows(min_length, max_length)
+        n_vertices = mesh_arrays.n_vertices
+        self.strong_count = np.zeros(n_vertices, dtype=np.int32)
+        self.weak_count = np.zeros(n_vertices, dtype=np.int32)
+        self.candidates = np.zeros(0, dtype=np.int64)
+        self.points = np.zeros(0, dtype=np.int64)
+        # no strong or weak rows
+        self.rows = (len(table), len(table)) if mode == 1 else (0, 0)
+        self.thresholds = None
+        self._local = np.full(n_vertices, -1, dtype=np.int64)
+
+    def _classes(self, rows: np.ndarray, high: int, low: int) -> np.ndarray:
+        """! @brief Gives 2 for strong, 1 for weak and 0 for other rows."""
+        return np.where(self.valid[rows], self.table.row_classes(rows, high, low, mode=self.mode), 0)
+
+    def update(self, thresh_high: float, thresh_low: float = None) -> tuple:
+        """! @brief Moves the thresholds and updates the salient edge points.
+        @param thresh_high The new high threshold.
+        @param thresh_low (Optional) The new weak threshold. Default is
+               thresh_high.
+        @return added, removed Numpy arrays with the vertices that became or
+                stopped being salient edge points.
+        """
+        if thresh_low is None:
+            thresh_low = thresh_high
+        high, low = self.table.threshold_rows(thresh_high, thresh_low, mode=self.mode)
+        old_high, old_low = self.rows
+        self.rows = (high, low)
+        self.thresholds = (thresh_high, thresh_low)
+
+        # only rows between the old and new thresholds can change their class
+        ranges = sorted(((min(high, old_high), max(high, old_high)),
+                         (min(low, old_low), max(low, old_low))))
+        if ranges[1][0] <= ranges[0][1]:
+            ranges = [(ranges[0][0], max(ranges[0][1], ranges[1][1]))]
+        rows = np.concatenate([np.arange(start, stop, dtype=np.int64) for start, stop in ranges])
+        old_classes = self._classes(rows, old_high, old_low)
+        new_classes = self._classes(rows, high, low)
+        changed = old_classes != new_classes
+        if not changed.any():
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        rows, old_classes, new_classes = rows[changed], old_classes[changed], new_classes[changed]
+
+        touched = np.unique(self.table.row_vertices(rows))
+        was_candidate = self._is_candidate(touched)
+        for count, cls in ((self.strong_count, 2), (self.weak_count, 1)):
+            np.subtract.at(count, self.table.row_vertices(rows[old_classes == cls]), 1)
+            np.add.at(count, self.table.row_vertices(rows[new_classes == cls]), 1)
+        is_candidate = self._is_candidate(touched)
+        self.candidates = np.union1d(np.setdiff1d(self.candidates, touched[was_candidate & ~is_candidate],
+                                                  assume_unique=True),
+                                     touched[is_candidate & ~was_candidate])
+
+        # only the components of the touched vertices are grown again
+        region = self._region(touched)
+        old_points = self.points[np.isin(self.points, np.union1d(touched, region))]
+        new_points = self._grow(region)
+        added = np.setdiff1d(new_points, old_points, assume_unique=True)
+        removed = np.setdiff1d(old_points, new_points, assume_unique=True)
+        self.points = np.union1d(np.setdiff1d(self.points, removed, assume_unique=True), added)
+        return added, removed
+
+    def _is_candidate(self, vertices: np.ndarray) -> np.ndarray:
+        """! @brief Gives True for the vertices on a strong or weak separatrix."""
+        return (self.strong_count[vertices] > 0) | (self.weak_count[vertices] > 0)
+
+    def _region(self, touched: np.ndarray) -> np.ndarray:
+        """! @brief Collects the candidates connected via candidates to the
+        touched vertices or their neighbors.
+        @details Only the components of these candidates can change their
+        salient edge points, all other components keep their points.
+        @param touched Numpy array of the vertices whose counts changed.
+        @return Sorted numpy array of the candidates of the touched components.
+        """
+        ptr, idx = self.mesh_arrays.vert_nbr_ptr, self.mesh_arrays.vert_nbr_idx
+        front = np.union1d(touched, gather_csr(ptr, idx, touched))
+        return self._flood(front[self._is_candidate(front)])
+
+    def _grow(self, candidates: np.ndarray) -> np.ndarray:
+        """! @brief Keeps the candidates connected to a strong point via
+        candidates (hysteresis_mask on the subgraph of the candidates).
+        @details Only the components with a strong point are visited, starting
+        from their strong points.
+        @param candidates Sorted numpy array of candidates forming whole
+               connected components.
+        @return Sorted numpy array of the salient edge points among them.
+        """
+        strong = self.strong_count[candidates] > 0
+        if strong.all() or not strong.any():
+            return candidates[strong]
+        return self._flood(candidates[strong])
+
+    def _flood(self, front: np.ndarray) -> np.ndarray:
+        """! @brief Breadth first search over the candidates, marking visited
+        vertices in _local.
+        @param front Numpy array of unique candidates to start from.
+        @return Sorted numpy array of the candidates connected to them.
+        """
+        ptr, idx = self.mesh_arrays.vert_nbr_ptr, self.mesh_arrays.vert_nbr_idx
+        local = self._local
+        local[front] = 0
+        parts = [front]
+        while len(front):
+            front = np.unique(gather_csr(ptr, idx, front))
+            front = front[(local[front] < 0) & self._is_candidate(front)]
+            local[front] = 0
+            parts.append(front)
+        visited = np.sort(np.concatenate(parts))
+        local[visited] = -1
+        return visited
+
+    def mask(self) -> np.ndarray:
+        """! @brief Gives the salient edge points as boolean numpy array over
+        the vertices.
+        """
+        mask = np.zeros(self.mesh_arrays.n_vertices, dtype=bool)
+        mask[self.points] = True
+        return mask
@@ -0,0 +1,187 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file salient_paths.py
+#
+# @brief Contains the SalientPathCounter class, which counts the salient edge
+# points on separatrix paths for the salient edge constrained reduction.
+#
+# @section description_salient_paths Description
+# The reduction with salient edge points only cancels a pair if the path
+# between them touches less than 3 (6 for conforming) salient edge points,
+# i.e. vertices of the edges (minimal lines) or faces (maximal lines) at the
+# even positions of the path. Instead of building the vertex set of the whole
+# path for every check, the counter stores for every path the set of its
+# salient vertices, truncated to a few elements (enough to decide the
+# checks). Paths joined during the cancellations (PathRopes made of a path,
+# the reversed inner part of another path and a third path) get their sets
+# from the sets of their parts, so every path is only walked once.
+#
+# @section libraries_salient_paths Libraries/Modules
+# - numpy standard library
+# - paths
+
+# imports
+import numpy as np
+
+from .paths import PathRope, path_array
+
+class SalientPathCounter:
+    """! @brief Counts the salient edge points on separatrix paths.
+
+    @details The counts saturate at cap, which is enough to compare them
+    with thresholds up to cap. The sets of all paths seen are cached, so the
+    counter can be reused for several reductions with the same salient
+    edge points.
+    """
+    ## @var salient_mask
+    # Boolean numpy array, True for the salient edge points.
+    ## @var cap
+    # The maximal count that is computed exactly.
+    ## @var _simplices
+    # Dictionary dimension -> numpy array with the vertex indices of the
+    # simplices at the even path positions (edges for 1, faces for 2).
+    ## @var _cache
+    # Dictionary (id of path, dimension) -> (path, set, set without the
+    # first simplex).
+
+    def __init__(self, salient_mask: np.ndarray, edges: np.ndarray, faces: np.ndarray, cap: int = 6):
+        """! @brief The constructor of a SalientPathCounter.
+        @param salient_mask Boolean numpy array over the vertices.
+        @param edges Numpy array (n_edges, 2) with the vertex indices of the edges.
+        @param faces Numpy array (n_faces, 3) with the vertex indices of the faces.
+        @param cap (Optional) The maximal count that is computed exactly.
+               Default is 6.
+        """
+        self.salient_mask = np.asarray(salient_mask, dtype=bool)
+        self.cap = cap
+        self._simplices = {1: edges, 2: faces}
+        self._cache = {}
+
+    @classmethod
+    def from_points(cls, salient_edge_pts: set, mesh_arrays, cap: int = 6):
+        """! @brief Creates a counter from a set of salient edge points.
+        @param salient_edge_pts Set of vertex indices.
+        @param mesh_arrays The MeshArrays object of the mesh.
+        @param cap (Optional) The maximal count that is computed exactly.
+        @return A SalientPathCounter object.
+        """
+        mask = np.zeros(mesh_arrays.n_vertices, dtype=bool)
+        mask[np.fromiter(salient_edge_pts, dtype=np.int64, count=len(salient_edge_pts))] = True
+        return cls(mask, mesh_arrays.edges, mesh_arrays.faces, cap=cap)
+
+    def count(self, path, dim: int) -> int:
+        """! @brief Gives the number of salient edge points on a path.
+        @param path A Path, PathRope or list.
+        @param dim 1 for minimal lines (edges at even positions), 2 for
+               maximal lines (faces at even positions).
+        @return The number of distinct salient vertices, at most cap.
+        """
+        return len(self._sets(path, dim)[0])
+
+    def _truncate(self, values: set) -> frozenset:
+        if len(values) > self.cap:
+            values = set(sorted(values)[:self.cap])
+        return frozenset(values)
+
+    def _lookup(self, path, dim: int):
+        cached = self._cache.get((id(path), dim))
+        if cached is not None and cached[0] is path:
+            return cached[1], cached[2]
+        return None
+
+    def _sets(self, path, dim: int) -> tuple:
+        """! @brief Gives the (truncated) set of salient vertices of the path 
+        and the one without the first simplex. Nested ropes are handled with 
+        an explicit stack, the parts are computed before the ropes.
+        """
+        stack = [path]
+        while stack:
+            current = stack[-1]
+            if self._lookup(current, dim) is not None:
+                stack.pop()
+                continue
+            parts = _rope_parts(current) if isinstance(current, PathRope) else None
+            if parts is not None:
+                missing = [source for source, _ in parts if self._lookup(source, dim) is None]
+                if missing:
+                    stack.extend(missing)
+                    continue
+                full, tail = self._combine(parts, dim)
+            if parts is None or full is None:
+                full, tail = self._salient_vertices(path_array(current)[::2], dim)
+            self._cache[(id(current), dim)] = (current, full, tail)
+            stack.pop()
+        return self._lookup(path, dim)
+
+    def _combine(self, parts: list, dim: int) -> tuple:
+        """! @brief Combines the sets of the parts of a rope.
+        @return The two sets of the rope (the second one can be None if it is 
+                unknown) or (None, None) if the parts do not suffice.
+        """
+        full = set()
+        tail = set()
+        for i, (source, inner) in enumerate(parts):
+            source_full, source_tail = self._lookup(source, dim)
+            if inner:
+                # the even positions of the reversed inner part are the 
+                # even positions of the path without its first simplex, 
+                # without the first one of the part itself it is unknown
+                source_full, source_tail = source_tail, None
+                if source_full is None:
+                    return None, None
+            full.update(source_full)
+            if i == 0 and source_tail is None:
+                tail = None
+            elif tail is not None:
+                tail.update(source_tail if i == 0 else source_full)
+        return self._truncate(full), None if tail is None else self._truncate(tail)
+
+    def _salient_vertices(self, simplices: np.ndarray, dim: int) -> tuple:
+        """! @brief Gives the (truncated) sets of salient vertices of the 
+        simplices with and without the first simplex.
+        """
+        vertices = self._simplices[dim][simplices]
+        tail = vertices[1:].ravel()
+        tail = set(tail[self.salient_mask[tail]].tolist())
+        full = tail.union(vertex for vertex in vertices[:1].ravel().tolist() 
+                          if self.salient_mask[vertex])
+        return self._truncate(full), self._truncate(tail)
+
+def _rope_parts(rope: PathRope):
+    """! @brief Gives the parts of a rope whose salient sets can be combined.
+    @details Possible if every part starts at an even position and is either 
+    a whole path or the reversed inner part (path[1:-1][::-1]) of a path of 
+    even length.
+    @return List of (source, is reversed inner part) tuples or None.
+    """
+    parts = []
+    offset = 0
+    for source, start, stop, reverse in rope.parts:
+        if offset % 2 == 1:
+            return None
+        n = len(source)
+        if start == 0 and stop == n and not reverse:
+            parts.append((source, False))
+        elif start == 1 and stop == n - 1 and reverse and n % 2 == 0:
+            parts.append((source, True))
+        else:
+            return None
+        offset += stop - start
+    return parts
@@ -0,0 +1,109 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file separatrix_persistence.py
+#
+# @brief Contains functions that compute the separatrix persistences of many
+# separatrices at once.
+#
+# @section description_separatrix_persistence Description
+# The separatrix persistence is computed from the function values of the
+# simplices along the path of a separatrix: for minimal lines the highest
+# value of the edges and the value of the vertices, for maximal lines the
+# highest value of the faces and edges. The paths of all separatrices are
+# concatenated into one index array, the values are gathered from the
+# per-simplex value arrays and reduced per path with np.add.reduceat (or
+# another ufunc), so several persistence definitions are computed in the
+# same pass:
+# - "average": the average value along the path (compute_min_sad_persistence
+#   and compute_max_sad_persistence),
+# - "start_end_average": the average of the values at the origin and the
+#   destination (MorseComplex.change_separatrix_persistences),
+# - "maximum" and "minimum": the highest and lowest value along the path.
+#
+# np.add.reduceat can sum the values of a path in another order than the
+# Python sum of compute_min_sad_persistence and compute_max_sad_persistence,
+# so the averages agree with these up to rounding.
+#
+# @section libraries_separatrix_persistence Libraries/Modules
+# - numpy standard library
+# - paths
+
+# imports
+import numpy as np
+
+from .paths import path_array
+
+PERSISTENCE_DEFINITIONS = ("average", "start_end_average", "maximum", "minimum")
+
+def simplex_values(mesh_arrays) -> tuple:
+    """! @brief Gives the values of the vertices, edges and faces used for the
+    separatrix persistence.
+    @param mesh_arrays The MeshArrays object of the mesh (with function values).
+    @return Tuple of numpy arrays with the function value of every vertex and
+            the highest function value of every edge and face.
+    """
+    return (mesh_arrays.fun_val,
+            mesh_arrays.edge_fun_vals[:, 0],
+            mesh_arrays.face_fun_vals[:, 0])
+
+def separatrix_persistences(separatrices: list,
+                            values: tuple,
+                            definitions: tuple = ("average",)) -> dict:
+    """! @brief Computes the separatrix persistences of many separatrices.
+    @param separatrices List of Separatrix objects.
+    @param values Tuple of the vertex, edge and face values (see simplex_values).
+    @param definitions (Optional) Names of the persistence definitions to
+           compute (see PERSISTENCE_DEFINITIONS). Default is ("average",).
+    @return Dictionary definition -> numpy array with the persistence of
+            every separatrix.
+    """
+    for definition in definitions:
+        if definition not in PERSISTENCE_DEFINITIONS:
+            raise ValueError("Unknown separatrix persistence definition: " + str(definition))
+    if len(separatrices) == 0:
+        return {definition: np.zeros(0, dtype=float) for definition in definitions}
+
+    paths = [path_array(sepa.path) for sepa in separatrices]
+    lengths = np.array([len(path) for path in paths], dtype=np.int64)
+    dimensions = np.array([sepa.dimension for sepa in separatrices], dtype=np.int64)
+    starts = np.zeros(len(paths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    indices = np.concatenate(paths)
+
+    # the simplices alternate between the dimension of the separatrix
+    # (even positions) and one below (odd positions)
+    parity = (np.arange(len(indices)) - np.repeat(starts, lengths)) % 2
+    simplex_dim = np.repeat(dimensions, lengths) - parity
+    path_values = np.empty(len(indices), dtype=float)
+    for dim in range(3):
+        at_dim = simplex_dim == dim
+        path_values[at_dim] = values[dim][indices[at_dim]]
+
+    persistences = {}
+    for definition in definitions:
+        if definition == "average":
+            persistences[definition] = np.add.reduceat(path_values, starts) / lengths
+        elif definition == "start_end_average":
+            persistences[definition] = (path_values[starts] + path_values[starts + lengths - 1]) / 2
+        elif definition == "maximum":
+            persistences[definition] = np.maximum.reduceat(path_values, starts)
+        elif definition == "minimum":
+            persistences[definition] = np.minimum.reduceat(path_values, starts)
+    return persistences
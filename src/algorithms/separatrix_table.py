@@ -0,0 +1,238 @@
+"""
+    MorseMesh
+    Copyright (C) 2023  Jan Philipp Bullenkamp
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+##
+# @file separatrix_table.py
+#
+# @brief Contains the SeparatrixTable class, which stores the vertices of
+# the separatrices of a Morse complex sorted by separatrix persistence.
+#
+# @section description_separatrix_table Description
+# The salient edge detection collects the vertices of all separatrices with
+# a separatrix persistence above (ridges) or below (valleys) a threshold.
+# The table expands every separatrix path into its vertex indices once and
+# stores them in CSR form, with the rows sorted by persistence. The
+# separatrices above or below a threshold are then a contiguous range of
+# rows found by a binary search, and their vertices a slice of the index
+# array.
+#
+# @section libraries_separatrix_table Libraries/Modules
+# - numpy standard library
+# - paths
+
+# imports
+import numpy as np
+
+from .paths import path_array
+
+def gather_csr(ptr: np.ndarray, idx: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """! @brief Concatenates the entries of some rows of a CSR adjacency.
+    @param ptr The CSR pointer array.
+    @param idx The CSR index array.
+    @param rows Numpy array of row indices.
+    @return Numpy array with idx[ptr[r]:ptr[r+1]] for all rows r concatenated.
+    """
+    counts = ptr[rows + 1] - ptr[rows]
+    # positions of the entries of the rows in idx
+    offsets = np.repeat(ptr[rows] - np.cumsum(counts) + counts, counts)
+    return idx[offsets + np.arange(counts.sum())]
+
+class SeparatrixTable:
+    """! @brief The vertex indices of a list of separatrices, sorted by
+    separatrix persistence.
+    """
+    ## @var persistences
+    # Numpy array with the sorted separatrix persistences.
+    ## @var lengths
+    # Numpy array with the path length of every separatrix.
+    ## @var vert_ptr
+    # CSR pointer array separatrix -> vertices.
+    ## @var vert_idx
+    # CSR index array separatrix -> vertices (unique and sorted per separatrix).
+    ## @var source
+    # The list of (persistence, Separatrix) tuples the table was built from.
+    ## @var n_source
+    # The length of the source list when the table was built.
+
+    __slots__ = ("persistences", "lengths", "vert_ptr", "vert_idx", "source", "n_source")
+
+    def __init__(self, separatrices: list, edges: np.ndarray, faces: np.ndarray):
+        """! @brief Expands the paths of the separatrices into vertex indices
+        (see add_sepa_to_edge).
+        @param separatrices List of (persistence, Separatrix) tuples.
+        @param edges Numpy array (n_edges, 2) with the vertex indices of the edges.
+        @param faces Numpy array (n_faces, 3) with the vertex indices of the faces.
+        """
+        self.source = separatrices
+        self.n_source = len(separatrices)
+        order = sorted(range(len(separatrices)), key=lambda i: separatrices[i][0])
+        self.persistences = np.array([separatrices[i][0] for i in order], dtype=float)
+        self.lengths = np.array([len(separatrices[i][1].path) for i in order], dtype=np.int64)
+
+        rows = []
+        verts = []
+        for row, i in enumerate(order):
+            sepa = separatrices[i][1]
+            path = path_array(sepa.path)
+            if sepa.dimension == 1:
+                # edges and vertices
+                parts = (edges[path[::2]].ravel(), path[1::2])
+            elif sepa.dimension == 2:
+                # faces and edges
+                parts = (faces[path[::2]].ravel(), edges[path[1::2]].ravel())
+            else:
+                raise ValueError("Separatrix should have dimension 1 or 2!")
+            for part in parts:
+                verts.append(part)
+                rows.append(np.full(len(part), row, dtype=np.int64))
+
+        n_rows = len(order)
+        if verts:
+            rows = np.concatenate(rows)
+            verts = np.concatenate(verts).astype(np.int64)
+            # unique vertices per separatrix, rows stay sorted
+            n_vertices = int(verts.max()) + 1
+            rows, verts = np.divmod(np.unique(rows * n_vertices + verts), n_vertices)
+        else:
+            rows = verts = np.zeros(0, dtype=np.int64)
+        self.vert_ptr = np.searchsorted(rows, np.arange(n_rows + 1)).astype(np.int64)
+        self.vert_idx = verts
+
+    def __len__(self) -> int:
+        return len(self.persistences)
+
+    def is_current(self, separatrices: list) -> bool:
+        """! @brief Checks whether the table was built from this (unchanged)
+        list of separatrices.
+        """
+        return self.source is separatrices and self.n_source == len(separatrices)
+
+    def vertices(self, start: int, stop: int, min_length: int = 1, max_length: int = None) -> np.ndarray:
+        """! @brief Gives the vertices of a range of rows.
+        @param start The first row.
+        @param stop The row after the last row.
+        @param min_length (Optional) Only separatrices with longer paths are
+               used. Default is 1.
+        @param max_length (Optional) Only separatrices with shorter paths are
+               used. Default is None.
+        @return Numpy array with the unique vertex indices.
+        """
+        keep = self.valid_rows(min_length, max_length)[start:stop]
+        if keep.all():
+            return np.unique(self.vert_idx[self.vert_ptr[start]:self.vert_ptr[stop]])
+        return np.unique(self.row_vertices(np.flatnonzero(keep) + start))
+
+    def valid_rows(self, min_length: int = 1, max_length: int = None) -> np.ndarray:
+        """! @brief Gives a boolean array over the rows, True for the 
+        separatrices with min_length < path length < max_length.
+        """
+        valid = self.lengths > min_length
+        if max_length is not None:
+            valid &= self.lengths < max_length
+        return valid
+
+    def row_vertices(self, rows: np.ndarray) -> np.ndarray:
+        """! @brief Gives the vertices of some rows.
+        @param rows Numpy array of row indices.
+        @return Numpy array with the vertex indices of the rows concatenated 
+                (a vertex appears once for every row containing it).
+        """
+        return gather_csr(self.vert_ptr, self.vert_idx, rows)
+
+    def query(self,
+              thresh_high: float,
+              thresh_low: float,
+              mode: int = 1,
+              min_length: int = 1,
+              max_length: int = None) -> tuple:
+        """! @brief Gives the vertices of the strong and weak separatrices of
+        a double threshold (see get_salient_sepa_indices).
+        @param thresh_high The high threshold.
+        @param thresh_low The weak threshold.
+        @param mode 1 for ridges (persistence above the thresholds), 2 for
+               valleys (persistence below the negative thresholds), 3 for both.
+        @param min_length (Optional) Minimum length of the separatrices.
+        @param max_length (Optional) Maximum length of the separatrices.
+        @return strong, weak Numpy arrays with the unique vertex indices.
+        """
+        if mode == 3:
+            ridges = self.query(thresh_high, thresh_low, 1, min_length, max_length)
+            valleys = self.query(thresh_high, thresh_low, 2, min_length, max_length)
+            return np.union1d(ridges[0], valleys[0]), np.union1d(ridges[1], valleys[1])
+        high, low = self.threshold_rows(thresh_high, thresh_low, mode=mode)
+        if mode == 1:
+            return (self.vertices(high, len(self), min_length, max_length),
+                    self.vertices(low, max(low, high), min_length, max_length))
+        elif mode == 2:
+            return (self.vertices(0, high, min_length, max_length),
+                    self.vertices(high, max(high, low), min_length, max_length))
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    def classify(self,
+                 thresh_high: float,
+                 thresh_low: float,
+                 min_length: int = 1,
+                 max_length: int = None) -> tuple:
+        """! @brief Classifies all separatrices as strong or weak ridges and 
+        valleys of a double threshold.
+        @return ridges, valleys Numpy arrays over the rows with 2 for strong, 
+                1 for weak and 0 for the other separatrices.
+        """
+        rows = np.arange(len(self))
+        valid = self.valid_rows(min_length, max_length)
+        classes = []
+        for mode in (1, 2):
+            high, low = self.threshold_rows(thresh_high, thresh_low, mode=mode)
+            classes.append(np.where(valid, self.row_classes(rows, high, low, mode=mode), 0))
+        return tuple(classes)
+
+    def row_classes(self, rows: np.ndarray, high: int, low: int, mode: int = 1) -> np.ndarray:
+        """! @brief Gives 2 for the strong, 1 for the weak and 0 for the other 
+        rows of the threshold rows high and low (see threshold_rows).
+        """
+        if mode == 1:
+            return np.where(rows >= high, 2, np.where(rows >= low, 1, 0)).astype(np.int8)
+        return np.where(rows < high, 2, np.where(rows < low, 1, 0)).astype(np.int8)
+
+    def vertex_masks(self, classes: np.ndarray, n_vertices: int) -> tuple:
+        """! @brief Gives the vertices of the strong and weak rows.
+        @param classes Numpy array over the rows (see classify).
+        @param n_vertices The number of vertices of the mesh.
+        @return strong, weak Boolean numpy arrays over the vertices.
+        """
+        vertex_classes = np.repeat(classes, np.diff(self.vert_ptr))
+        strong = np.zeros(n_vertices, dtype=bool)
+        weak = np.zeros(n_vertices, dtype=bool)
+        strong[self.vert_idx[vertex_classes == 2]] = True
+        weak[self.vert_idx[vertex_classes == 1]] = True
+        return strong, weak
+
+    def threshold_rows(self, thresh_high: float, thresh_low: float, mode: int = 1) -> tuple:
+        """! @brief Finds the rows where the strong and weak separatrices of 
+        a double threshold begin or end.
+        @details For ridges (mode 1) the strong rows are [high, len) and the 
+        weak rows [low, high), for valleys (mode 2) the strong rows are 
+        [0, high) and the weak rows [high, low).
+        @return high, low The two row indices.
+        """
+        if mode == 1:
+            return (int(np.searchsorted(self.persistences, thresh_high, side="right")),
+                    int(np.searchsorted(self.persistences, thresh_low, side="right")))
+        return (int(np.searchsorted(self.persistences, -thresh_high, side="left")),
+                int(np.searchsorted(self.persistences, -thresh_low, side="left")))
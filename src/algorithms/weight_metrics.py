@@ -16,10 +16,74 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import numpy as np
+
 # idea: percentage of salient edge pts on a boundary between two cells
 def compute_weight_saledge(points: set, sal_points: set):
     return len(points.intersection(sal_points))/len(points)
 
+# same as compute_weight_saledge, but from the counts of the boundary, which 
+# can be updated in O(1) when cells are merged (compute_weight_saledge is 
+# kept to verify the counts)
+class BoundaryCounts:
+    """! @brief The number of salient edge points and of all points on the 
+    boundary between two cells.
+    """
+    ## @var salient
+    # The number of salient edge points on the boundary.
+    ## @var total
+    # The number of points on the boundary.
+    
+    __slots__ = ("salient", "total")
+    
+    def __init__(self, salient: int = 0, total: int = 0):
+        """! @brief The constructor of BoundaryCounts.
+        @param salient The number of salient edge points on the boundary.
+        @param total The number of points on the boundary.
+        """
+        self.salient = salient
+        self.total = total
+    
+    @classmethod
+    def from_points(cls, points: set, sal_points: set):
+        """! @brief Counts the (salient) points of a boundary.
+        @param points The points of the boundary.
+        @param sal_points The salient edge points.
+        @return A BoundaryCounts object.
+        """
+        return cls(len(points.intersection(sal_points)), len(points))
+    
+    @classmethod
+    def from_mask(cls, points: set, sal_mask: np.ndarray):
+        """! @brief Counts the (salient) points of a boundary from the 
+        salient edge points as boolean mask over the vertices.
+        @param points The points of the boundary.
+        @param sal_mask Boolean numpy array, True for the salient edge points.
+        @return A BoundaryCounts object.
+        """
+        indices = np.fromiter(points, dtype=np.int64, count=len(points))
+        return cls(int(sal_mask[indices].sum()), len(points))
+    
+    def add(self, other, shared=None):
+        """! @brief Adds the counts of another boundary (when the boundaries 
+        of two merged cells to a common neighbor are joined).
+        @param other A BoundaryCounts object.
+        @param shared (Optional) A BoundaryCounts object with the counts of 
+               the points on both boundaries, which are only counted once.
+        """
+        self.salient += other.salient
+        self.total += other.total
+        if shared is not None:
+            self.salient -= shared.salient
+            self.total -= shared.total
+    
+    def weight(self) -> float:
+        """! @brief The percentage of salient edge points on the boundary."""
+        return self.salient / self.total
+    
+    def __repr__(self) -> str:
+        return "BoundaryCounts(" + str(self.salient) + ", " + str(self.total) + ")"
+
 # idea: average fun_val on a boundary between two cells
 def compute_weight_funvals(points: set, vert_dict: dict):
     fun_vals = []
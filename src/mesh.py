@@ -26,6 +26,7 @@
 # - min
 # - max
 # - range
+# - MeshArrays
 # - Vertices
 # - Edges
 # - Faces
@@ -41,12 +42,14 @@
 # - MorseComplex
 # - reducedMorseComplexes
 # - maximalReducedComplex
+# - PersistenceHierarchy
 
-from src.algorithms.read_ply import load_ply
+from src.algorithms.read_ply import load_ply_arrays
+from src.algorithms.mesh_arrays import MeshArrays
 
 from src.evaluation_and_labels.labels_read_write import Labels
 
-from src.algorithms.read_or_process_funvals import read_funvals
+from src.algorithms.read_or_process_funvals import read_funvals_arrays
 
 from src.timer import timed
 from collections import Counter
@@ -82,15 +85,25 @@ class Mesh:
     # The maximal function value
     ## @var range
     # The range of function values. (max-min)
+    ## @var MeshArrays
+    # The compact array representation of the mesh (MeshArrays class object).
+    # If set, it is the primary storage and the dictionaries below are only
+    # built from it when they are accessed.
     ## @var Vertices
     # A dictionary to store the vertices. Stored as key-value with key: vertex 
-    # index and value: Vertex class object
+    # index and value: Vertex class object. Lazily built from MeshArrays.
     ## @var Edges
     # A dictionary to store the edges. Stored as key-value with key: edge index 
-    # and value: Simplex class object
+    # and value: Simplex class object. Lazily built from MeshArrays.
     ## @var Faces
     # A dictionary to store the faces. Stored as key-value with key: face index 
-    # and value: Simplex class object
+    # and value: Simplex class object. Lazily built from MeshArrays.
+    ## @var UserLabels
+    # A dictionary with the loaded user labels of the vertices, edges and faces 
+    # and the set of labels of critical vertices ('crit').
+    ## @var VertexUserLabels
+    # None or a numpy array with the user label of every vertex (-1 for 
+    # unlabelled vertices), built once when the user labels are loaded.
     
     ## @var _flag_process_lower_stars
     # Boolean whether the discrete vector field V has been calculated.
@@ -111,8 +124,19 @@ class Mesh:
     ## @var reducedMorseComplexes
     # A dictionary of reduced Morse complexes. The keys are the persistences of 
     # the respective reduced Morse complex in value.
+    ## @var _salient_path_counters
+    # A dictionary of cached SalientPathCounter objects. The keys are 
+    # (thresh_high, thresh_low, separatrix_type) tuples, at most 
+    # MAX_SALIENT_PATH_COUNTERS are kept (see get_salient_path_counter).
+    ## @var _salient_edge_trackers
+    # A dictionary of cached SalientEdgeTracker objects. The keys are 
+    # (mode, min_length, max_length, separatrix_type) tuples, a tracker is 
+    # replaced when its separatrix table changes (see get_salient_edge_tracker).
     ## @var maximalReducedComplex
     # The maximally reduced Morse complex
+    ## @var PersistenceHierarchy
+    # The recorded cancellations of the maximal reduction, used to get 
+    # reduced Morse complexes of lower persistences without reducing again.
     def __init__(self):
         self.reset()
     
@@ -126,12 +150,14 @@ class Mesh:
         self.max = None
         self.range = None
 
-        self.Vertices = {}
-        self.Edges = {}
-        self.Faces = {}
+        self.MeshArrays = None
+        self._Vertices = {}
+        self._Edges = {}
+        self._Faces = {}
 
         self.InitialLabels = {}
         self.UserLabels = {}
+        self.VertexUserLabels = None
         
 
     def reset_morse(self):
@@ -153,26 +179,125 @@ class Mesh:
         self.reducedMorseComplexes = {}
 
         self.salient_reduced_morse_complexes = {}
+        self._salient_path_counters = {}
+        self._salient_edge_trackers = {}
         
         self.maximalReducedComplex = None
 
+        self.PersistenceHierarchy = None
+
+    def _build_dict_view(self, name: str):
+        """! @brief Builds one of the Vertex and Simplex dictionaries from the 
+        array representation, if it has not been built yet.
+        @param name The name of the dictionary attribute ("_Vertices", 
+               "_Edges" or "_Faces").
+        """
+        if getattr(self, name) is None:
+            builder = {"_Vertices": self.MeshArrays.vertex_dict, 
+                       "_Edges": self.MeshArrays.edge_dict, 
+                       "_Faces": self.MeshArrays.face_dict}[name]
+            setattr(self, name, builder())
+
+    def _assign_dict(self, name: str, simplex_dict: dict):
+        """! @brief Makes an assigned dictionary the primary storage and drops
+        the array representation (it is rebuilt lazily). Only the other 
+        dictionaries that have not been built yet are built from the arrays 
+        before, as they could not be rebuilt afterwards.
+        @param name The name of the dictionary attribute ("_Vertices", 
+               "_Edges" or "_Faces").
+        @param simplex_dict The assigned dictionary.
+        """
+        if self.MeshArrays is not None:
+            for key in ("_Vertices", "_Edges", "_Faces"):
+                if key != name:
+                    self._build_dict_view(key)
+        setattr(self, name, simplex_dict)
+        self.MeshArrays = None
+
+    @property
+    def Vertices(self):
+        self._build_dict_view("_Vertices")
+        return self._Vertices
+
+    @Vertices.setter
+    def Vertices(self, vert_dict: dict):
+        self._assign_dict("_Vertices", vert_dict)
+
+    @property
+    def Edges(self):
+        self._build_dict_view("_Edges")
+        return self._Edges
+
+    @Edges.setter
+    def Edges(self, edge_dict: dict):
+        self._assign_dict("_Edges", edge_dict)
+
+    @property
+    def Faces(self):
+        self._build_dict_view("_Faces")
+        return self._Faces
+
+    @Faces.setter
+    def Faces(self, face_dict: dict):
+        self._assign_dict("_Faces", face_dict)
+
+    def set_mesh_arrays(self, mesh_arrays: MeshArrays):
+        """! @brief Makes the given array representation the primary storage of
+        the mesh and drops the dictionary view (it is rebuilt lazily).
+        @param mesh_arrays A MeshArrays object.
+        """
+        self.MeshArrays = mesh_arrays
+        self._Vertices, self._Edges, self._Faces = None, None, None
+
+    def get_mesh_arrays(self):
+        """! @brief Gives the array representation of the mesh. Builds it from
+        the dictionaries if the mesh was set up from them.
+        @return The MeshArrays object.
+        """
+        if self.MeshArrays is None:
+            self.MeshArrays = MeshArrays.from_dicts(self._Vertices, 
+                                                    self._Edges, 
+                                                    self._Faces)
+        return self.MeshArrays
+
+    @property
+    def n_vertices(self):
+        """! @brief The number of vertices of the mesh, without building the 
+        dictionary view.
+        """
+        if self.MeshArrays is not None:
+            return self.MeshArrays.n_vertices
+        return len(self._Vertices)
+
+    @property
+    def n_edges(self):
+        """! @brief The number of edges of the mesh, without building the 
+        dictionary view.
+        """
+        if self.MeshArrays is not None:
+            return self.MeshArrays.n_edges
+        return len(self._Edges)
+
+    @property
+    def n_faces(self):
+        """! @brief The number of faces of the mesh, without building the 
+        dictionary view.
+        """
+        if self.MeshArrays is not None:
+            return self.MeshArrays.n_faces
+        return len(self._Faces)
+
     @timed()
     def get_center(self):
         """! @brief Calculates the center of mass of the Vertices stored.
-        with poke needleer of mass.
+        @return The center as numpy array [x,y,z].
         """
-        sum_x, sum_y, sum_z = 0, 0, 0
-        for v in self.Vertices.values():
-            sum_x += v.x
-            sum_y += v.y
-            sum_z += v.z
-        center = [sum_x, sum_y, sum_z] / len(self.Vertices)
-        return center
+        return self.get_mesh_arrays().coords.mean(axis=0)
 
     def get_bounding_box(self):
-        vertices = [np.array((v.x,v.y,v.z)) for v in self.Vertices.values()]
-        min_x, min_y, min_z = np.min(vertices, axis=0)
-        max_x, max_y, max_z = np.max(vertices, axis=0)
+        coords = self.get_mesh_arrays().coords
+        min_x, min_y, min_z = np.min(coords, axis=0)
+        max_x, max_y, max_z = np.max(coords, axis=0)
         return Box(min_x, min_y, min_z, max_x, max_y, max_z)
 
     ''' DATALOADING'''
@@ -183,13 +308,11 @@ class Mesh:
                       inverted: bool = False):
         self.reset()
 
-        file_obj = open(filename, 'rb')
-        min_val, max_val = load_ply(file_obj, 
-                                    self.Vertices, 
-                                    self.Edges, 
-                                    self.Faces, 
-                                    morse_function=morse_function, 
-                                    inverted=inverted)
+        with open(filename, 'rb') as file_obj:
+            mesh_arrays, min_val, max_val = load_ply_arrays(file_obj, 
+                                                            morse_function=morse_function, 
+                                                            inverted=inverted)
+        self.set_mesh_arrays(mesh_arrays)
         self.filename = os.path.splitext(filename)[0]
         self.min = min_val
         self.max = max_val
@@ -222,6 +345,12 @@ class Mesh:
 
         self.UserLabels = {'vertices': vertexLabels, 'edges': edgeLabels, 'faces': faceLabels, 'crit': set(a for (a, b) in critLabels)}
         
+        # array view of the vertex labels for the label counts of the segmentation
+        keys = sorted(vertexLabels)
+        self.VertexUserLabels = np.full(max(self.n_vertices, keys[-1] + 1 if keys else 0), -1, dtype=np.int64)
+        self.VertexUserLabels[np.fromiter(keys, dtype=np.int64, count=len(keys))] = \
+            np.fromiter((vertexLabels[key] for key in keys), dtype=np.int64, count=len(keys))
+        
     @timed() 
     def load_new_funvals(self, filename: str, operation: str = "max"):
         """! @brief Loads new function values into the Mesh. Currently expects a 
@@ -231,11 +360,15 @@ class Mesh:
         @param operation Optionally change the function on the feature vector: 
                currently options are max, min, maxabs and minabs. Default is max.
         """
-        min_val, max_val = read_funvals(filename, 
-                                        self.Vertices, 
-                                        self.Edges, 
-                                        self.Faces, 
-                                        operation=operation)
+        mesh_arrays = self.get_mesh_arrays()
+        min_val, max_val = read_funvals_arrays(filename, 
+                                               mesh_arrays, 
+                                               operation=operation)
+        # keep the already built dictionaries in sync
+        if self._Vertices is not None:
+            for ind, fun_val in enumerate(mesh_arrays.fun_val.tolist()):
+                self._Vertices[ind].fun_val = fun_val
+        mesh_arrays.update_simplex_fun_vals(self._Edges, self._Faces)
         self.min = min_val
         self.max = max_val
         self.range = max_val - min_val
@@ -243,15 +376,11 @@ class Mesh:
 
     @timed()
     def get_area(self):
-        area = sum([face.compute_area(self.Vertices) for face in self.Faces.values()])
-        return area
+        return float(self.get_mesh_arrays().face_areas().sum())
     
     def threshold_funval(self, threshold: float):
-        below = set()
-        for vert in self.Vertices.values():
-            if vert.fun_val < threshold:
-                below.add(vert.index)
-        return below
+        below = np.flatnonzero(self.get_mesh_arrays().fun_val < threshold)
+        return set(below.tolist())
         
     def __repr__(self):
         """! @brief Prints out Mesh information.
@@ -263,11 +392,11 @@ class Mesh:
         "| Filename: " + self.filename + "\n"
         "| Morse function values range: " + str([self.min,self.max]) + "\n"
         "+-------------------------------------------------------\n"
-        "| Number of Vertices: " + str(len(self.Vertices)) + "\n"
-        "| Number of Edges: " + str(len(self.Edges)) + "\n"
-        "| Number of Faces: " + str(len(self.Faces)) + "\n"
+        "| Number of Vertices: " + str(self.n_vertices) + "\n"
+        "| Number of Edges: " + str(self.n_edges) + "\n"
+        "| Number of Faces: " + str(self.n_faces) + "\n"
         "+-------------------------------------------------------\n"
-        "| Euler characteristic: " + str(len(self.Vertices) 
-                                         + len(self.Faces) -len(self.Edges)) + "\n"
+        "| Euler characteristic: " + str(self.n_vertices 
+                                         + self.n_faces - self.n_edges) + "\n"
         "+-------------------------------------------------------")
         
\ No newline at end of file
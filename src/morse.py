@@ -52,16 +52,21 @@
 
 
 # import stuff
-from src.algorithms.process_lower_stars import process_lower_stars
-from src.algorithms.conforming_gradient import conforming_gradient
-from src.algorithms.extract_morse_complex import extract_morse_complex
+from src.algorithms.process_lower_stars import process_lower_stars_arrays
+from src.algorithms.conforming_gradient import conforming_gradient_arrays
+from src.algorithms.extract_morse_complex import extract_morse_complex_arrays
 from src.algorithms.reduce_morse_complex import cancel_critical_pairs
 from src.algorithms.reduce_morse_complex import cancel_critical_conforming_pairs
+from src.algorithms.persistence_hierarchy import PersistenceHierarchy
+from src.algorithms.salient_paths import SalientPathCounter
+from src.algorithms.salient_edges import SalientEdgeTracker
 
-from src.algorithms.morse_cells import get_morse_cells
-from src.algorithms.edge_detection import ridge_detection, valley_detection
+from src.algorithms.morse_cells import get_morse_cells_arrays, get_boundary_mask, morse_cells_from_labels
+from src.algorithms.morse_cells import label_cells_concurrently
+from src.algorithms.edge_detection import ridge_detection, valley_detection, salient_edge_detection
 
-from src.algorithms.cluster import cluster_mesh, merge_cluster
+from src.algorithms.cluster import cluster_mesh, merge_cluster, cluster_dendrogram, cut_cluster
+from src.algorithms.datastructures import Segmentation
 from src.evaluation_and_labels.labels_read_write import Labels 
 
 from src.mesh import Mesh
@@ -72,6 +77,9 @@ from src.timer import timed
 import timeit
 import itertools
 
+## The number of SalientPathCounter objects kept for salient edge reductions.
+MAX_SALIENT_PATH_COUNTERS = 4
+
 class Morse(Mesh):
     def __init__(self):
         super().__init__()
@@ -87,38 +95,44 @@ class Morse(Mesh):
     ''' MORSE THEORY'''
     
     @timed(False)
-    def process_lower_stars(self, conforming=False):
+    def process_lower_stars(self, conforming=False, n_workers: int = 1):
         """! @brief Runs the process_lower_stars algorithm to get a discrete 
         vector field representing the gradient of the discrete Morse function.
 
         @details Implementation of the algorithm described in Robins et al......
+        
+        @param conforming (Optional) Whether the gradient should conform to 
+               the loaded user labels. Default is False.
+        @param n_workers (Optional) Number of processes the lower stars are 
+               distributed over. Default is 1, None uses all cores.
         """
         # reset if has been computed already
         if self._flag_process_lower_stars:
             self.reset_morse()
             
         if conforming:
-            conforming_gradient(self.Vertices, 
-                                self.Edges, 
-                                self.Faces, 
-                                self.UserLabels,
-                                self.C, 
-                                self.V12, 
-                                self.V23)
+            conforming_gradient_arrays(self.get_mesh_arrays(), 
+                                       self.UserLabels,
+                                       self.C, 
+                                       self.V12, 
+                                       self.V23,
+                                       n_workers=n_workers)
         else:
-            process_lower_stars(self.Vertices, 
-                                self.Edges, 
-                                self.Faces, 
-                                self.C, 
-                                self.V12, 
-                                self.V23)
+            process_lower_stars_arrays(self.get_mesh_arrays(), 
+                                       self.C, 
+                                       self.V12, 
+                                       self.V23,
+                                       n_workers=n_workers)
         self._flag_process_lower_stars = True
         
     @timed(False)
-    def extract_morse_complex(self):
+    def extract_morse_complex(self, n_workers: int = 1):
         """! @brief Runs the extract_morse_complex algorithm to get a Morse Complex.
         
         @details Implementation of the algorithm described in Robins et al ....
+        
+        @param n_workers (Optional) Number of processes the critical cells are 
+               distributed over. Default is 1, None uses all cores.
         """
         if not self._flag_process_lower_stars:
             print('Need to call process_lower_stars first...')
@@ -126,27 +140,64 @@ class Morse(Mesh):
         else:
             if self._flag_MorseComplex:
                 self.MorseComplex = None
+                self.PersistenceHierarchy = None
 
-            self.MorseComplex = extract_morse_complex(self.Vertices, 
-                                                      self.Edges, 
-                                                      self.Faces, 
-                                                      self.V12, 
-                                                      self.V23, 
-                                                      self.C)
+            self.MorseComplex = extract_morse_complex_arrays(self.get_mesh_arrays(), 
+                                                             self.V12, 
+                                                             self.V23, 
+                                                             self.C,
+                                                             n_workers=n_workers)
             self.reducedMorseComplexes[0] = self.MorseComplex
             self.MorseComplex.filename = self.filename
             self._flag_MorseComplex = True
         
     @timed(False)
-    def reduce_morse_complex(self, persistence: float, conforming = False):
+    def build_persistence_hierarchy(self, persistence: float = None, conforming = False):
+        """! @brief Reduces the Morse complex once and records all cancellations.
+        @details Afterwards, reduce_morse_complex replays the recorded 
+        cancellations for all persistences up to the given one instead of 
+        reducing the initial Morse complex again.
+        
+        @param persistence (Optional) The persistence up to which the 
+               cancellations are recorded. Default is the range of the 
+               function values, i.e. the maximal reduction.
+        @param conforming (Optional) Whether to use the conforming 
+               cancellations respecting the user labels. Default is False.
+        
+        @return The PersistenceHierarchy object.
+        """
+        if not self._flag_MorseComplex:
+            print("Need to call extract_morse_complex first...")
+            self.extract_morse_complex()
+        if persistence == None:
+            persistence = self.range
+        self.PersistenceHierarchy = PersistenceHierarchy(self.MorseComplex, 
+                                                         persistence, 
+                                                         self.Vertices, 
+                                                         self.Edges, 
+                                                         self.Faces, 
+                                                         labels=self.UserLabels if conforming else None, 
+                                                         mesh_arrays=self.get_mesh_arrays())
+        return self.PersistenceHierarchy
+        
+    @timed(False)
+    def reduce_morse_complex(self, persistence: float, conforming = False, use_hierarchy = True):
         """! @brief Reduces the Morse complex up to the given persistence.
         @details Always cancels two critical simplices of consectutive dimensions 
         if their function values are closer than the given persistence. The 
         resulting simplified Morse Complex is stored as a copy under 
-        reducedMorseComplexes[persistence].
+        reducedMorseComplexes[persistence]. Reducing up to the range of the 
+        function values builds a PersistenceHierarchy, from which all lower 
+        persistences are then obtained by replaying the cancellations below 
+        the persistence.
         
         @param persistence The persistence up to which the Morse complex 
                should be simplified.
+        @param conforming (Optional) Whether to use the conforming 
+               cancellations respecting the user labels. Default is False.
+        @param use_hierarchy (Optional) Whether to use (and build) the 
+               PersistenceHierarchy. If False, the initial Morse complex is 
+               reduced directly (with the same result). Default is True.
         
         @return The reduced Morse Complex object.
         """
@@ -157,15 +208,25 @@ class Morse(Mesh):
             print("This persistence has already been calculated!")
             print("You can access it via .reducedMorseComplexes[persistence] ") 
         else:
-            if conforming:
+            hierarchy = self.PersistenceHierarchy if use_hierarchy else None
+            if use_hierarchy and persistence >= self.range and (hierarchy == None 
+                                              or hierarchy.conforming != conforming
+                                              or persistence > hierarchy.persistence):
+                hierarchy = self.build_persistence_hierarchy(persistence, conforming=conforming)
+            if (hierarchy != None and hierarchy.conforming == conforming 
+                and persistence <= hierarchy.persistence):
+                self.reducedMorseComplexes[persistence] = hierarchy.reduced_complex(persistence)
+            elif conforming:
                 self.reducedMorseComplexes[persistence] = cancel_critical_conforming_pairs(self.MorseComplex, persistence, 
-                                                                              self.Vertices, self.Edges, self.Faces, self.UserLabels)
+                                                                              self.Vertices, self.Edges, self.Faces, self.UserLabels, 
+                                                                              mesh_arrays=self.get_mesh_arrays())
             else:
                 self.reducedMorseComplexes[persistence] = cancel_critical_pairs(self.MorseComplex, 
                                                                             persistence, 
                                                                             self.Vertices, 
                                                                             self.Edges, 
-                                                                            self.Faces)
+                                                                            self.Faces, 
+                                                                            mesh_arrays=self.get_mesh_arrays())
             if persistence >= self.range and not self._flag_SalientEdge:
                 self.maximalReducedComplex = self.reducedMorseComplexes[persistence]
                 self.maximalReducedComplex.maximalReduced = True
@@ -176,6 +237,7 @@ class Morse(Mesh):
                 self.max_separatrix_persistence = max(separatrix_persistences)
                 self.maximalReducedComplex.min_separatrix_persistence = min(separatrix_persistences)
                 self.maximalReducedComplex.max_separatrix_persistence = max(separatrix_persistences)
+                self._salient_path_counters = {}
                 print("Persistence was high enough that this complex is maximally reduced.")
         return self.reducedMorseComplexes[persistence]
 
@@ -184,15 +246,18 @@ class Morse(Mesh):
                                           thresh_high: float, 
                                           thresh_low: float = None, 
                                           salient_edge_pts: set = None, 
-                                          pers: float = None):
+                                          pers: float = None, 
+                                          separatrix_type: str = "all"):
         if not self._flag_MorseComplex:
             print("Need to call extract_morse_complex first...")
             self.extract_morse_complex() 
         if not self._flag_SalientEdge:
             print("Need to reduce maximally first...")
             self.reduce_morse_complex(self.range)
-        if salient_edge_pts == None:
-            salient_edge_pts = self.get_salient_ridges(thresh_high, thresh_low)
+        salient_edge_pts = self.get_salient_path_counter(thresh_high, 
+                                                         thresh_low, 
+                                                         salient_edge_pts=salient_edge_pts, 
+                                                         separatrix_type=separatrix_type)
 
         if pers == None:
             self.salient_reduced_morse_complexes[(thresh_high, thresh_low)] = cancel_critical_pairs(self.MorseComplex, 
@@ -200,7 +265,8 @@ class Morse(Mesh):
                                                                                                     self.Vertices, 
                                                                                                     self.Edges, 
                                                                                                     self.Faces, 
-                                                                                                    salient_edge_pts=salient_edge_pts)
+                                                                                                    salient_edge_pts=salient_edge_pts, 
+                                                                                                    mesh_arrays=self.get_mesh_arrays())
             return self.salient_reduced_morse_complexes[(thresh_high, thresh_low)]
         else:
             self.salient_reduced_morse_complexes[(pers, thresh_high, thresh_low)] = cancel_critical_pairs(self.MorseComplex, 
@@ -208,9 +274,41 @@ class Morse(Mesh):
                                                                                                           self.Vertices, 
                                                                                                           self.Edges,
                                                                                                           self.Faces, 
-                                                                                                          salient_edge_pts)
+                                                                                                          salient_edge_pts=salient_edge_pts, 
+                                                                                                          mesh_arrays=self.get_mesh_arrays())
             return self.salient_reduced_morse_complexes[(pers, thresh_high, thresh_low)]
 
+    def get_salient_path_counter(self, 
+                                 thresh_high: float, 
+                                 thresh_low: float = None, 
+                                 salient_edge_pts: set = None, 
+                                 separatrix_type: str = "all"):
+        """! @brief Gives the SalientPathCounter counting the salient ridge 
+        points on the separatrix paths.
+        @details Counters of salient ridges are cached by their thresholds and 
+        separatrix type (at most MAX_SALIENT_PATH_COUNTERS, the oldest one is 
+        dropped first). The cache is cleared when the maximally reduced 
+        complex or its separatrix persistences change.
+        @param salient_edge_pts (Optional) Set of salient edge points to be 
+               used instead of the salient ridges. Such counters are not cached.
+        @return The SalientPathCounter object.
+        """
+        if salient_edge_pts is not None:
+            return SalientPathCounter.from_points(salient_edge_pts, self.get_mesh_arrays())
+        key = (thresh_high, thresh_low, separatrix_type)
+        if key not in self._salient_path_counters:
+            if len(self._salient_path_counters) >= MAX_SALIENT_PATH_COUNTERS:
+                self._salient_path_counters.pop(next(iter(self._salient_path_counters)))
+            _, salient_mask = self.get_salient_ridges(thresh_high, 
+                                                      thresh_low, 
+                                                      separatrix_type=separatrix_type, 
+                                                      return_mask=True)
+            mesh_arrays = self.get_mesh_arrays()
+            self._salient_path_counters[key] = SalientPathCounter(salient_mask, 
+                                                                  mesh_arrays.edges, 
+                                                                  mesh_arrays.faces)
+        return self._salient_path_counters[key]
+
     @timed(False)
     def extract_cells_salient_complex(self, 
                                       thresh_high: float,
@@ -223,7 +321,7 @@ class Morse(Mesh):
         thresh_high and thresh_low. If a Morse complex with the given thresholds 
         has not been reduced yet, it will be reduced using the 
         reduce_morse_complex_salient_edge method. The method then calls the 
-        get_morse_cells function on the reduced Morse complex, and returns 
+        get_morse_cells_arrays function on the reduced Morse complex, and returns 
         the resulting MorseCells object.
 
         @param thresh_high The higher threshold for the salient edges.
@@ -236,19 +334,15 @@ class Morse(Mesh):
             if (thresh_high, thresh_low) not in self.salient_reduced_morse_complexes.keys():
                 print("Need to reduce with these edge thresholds first...")
                 self.reduce_morse_complex_salient_edge(thresh_high, thresh_low)
-            get_morse_cells(self.salient_reduced_morse_complexes[(thresh_high,thresh_low)], 
-                            self.Vertices, 
-                            self.Edges, 
-                            self.Faces)
+            get_morse_cells_arrays(self.salient_reduced_morse_complexes[(thresh_high,thresh_low)], 
+                                   self.get_mesh_arrays())
             return self.salient_reduced_morse_complexes[(thresh_high,thresh_low)].MorseCells
         else:
             if (pers, thresh_high, thresh_low) not in self.salient_reduced_morse_complexes.keys():
                 print("Need to reduce with these edge thresholds and persistence first...")
                 self.reduce_morse_complex_salient_edge(thresh_high, thresh_low, pers=pers)
-            get_morse_cells(self.salient_reduced_morse_complexes[(pers, thresh_high, thresh_low)], 
-                            self.Vertices, 
-                            self.Edges, 
-                            self.Faces)
+            get_morse_cells_arrays(self.salient_reduced_morse_complexes[(pers, thresh_high, thresh_low)], 
+                                   self.get_mesh_arrays())
             return self.salient_reduced_morse_complexes[(pers, thresh_high, thresh_low)].MorseCells
     
     @timed(False)
@@ -257,15 +351,50 @@ class Morse(Mesh):
             print("Need to reduce Morse complex to this persistence first...")
             self.reduce_morse_complex(persistence)
         if not self.reducedMorseComplexes[persistence]._flag_MorseCells:
-            get_morse_cells(self.reducedMorseComplexes[persistence], 
-                            self.Vertices, 
-                            self.Edges, 
-                            self.Faces)
+            get_morse_cells_arrays(self.reducedMorseComplexes[persistence], 
+                                   self.get_mesh_arrays())
             return self.reducedMorseComplexes[persistence].MorseCells
         else:
             print("MorseCells for the MorseComplex with this "
                   "persistence have already been calculated!")
     
+    @timed(False)
+    def extract_morse_cells_concurrently(self, persistences: list, n_workers: int = None, 
+                                         use_processes: bool = False) -> dict:
+        """! @brief Extracts the Morse cells for several persistences at once.
+
+        @details The Morse complexes are reduced one after the other (the 
+        reductions share the persistence hierarchy) and their separatrix 
+        vertex masks are computed, then the cells are labelled concurrently 
+        from the masks (see label_cells). Only the masks are sent to the 
+        tasks, the edge array is shared (in shared memory for processes).
+
+        @param persistences List of persistences.
+        @param n_workers (Optional) Number of threads or processes. Default 
+               is None, which uses all cores.
+        @param use_processes (Optional) Whether to use a process pool instead 
+               of a thread pool. Default is False.
+
+        @return Dictionary persistence -> MorseCells object.
+        """
+        for persistence in persistences:
+            if persistence not in self.reducedMorseComplexes.keys():
+                self.reduce_morse_complex(persistence)
+        todo = [persistence for persistence in dict.fromkeys(persistences) 
+                if not self.reducedMorseComplexes[persistence]._flag_MorseCells]
+        
+        mesh_arrays = self.get_mesh_arrays()
+        masks = [get_boundary_mask(self.reducedMorseComplexes[persistence], mesh_arrays) 
+                 for persistence in todo]
+        results = label_cells_concurrently(masks, mesh_arrays.edges, 
+                                           n_workers=n_workers, use_processes=use_processes)
+        for persistence, cells in zip(todo, results):
+            self.reducedMorseComplexes[persistence].MorseCells = morse_cells_from_labels(cells)
+            self.reducedMorseComplexes[persistence]._flag_MorseCells = True
+        
+        return {persistence: self.reducedMorseComplexes[persistence].MorseCells 
+                for persistence in persistences}
+    
     ''' SEGMENTATION'''
     
     @timed(False)
@@ -289,9 +418,10 @@ class Morse(Mesh):
             print("Need maximally reduced complex for salient edges...")
             self.reduce_morse_complex(self.range, conforming=conforming)
             
-        salient_edge_points = self.get_salient_ridges(thresh_large, 
-                                                      thresh_small, 
-                                                      separatrix_type=separatrix_type)
+        salient_edge_points, salient_mask = self.get_salient_ridges(thresh_large, 
+                                                                    thresh_small, 
+                                                                    separatrix_type=separatrix_type,
+                                                                    return_mask=True)
         
         self.reducedMorseComplexes[persistence].create_segmentation(salient_edge_points, 
                                                                     thresh_large, 
@@ -301,10 +431,75 @@ class Morse(Mesh):
                                                                     size_threshold=size_threshold,
                                                                     conforming=conforming, 
                                                                     UserLabels=self.UserLabels,
-                                                                    plotting=plotting)
+                                                                    plotting=plotting,
+                                                                    n_vertices=self.n_vertices,
+                                                                    salient_mask=salient_mask,
+                                                                    separatrix_type=separatrix_type,
+                                                                    vertex_user_labels=self.VertexUserLabels)
         
         return self.reducedMorseComplexes[persistence].Segmentations[(thresh_large, thresh_small)][merge_threshold]
 
+    def merge_dendrogram(self, 
+                         persistence: float, 
+                         thresh_large: float, 
+                         thresh_small: float, 
+                         separatrix_type: str = "all"):
+        """! @brief Gives the MergeDendrogram of the Morse cells at a 
+        persistence for the salient edge points of a double threshold. 
+        Segmentations for any merge threshold are cut from it.
+        
+        @param persistence The persistence of the Morse cells.
+        @param thresh_large The larger threshold for the salient edges.
+        @param thresh_small The smaller threshold for the salient edges.
+        @param separatrix_type (Optional) The separatrices used for the 
+               salient edges. Default is "all".
+        
+        @return The MergeDendrogram object.
+        """
+        if persistence not in self.reducedMorseComplexes.keys():
+            self.reduce_morse_complex(persistence)
+        if self.reducedMorseComplexes[persistence]._flag_MorseCells == False:
+            self.extract_morse_cells(persistence)
+        salient_edge_points, salient_mask = self.get_salient_ridges(thresh_large, 
+                                                                    thresh_small, 
+                                                                    separatrix_type=separatrix_type,
+                                                                    return_mask=True)
+        return self.reducedMorseComplexes[persistence].get_merge_dendrogram(salient_edge_points, 
+                                                                            thresh_large, 
+                                                                            thresh_small, 
+                                                                            n_vertices=self.n_vertices,
+                                                                            salient_mask=salient_mask,
+                                                                            separatrix_type=separatrix_type)
+    
+    def cut_segmentation(self, 
+                         persistence: float, 
+                         thresh_large: float, 
+                         thresh_small: float, 
+                         merge_threshold: float = None, 
+                         n_labels: int = None, 
+                         size_threshold: int = 500,
+                         separatrix_type: str = "all") -> Segmentation:
+        """! @brief Gives the segmentation at a merge threshold and/or a 
+        number of labels from the MergeDendrogram (see merge_dendrogram). 
+        The result is not stored in the Segmentations of the complex.
+        
+        @param merge_threshold (Optional) Merging stops at this weight.
+        @param n_labels (Optional) Merging stops when this number of labels 
+               is left.
+        @param size_threshold (Optional) Smaller cells are merged into 
+               a neighbor afterwards. Default is 500.
+        
+        @return The Segmentation object.
+        """
+        dendrogram = self.merge_dendrogram(persistence, thresh_large, thresh_small, 
+                                           separatrix_type=separatrix_type)
+        return Segmentation(dendrogram.cell_graph, 
+                            dendrogram.cut(merge_threshold, n_labels=n_labels, 
+                                           size_threshold=size_threshold),
+                            salient_mask=dendrogram.salient_mask, 
+                            threshold=(thresh_large, thresh_small), 
+                            merge_threshold=merge_threshold)
+
     @timed(False)
     def segmentation_salient_reduction(self, 
                                        thresh_large: float, 
@@ -316,22 +511,21 @@ class Morse(Mesh):
 
         if persistence == None:
             self.reduce_morse_complex_salient_edge(thresh_large, 
-                                                   thresh_small, 
-                                                   salient_edge_points)
+                                                   thresh_small)
             self.extract_cells_salient_complex(thresh_large, thresh_small)
             self.salient_reduced_morse_complexes[(thresh_large,
                                                   thresh_small)].create_segmentation(salient_edge_points, 
                                                                                      thresh_large, 
                                                                                      thresh_small,
                                                                                      merge_threshold, 
-                                                                                     minimum_labels)
+                                                                                     minimum_labels, 
+                                                                                     n_vertices=self.n_vertices)
             return self.salient_reduced_morse_complexes[(thresh_large,
                                                          thresh_small)].Segmentations[(thresh_large, 
                                                                                        thresh_small)][merge_threshold]
         else:
             self.reduce_morse_complex_salient_edge(thresh_large, 
                                                    thresh_small, 
-                                                   salient_edge_points, 
                                                    pers=persistence)
             self.extract_cells_salient_complex(thresh_large, 
                                                thresh_small, 
@@ -342,7 +536,8 @@ class Morse(Mesh):
                                                                                      thresh_large, 
                                                                                      thresh_small,
                                                                                      merge_threshold, 
-                                                                                     minimum_labels)
+                                                                                     minimum_labels, 
+                                                                                     n_vertices=self.n_vertices)
             return self.salient_reduced_morse_complexes[(persistence,
                                                          thresh_large,
                                                          thresh_small)].Segmentations[(thresh_large, 
@@ -367,7 +562,8 @@ class Morse(Mesh):
                                               thresh_large, 
                                               thresh_small, 
                                               merge_threshold, 
-                                              minimum_labels=minimum_labels)
+                                              minimum_labels=minimum_labels, 
+                                              n_vertices=self.n_vertices)
         
         return self.MorseComplex.Segmentations[(thresh_large, 
                                                 thresh_small)][merge_threshold]
@@ -378,7 +574,8 @@ class Morse(Mesh):
                            thresh_low: float = None, 
                            min_length: int = 1, 
                            max_length: int = None,
-                           separatrix_type: str = "all"):
+                           separatrix_type: str = "all",
+                           return_mask: bool = False):
         # if only one threshold given: use same strong and weak edge threshold
         if thresh_low == None:
             thresh_low = thresh_high
@@ -394,7 +591,9 @@ class Morse(Mesh):
                                  self.Faces, 
                                  min_length=min_length, 
                                  max_length=max_length,
-                                 separatrix_type=separatrix_type)
+                                 separatrix_type=separatrix_type,
+                                 mesh_arrays=self.get_mesh_arrays(),
+                                 return_mask=return_mask)
         return ridges
 
     @timed(False)
@@ -403,7 +602,8 @@ class Morse(Mesh):
                             thresh_low: float = None, 
                             min_length: int = 1, 
                             max_length: int = None,
-                            separatrix_type: str = "all"):
+                            separatrix_type: str = "all",
+                            return_mask: bool = False):
         # if only one threshold given: use same strong and weak edge threshold
         if thresh_low == None:
             thresh_low = thresh_high
@@ -419,9 +619,97 @@ class Morse(Mesh):
                                    self.Faces, 
                                    min_length=min_length, 
                                    max_length=max_length,
-                                   separatrix_type=separatrix_type)
+                                   separatrix_type=separatrix_type,
+                                   mesh_arrays=self.get_mesh_arrays(),
+                                   return_mask=return_mask)
         return valleys
 
+    @timed(False)
+    def get_salient_edges(self, 
+                          thresh_high: float, 
+                          thresh_low: float = None, 
+                          min_length: int = 1, 
+                          max_length: int = None,
+                          separatrix_type: str = "all"):
+        """! @brief Gives the salient ridges and valleys of a double threshold 
+        in one pass over the separatrices (see salient_edge_detection).
+        
+        @return ridges, valleys, edges Boolean numpy arrays over the vertices, 
+                the same points as get_salient_ridges and get_salient_valleys 
+                and their union.
+        """
+        # if only one threshold given: use same strong and weak edge threshold
+        if thresh_low == None:
+            thresh_low = thresh_high
+        # if no maximally reduced MorseComplex has been calculated: do that now
+        if not self._flag_SalientEdge:
+            print("Need to maximally reduce MorseComplex first...")
+            self.reduce_morse_complex(self.range)
+        return salient_edge_detection(self.maximalReducedComplex, 
+                                      thresh_high, 
+                                      thresh_low, 
+                                      self.get_mesh_arrays(), 
+                                      min_length=min_length, 
+                                      max_length=max_length,
+                                      separatrix_type=separatrix_type)
+
+    def get_salient_edge_tracker(self, 
+                                 mode: str = "ridge", 
+                                 min_length: int = 1, 
+                                 max_length: int = None,
+                                 separatrix_type: str = "all") -> SalientEdgeTracker:
+        """! @brief Gives the SalientEdgeTracker for ridges or valleys of the 
+        maximally reduced complex. It is created on the first call for these 
+        parameters and keeps its thresholds between calls.
+        
+        @param mode (Optional) "ridge" or "valley". Default is "ridge".
+        @param min_length (Optional) Minimum length of the separatrices.
+        @param max_length (Optional) Maximum length of the separatrices.
+        @param separatrix_type (Optional) The separatrices used. Default is "all".
+        
+        @return The SalientEdgeTracker object.
+        """
+        if not self._flag_SalientEdge:
+            print("Need to maximally reduce MorseComplex first...")
+            self.reduce_morse_complex(self.range)
+        table = self.maximalReducedComplex.get_separatrix_table(separatrix_type, 
+                                                                self.get_mesh_arrays())
+        key = (mode, min_length, max_length, separatrix_type)
+        tracker = self._salient_edge_trackers.get(key)
+        if tracker is None or tracker.table is not table:
+            tracker = SalientEdgeTracker(table, 
+                                         self.get_mesh_arrays(), 
+                                         mode={"ridge": 1, "valley": 2}[mode], 
+                                         min_length=min_length, 
+                                         max_length=max_length)
+            self._salient_edge_trackers[key] = tracker
+        return tracker
+
+    def update_salient_edges(self, 
+                             thresh_high: float, 
+                             thresh_low: float = None, 
+                             mode: str = "ridge", 
+                             min_length: int = 1, 
+                             max_length: int = None,
+                             separatrix_type: str = "all"):
+        """! @brief Moves the thresholds of the salient ridges or valleys and 
+        gives the vertices that changed, e.g. while dragging a threshold 
+        slider. The current points are in the tracker (see 
+        get_salient_edge_tracker) and equal get_salient_ridges/valleys.
+        
+        @param thresh_high The high threshold.
+        @param thresh_low (Optional) The weak threshold. Default is thresh_high.
+        @param mode (Optional) "ridge" or "valley". Default is "ridge".
+        
+        @return added, removed Numpy arrays with the vertex indices that 
+                became or stopped being salient edge points.
+        """
+        tracker = self.get_salient_edge_tracker(mode=mode, 
+                                                min_length=min_length, 
+                                                max_length=max_length, 
+                                                separatrix_type=separatrix_type)
+        return tracker.update(thresh_high, thresh_low)
+
     @timed(False)
     def clean_lines(self, line_points: set):
         print("Pts before cleaning",len(line_points))
@@ -462,11 +750,25 @@ class Morse(Mesh):
 
     @timed(False)
     def change_separatrix_persistences_start_end_average(self):
+        self.change_separatrix_persistences("start_end_average")
+
+    @timed(False)
+    def change_separatrix_persistences(self, definition: str = "start_end_average"):
+        """! @brief Recomputes the separatrix persistences of the maximally 
+        reduced Morse complex with another definition.
+        @param definition (Optional) One of "average" (used by the 
+               cancellations), "start_end_average" (the default, see 
+               MorseComplex.change_separatrix_persistences), "maximum" or 
+               "minimum" (see separatrix_persistences).
+        """
         if not self._flag_SalientEdge:
             self.reduce_morse_complex(self.range)
         self.maximalReducedComplex.change_separatrix_persistences(self.Vertices, 
                                                                   self.Edges, 
-                                                                  self.Faces)
+                                                                  self.Faces, 
+                                                                  mesh_arrays=self.get_mesh_arrays(), 
+                                                                  definition=definition)
+        self._salient_path_counters = {}
 
     @timed(False)
     def pipeline_salient_segmentation(self, 
@@ -591,12 +893,14 @@ class Morse(Mesh):
                 t6 = timeit.default_timer()
                 bd_points = self.get_salient_ridges(high, low, separatrix_type=separatrix_type)
                 cluster = self.seed_cluster_mesh(bd_points, 350)
+                # the merges are recorded once and cut for each merge threshold
+                dendrogram = cluster_dendrogram(cluster, bd_points)
                 t7 = timeit.default_timer()
                 f.write("Bd points and cluster: "+str(t7-t6)+"\n")
 
                 for merge in merge_thresholds:
                     t9 = timeit.default_timer()
-                    segmented_dict = self.cluster_segmentation(cluster, bd_points, merge)
+                    segmented_dict = cut_cluster(cluster, bd_points, dendrogram, threshold=merge)
                     t10 = timeit.default_timer()
                     f.write("\t"+str(high)+" "+str(low)+" "+str(merge)
                             +": "+str(t10-t9)+"\n")
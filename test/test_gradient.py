@@ -0,0 +1,53 @@
+import pytest
+
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+
+from src.algorithms.process_lower_stars import process_lower_stars
+from src.algorithms.conforming_gradient import conforming_gradient
+from src.morse import Morse
+
+TEST_MESH = "./test_data/cube_noise2_r0.20_n4_v256.volume.ply"
+
+@pytest.mark.parametrize("morse_function, inverted", [("quality", True), 
+                                                      ("quality", False), 
+                                                      ("z", False)])
+def test_array_gradient_equals_legacy(morse_function, inverted):
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function=morse_function, inverted=inverted)
+
+    C, V12, V23 = {0: set(), 1: set(), 2: set()}, {}, {}
+    process_lower_stars(data.Vertices, data.Edges, data.Faces, C, V12, V23)
+
+    data.process_lower_stars()
+    assert data.C == C
+    assert data.V12 == V12
+    assert data.V23 == V23
+    # Euler characteristic of the closed surface
+    assert len(C[0]) - len(C[1]) + len(C[2]) == 2
+
+def test_array_conforming_gradient_equals_legacy():
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function="quality", inverted=True)
+    data.load_labels("./test_data/labels_test.txt")
+
+    C, V12, V23 = {0: set(), 1: set(), 2: set()}, {}, {}
+    conforming_gradient(data.Vertices, data.Edges, data.Faces, data.UserLabels, C, V12, V23)
+
+    data.process_lower_stars(conforming=True)
+    assert data.C == C
+    assert data.V12 == V12
+    assert data.V23 == V23
+
+@pytest.mark.parametrize("conforming", [False, True])
+def test_parallel_gradient(conforming):
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function="quality", inverted=True)
+    data.load_labels("./test_data/labels_test.txt")
+    data.process_lower_stars(conforming=conforming)
+    C, V12, V23 = data.C, data.V12, data.V23
+
+    data.process_lower_stars(conforming=conforming, n_workers=3)
+    assert data.C == C
+    assert data.V12 == V12
+    assert data.V23 == V23
@@ -0,0 +1,30 @@
+import pytest
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+
+from gui.gui_data import Data
+
+vtk = pytest.importorskip("vtk")
+
+def test_edge_color_array_compares_vtk_arrays():
+    data = Data()
+    assert not data.is_edge_color_array(None)
+
+    # a color array set as scalars of a mesh, as in update_mesh_color
+    mesh = vtk.vtkPolyData()
+    color_array = vtk.vtkUnsignedCharArray()
+    color_array.SetNumberOfComponents(3)
+    color_array.SetName("Colors")
+    for ind in range(4):
+        color_array.InsertTypedTuple(ind, (255, 255, 255))
+    mesh.GetPointData().SetScalars(color_array)
+    data.edge_color_array = mesh.GetPointData().GetScalars()
+    del color_array
+
+    # the array read back from the mesh is recognized, a new array is not
+    assert data.is_edge_color_array(mesh.GetPointData().GetScalars())
+    other = vtk.vtkUnsignedCharArray()
+    other.DeepCopy(data.edge_color_array)
+    assert not data.is_edge_color_array(other)
+    mesh.GetPointData().SetScalars(other)
+    assert not data.is_edge_color_array(mesh.GetPointData().GetScalars())
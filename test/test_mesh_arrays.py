@@ -0,0 +1,113 @@
+import numpy as np
+
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+
+from src.algorithms.mesh_arrays import make_unique_by_rank
+from src.morse import Morse
+
+TEST_MESH = "./test_data/cube_noise2_r0.20_n4_v256.volume.ply"
+
+def test_arrays_match_dicts():
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function="quality", inverted=True)
+    arrays = data.get_mesh_arrays()
+
+    assert arrays.n_vertices == len(data.Vertices)
+    assert arrays.n_edges == len(data.Edges)
+    assert arrays.n_faces == len(data.Faces)
+
+    for ind, vert in data.Vertices.items():
+        assert np.allclose(arrays.coords[ind], [vert.x, vert.y, vert.z])
+        assert arrays.fun_val[ind] == vert.fun_val
+        assert set(arrays.star_edges(ind).tolist()) == set(vert.star["E"])
+        assert set(arrays.star_faces(ind).tolist()) == set(vert.star["F"])
+        assert set(arrays.neighbors(ind).tolist()) == vert.neighbors
+    for ind, edge in data.Edges.items():
+        assert set(arrays.edges[ind].tolist()) == edge.indices
+    for ind, face in data.Faces.items():
+        assert set(arrays.faces[ind].tolist()) == face.indices
+        edge_verts = set()
+        for e in arrays.face_edges[ind]:
+            edge_verts |= data.Edges[int(e)].indices
+        assert edge_verts == face.indices
+
+def test_lazy_dict_view():
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function="quality", inverted=True)
+    arrays = data.get_mesh_arrays()
+
+    # rebuild the dictionary view only from the arrays
+    view = Morse()
+    view.set_mesh_arrays(arrays)
+    assert view._Vertices is None
+    for ind, vert in data.Vertices.items():
+        other = view.Vertices[ind]
+        assert other.fun_val == vert.fun_val
+        assert other.neighbors == vert.neighbors
+        assert set(other.star["F"]) == set(vert.star["F"])
+    # only the accessed dictionary is built
+    assert view._Edges is None and view._Faces is None
+    for ind, face in data.Faces.items():
+        assert view.Faces[ind].fun_val == face.fun_val
+        assert view.Faces[ind].max_fun_val_index == face.max_fun_val_index
+
+    assert np.isclose(view.get_area(), sum(face.compute_area(data.Vertices)
+                                           for face in data.Faces.values()))
+    assert len(view.threshold_funval(0.0)) == sum(1 for vert in data.Vertices.values()
+                                                   if vert.fun_val < 0.0)
+
+def test_assign_dicts():
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function="quality", inverted=True)
+    arrays = data.get_mesh_arrays()
+    vert_dict, edge_dict, face_dict = arrays.to_dicts()
+
+    # assigned dictionaries are kept as they are and the arrays rebuilt from them
+    view = Morse()
+    view.set_mesh_arrays(arrays)
+    view.Vertices = vert_dict
+    assert view.Vertices is vert_dict
+    assert view.MeshArrays is None
+    assert view.n_edges == arrays.n_edges
+    view.Edges = edge_dict
+    view.Faces = face_dict
+    assert view.Edges is edge_dict and view.Faces is face_dict
+    assert np.array_equal(view.get_mesh_arrays().edges, arrays.edges)
+
+def test_adjacency_matrix():
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function="quality", inverted=True)
+    adj = data.get_mesh_arrays().adjacency_matrix()
+    assert (adj != adj.T).nnz == 0
+    assert adj.nnz == 2 * len(data.Edges)
+
+def test_loader_edges():
+    for filename in [TEST_MESH, "./test_data/cube_colored.ply"]:
+        data = Morse()
+        data.load_mesh_new(filename, morse_function="quality")
+        arrays = data.get_mesh_arrays()
+        # closed surface: every edge is the side of exactly two triangles
+        assert np.all(np.bincount(arrays.face_edges.ravel()) == 2)
+        assert len(np.unique(arrays.edges, axis=0)) == arrays.n_edges
+        assert arrays.n_vertices - arrays.n_edges + arrays.n_faces == 2
+        assert len(np.unique(arrays.fun_val)) == arrays.n_vertices
+
+def test_unique_by_rank():
+    values = np.array([1.0, 0.0, 1.0, -0.0, 1.0, -2.0, -2.0])
+    fun_val, rank = make_unique_by_rank(values)
+    # ties are broken by vertex index and the float values follow the ranks
+    assert rank.tolist() == [4, 2, 5, 3, 6, 0, 1]
+    assert np.all(np.diff(fun_val[np.argsort(rank)]) > 0)
+    assert np.allclose(fun_val, values)
+
+def test_simplex_fun_vals():
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function="quality", inverted=True)
+    arrays = data.get_mesh_arrays()
+    for simplex_dict, vals, max_index in ((data.Edges, arrays.edge_fun_vals, arrays.edge_max_index),
+                                          (data.Faces, arrays.face_fun_vals, arrays.face_max_index)):
+        for ind, simplex in simplex_dict.items():
+            fun_vals = {i: data.Vertices[i].fun_val for i in simplex.indices}
+            assert vals[ind].tolist() == sorted(fun_vals.values(), reverse=True)
+            assert max_index[ind] == max(fun_vals, key=fun_vals.get)
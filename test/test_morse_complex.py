@@ -0,0 +1,631 @@
+import pytest
+import numpy as np
+from copy import deepcopy
+from collections import Counter
+
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+
+from src.algorithms.extract_morse_complex import extract_morse_complex
+from src.algorithms.paths import Path, concat_paths, reversed_inner_path, path_array
+from src.algorithms.cancellation_queue import CancellationQueue
+from src.algorithms.reduce_morse_complex import cancel_critical_pairs, replay_cancellations, get_indices
+from src.algorithms.reduce_morse_complex import compute_min_sad_persistence, compute_max_sad_persistence
+from src.algorithms.salient_paths import SalientPathCounter
+from src.algorithms.edge_detection import get_salient_sepa_indices, ridge_detection, valley_detection, hysteresis_mask
+from src.algorithms.separatrix_persistence import separatrix_persistences, simplex_values, PERSISTENCE_DEFINITIONS
+from src.algorithms.datastructures import Cell, MorseCells, CellGraph, Segmentation, Separatrix
+from src.algorithms.weight_metrics import compute_weight_saledge, BoundaryCounts
+from src.algorithms.cell_merging import CellMerger
+from src.algorithms.cluster import merge_cluster, cluster_dendrogram, cut_cluster
+from src.algorithms.morse_cells import get_morse_cells, get_morse_cells_arrays, get_boundary_mask, label_morse_cells
+from src.algorithms.morse_cells import morse_cells_from_labels
+from src.morse import Morse, MAX_SALIENT_PATH_COUNTERS
+
+TEST_MESH = "./test_data/cube_noise2_r0.20_n4_v256.volume.ply"
+
+def load_test_mesh() -> Morse:
+    data = Morse()
+    data.load_mesh_new(TEST_MESH, morse_function="quality", inverted=True)
+    return data
+
+@pytest.fixture
+def data() -> Morse:
+    """The Morse complex of the test mesh, built for every test as the tests
+    add reductions, cells or segmentations to it."""
+    data = load_test_mesh()
+    data.process_lower_stars()
+    data.extract_morse_complex()
+    return data
+
+@pytest.fixture(scope="module")
+def shared_data() -> Morse:
+    """The maximally reduced Morse complex of the test mesh, shared by the
+    tests that only read it."""
+    data = load_test_mesh()
+    data.process_lower_stars()
+    data.extract_morse_complex()
+    data.reduce_morse_complex(data.range)
+    return data
+
+def normalized_complex(morse_complex) -> dict:
+    """Gives the connections and paths of a complex independent of their order."""
+    def paths(value):
+        if isinstance(value, list) and value and not isinstance(value[0], int):
+            return sorted(list(path) for path in value)
+        return [list(value)]
+    out = {}
+    for ind, vert in morse_complex.CritVertices.items():
+        out[("v", ind)] = (vert.fun_val, sorted(vert.connected_saddles))
+    for ind, edge in morse_complex.CritEdges.items():
+        out[("e", ind)] = (edge.fun_val, edge.indices, sorted(edge.connected_minima), 
+                           sorted(edge.connected_maxima),
+                           {key: paths(val) for key, val in edge.paths.items()})
+    for ind, face in morse_complex.CritFaces.items():
+        out[("f", ind)] = (face.fun_val, face.indices, sorted(face.connected_saddles),
+                           {key: paths(val) for key, val in face.paths.items()})
+    return out
+
+def test_array_complex_equals_legacy(shared_data):
+    data = shared_data
+
+    legacy = extract_morse_complex(data.Vertices, data.Edges, data.Faces, 
+                                   data.V12, data.V23, data.C)
+    assert normalized_complex(data.MorseComplex) == normalized_complex(legacy)
+
+def test_path_view():
+    buffer = np.arange(10)
+    path = Path(buffer, 2, 6)
+    assert len(path) == 4
+    assert path == [2, 3, 4, 5]
+    assert path[-1] == 5 and path[1:-1][::-1] == [4, 3]
+    assert [0, 1] + path + [6] == list(range(7))
+    assert deepcopy(path) is path
+    # equal paths hash equally
+    assert hash(path) == hash(Path(np.arange(2, 6), 0, 4))
+    assert len({path, Path(np.arange(10), 2, 6)}) == 1
+
+def test_parallel_complex(data):
+    serial = data.MorseComplex
+
+    data.extract_morse_complex(n_workers=3)
+    parallel = data.MorseComplex
+    for crit_dict, other in ((serial.CritVertices, parallel.CritVertices),
+                             (serial.CritEdges, parallel.CritEdges),
+                             (serial.CritFaces, parallel.CritFaces)):
+        assert list(crit_dict.keys()) == list(other.keys())
+    for ind, edge in serial.CritEdges.items():
+        assert edge.connected_minima == parallel.CritEdges[ind].connected_minima
+        assert edge.connected_maxima == parallel.CritEdges[ind].connected_maxima
+        assert edge.paths == parallel.CritEdges[ind].paths
+    for ind, face in serial.CritFaces.items():
+        assert face.connected_saddles == parallel.CritFaces[ind].connected_saddles
+        assert face.paths == parallel.CritFaces[ind].paths
+
+def test_copy_on_write_reduction(data):
+    original = normalized_complex(data.MorseComplex)
+
+    for persistence in [0.02, 0.04, 0.1]:
+        shared = cancel_critical_pairs(data.MorseComplex, persistence, 
+                                       data.Vertices, data.Edges, data.Faces)
+        copied = cancel_critical_pairs(data.MorseComplex, persistence, 
+                                       data.Vertices, data.Edges, data.Faces,
+                                       copy_on_write=False)
+        assert normalized_complex(shared) == normalized_complex(copied)
+        # reducing further does not change the unreduced complex
+        assert normalized_complex(data.MorseComplex) == original
+
+def test_persistence_hierarchy(data):
+    original = normalized_complex(data.MorseComplex)
+
+    maximal = data.reduce_morse_complex(data.range)
+    hierarchy = data.PersistenceHierarchy
+    direct = cancel_critical_pairs(data.MorseComplex, data.range, 
+                                   data.Vertices, data.Edges, data.Faces)
+    assert normalized_complex(maximal) == normalized_complex(direct)
+
+    persistences = [dist for dist, _, _, _ in hierarchy.cancellations]
+    assert persistences == sorted(persistences)
+    for persistence in [0.1, 0.02, 0.04]:
+        reduced = data.reduce_morse_complex(persistence)
+        assert reduced.persistence == persistence
+        n = hierarchy.n_cancellations(persistence)
+        assert n == sum(1 for dist in persistences if dist < persistence)
+        # replaying from the unreduced complex gives the same complex
+        replayed = replay_cancellations(data.MorseComplex, hierarchy.cancellations[:n], 
+                                        data.Vertices, data.Edges, data.Faces)
+        assert normalized_complex(reduced) == normalized_complex(replayed)
+        # the reduction up to a lower persistence is a prefix of the maximal one
+        direct = cancel_critical_pairs(data.MorseComplex, persistence, 
+                                       data.Vertices, data.Edges, data.Faces)
+        assert normalized_complex(reduced) == normalized_complex(direct)
+    assert normalized_complex(data.MorseComplex) == original
+
+    with pytest.raises(ValueError):
+        hierarchy.reduced_complex(2 * data.range)
+
+def test_path_rope():
+    first = Path(np.arange(10), 2, 6)
+    second = [7, 8, 9]
+    rope = concat_paths(first, reversed_inner_path(second), second)
+    assert rope == [2, 3, 4, 5, 8, 7, 8, 9]
+    assert len(rope) == 8 and rope[-3] == 7
+    assert hash(rope) == hash(Path(np.array([2, 3, 4, 5, 8, 7, 8, 9]), 0, 8))
+    # nested ropes, also reversed and cropped
+    nested = concat_paths([0, 1], reversed_inner_path(rope), rope[:1])
+    assert nested == [0, 1, 8, 7, 8, 5, 4, 3, 2]
+    assert path_array(reversed_inner_path(nested)).tolist() == [3, 4, 5, 8, 7, 8, 1]
+    assert first + second == [2, 3, 4, 5, 7, 8, 9]
+    assert deepcopy(rope) is rope
+
+def test_cancellation_queue():
+    queue = CancellationQueue()
+    for key, priority in [(5, 0.3), (2, 0.1), (7, 0.1), (3, 0.2)]:
+        queue.insert(key, priority)
+    queue.update(3, 0.05)
+    queue.update(7, 0.4)
+    queue.remove(5)
+    assert queue.length() == 3 and 5 not in queue
+    assert queue.check_distance() == 0.05
+    assert [queue.pop_front() for _ in range(3)] == [(0.05, 3), (0.1, 2), (0.4, 7)]
+    assert not queue.notEmpty() and queue.check_distance() == float("inf")
+    # ties are broken by the key
+    for key in [4, 1, 3]:
+        queue.insert(key, 1.0)
+    assert [queue.pop_front()[1] for _ in range(3)] == [1, 3, 4]
+
+def test_salient_path_counter(data):
+    maximal = data.reduce_morse_complex(data.range)
+    salient_edge_pts = data.get_salient_ridges(0.3, 0.2)
+    counter = SalientPathCounter.from_points(salient_edge_pts, data.get_mesh_arrays(), cap=6)
+
+    # counts on the joined paths of the reduced complex
+    reduced = data.reduce_morse_complex(0.1)
+    for crit_dict, dim in ((reduced.CritEdges, 1), (reduced.CritFaces, 2)):
+        for crit in crit_dict.values():
+            for path in crit.paths.values():
+                if isinstance(path, list) and not isinstance(path[0], int):
+                    continue
+                expected = len(get_indices(path, data.Edges, data.Faces, dim).intersection(salient_edge_pts))
+                assert counter.count(path, dim) == min(expected, 6)
+
+    for persistence in [0.04, data.range]:
+        with_set = cancel_critical_pairs(data.MorseComplex, persistence, 
+                                         data.Vertices, data.Edges, data.Faces, 
+                                         salient_edge_pts=salient_edge_pts)
+        with_counter = cancel_critical_pairs(data.MorseComplex, persistence, 
+                                             data.Vertices, data.Edges, data.Faces, 
+                                             salient_edge_pts=counter)
+        assert normalized_complex(with_set) == normalized_complex(with_counter)
+
+    # the counters are cached by thresholds and separatrix type, and bounded
+    cached = data.get_salient_path_counter(0.3, 0.2)
+    assert np.flatnonzero(cached.salient_mask).tolist() == sorted(salient_edge_pts)
+    assert data.get_salient_path_counter(0.3, 0.2) is cached
+    assert data.get_salient_path_counter(0.3, 0.2, separatrix_type="reverse") is not cached
+    for thresh in (0.1, 0.2, 0.4, 0.5):
+        data.get_salient_path_counter(thresh)
+    assert len(data._salient_path_counters) == MAX_SALIENT_PATH_COUNTERS
+    assert data.get_salient_path_counter(0.3, 0.2) is not cached
+
+def test_morse_cell_labels_equal_legacy_interior(data):
+    mesh_arrays = data.get_mesh_arrays()
+    reduced = data.reduce_morse_complex(0.04)
+
+    legacy = reduced.copy_on_write()
+    get_morse_cells(legacy, data.Vertices, data.Edges, data.Faces)
+    cells = label_morse_cells(reduced, mesh_arrays)
+    labels = cells["labels"]
+
+    assert cells["n_labels"] == len(legacy.MorseCells.Cells)
+    assert np.all(labels > 0)
+    interior = ~get_boundary_mask(reduced, mesh_arrays)
+    legacy_labels = np.zeros_like(labels)
+    for label, cell in legacy.MorseCells.Cells.items():
+        legacy_labels[list(cell.vertices)] = label
+    assert np.array_equal(labels[interior], legacy_labels[interior])
+    # get_morse_cells has the same boundary definition: the endpoints of the 
+    # edges between differently labelled vertices
+    legacy_crossing = mesh_arrays.edges[legacy_labels[mesh_arrays.edges[:, 0]] 
+                                        != legacy_labels[mesh_arrays.edges[:, 1]]]
+    assert (set().union(*(cell.boundary for cell in legacy.MorseCells.Cells.values())) 
+            == set(legacy_crossing.ravel().tolist()))
+
+    # contacts join vertices of different cells
+    for label1, v1, label2, v2 in cells["contacts"].tolist():
+        assert labels[v1] == label1 and labels[v2] == label2 and label1 != label2
+
+    # every edge between two cells is a contact, also between two separatrix 
+    # vertices labelled in the same round
+    edges = mesh_arrays.edges
+    crossing = edges[labels[edges[:, 0]] != labels[edges[:, 1]]]
+    expected = {(labels[v1], v1, labels[v2], v2) for v1, v2 in crossing.tolist()}
+    expected |= {(label2, v2, label1, v1) for label1, v1, label2, v2 in expected}
+    assert set(map(tuple, cells["contacts"].tolist())) == expected
+    assert set(np.flatnonzero(cells["boundary"]).tolist()) == set(crossing.ravel().tolist())
+
+    # where both labellings agree the same neighbors and boundary points are 
+    # recorded as by get_morse_cells
+    arrays = morse_cells_from_labels(cells)
+    agree = crossing[(legacy_labels[crossing[:, 0]] == labels[crossing[:, 0]]) 
+                     & (legacy_labels[crossing[:, 1]] == labels[crossing[:, 1]])]
+    assert len(agree) > 0
+    for morse_cells in (arrays, legacy.MorseCells):
+        for v1, v2 in agree.tolist():
+            cell1, cell2 = morse_cells.Cells[labels[v1]], morse_cells.Cells[labels[v2]]
+            assert labels[v2] in cell1.neighbors and labels[v1] in cell2.neighbors
+            assert v1 in cell1.boundary and v2 in cell2.boundary
+
+    morse_cells = data.extract_morse_cells(0.04)
+    assert sum(len(cell.vertices) for cell in morse_cells.Cells.values()) == mesh_arrays.n_vertices
+    for label, cell in morse_cells.Cells.items():
+        for neighbor in cell.neighbors:
+            assert label in morse_cells.Cells[neighbor].neighbors
+
+def test_concurrent_morse_cells(data):
+    persistences = [0.01, 0.04, 0.1]
+    for use_processes in [False, True]:
+        data.reducedMorseComplexes = {}
+        cells = data.extract_morse_cells_concurrently(persistences, n_workers=2, 
+                                                      use_processes=use_processes)
+        for persistence in persistences:
+            expected = get_morse_cells_arrays(data.reducedMorseComplexes[persistence].copy_on_write(),
+                                              data.get_mesh_arrays())
+            assert cells[persistence] is data.reducedMorseComplexes[persistence].MorseCells
+            assert {label: cell.vertices for label, cell in cells[persistence].Cells.items()} == \
+                   {label: cell.vertices for label, cell in expected.Cells.items()}
+    # the vertices keep no labels of the cell extraction
+    data.seed_cluster_mesh(data.get_salient_ridges(0.3, 0.2), 20)
+    assert all(vertex.label == -1 and not vertex.boundary for vertex in data.Vertices.values())
+
+def test_segmentation_relabels_shared_cell_graph(data):
+    data.reduce_morse_complex(data.range)
+    reduced = data.reduce_morse_complex(0.01)
+    data.extract_morse_cells(0.01)
+    cell_graph = reduced.get_cell_graph(data.n_vertices)
+
+    # the graph gives back the Morse cells
+    restored = cell_graph.to_morse_cells()
+    for label, cell in reduced.MorseCells.Cells.items():
+        assert cell.vertices == restored.Cells[label].vertices
+        assert cell.boundary == restored.Cells[label].boundary
+        assert cell.neighbors == restored.Cells[label].neighbors
+
+    salient_edge_pts = data.get_salient_ridges(0.3, 0.2)
+    for merge_threshold in [0.2, 0.6]:
+        segmentation = data.segmentation(0.01, 0.3, 0.2, merge_threshold, size_threshold=100)
+
+        assert segmentation.CellGraph is cell_graph
+        assert len(segmentation.relabel) == cell_graph.n_labels + 1
+        segments = segmentation.Cells
+        assert len(segmentation) == len(segments)
+        # every segment is a union of Morse cells
+        for label, cell in reduced.MorseCells.Cells.items():
+            assert cell.vertices <= segments[segmentation.relabel[label]].vertices
+        for label, cell in segments.items():
+            assert np.all(segmentation.labels[list(cell.vertices)] == label)
+        # the merged boundaries are counted as set unions, so the segments
+        # are the same as the ones of the legacy merging on the Morse cells
+        legacy = deepcopy(reduced.MorseCells)
+        legacy.add_salient_edge_points(salient_edge_pts, (0.3, 0.2))
+        legacy.segment(merge_threshold, 3, size_threshold=100)
+        assert {label: cell.vertices for label, cell in segments.items()} == \
+               {label: cell.vertices for label, cell in legacy.Cells.items()}
+        # the cells are created once, the salient edge points are the mask 
+        # shared with the dendrogram
+        assert segmentation.to_cells().Cells is segments
+        assert segmentation.salient_mask is reduced.get_merge_dendrogram(salient_edge_pts, 0.3, 0.2).salient_mask
+        assert set(np.flatnonzero(segmentation.salient_mask).tolist()) == salient_edge_pts
+
+def test_cell_merger_adds_boundary_counts():
+    # three mutually adjacent cells and a fourth one next to cell 3, vertex 6
+    # of cell 3 borders both cells 1 and 2
+    morse_cells = MorseCells()
+    for label in range(1, 5):
+        cell = Cell(label)
+        cell.vertices = set(range(3 * (label - 1), 3 * label))
+        morse_cells.add_cell(cell)
+    morse_cells.add_neighboring_cell_labels(1, 0, 2, 3)
+    morse_cells.add_neighboring_cell_labels(1, 1, 3, 6)
+    morse_cells.add_neighboring_cell_labels(2, 4, 3, 7)
+    morse_cells.add_neighboring_cell_labels(2, 5, 3, 6)
+    morse_cells.add_neighboring_cell_labels(3, 8, 4, 9)
+    salient_mask = np.zeros(12, dtype=bool)
+    salient_mask[[6, 7, 8, 9]] = True
+
+    merger = CellMerger(CellGraph(morse_cells), salient_mask)
+    assert merger.weight(1, 2) == 0 and merger.weight(1, 3) == 0.5 and merger.weight(2, 3) == 0.5
+    assert merger.weight(3, 4) == 1
+
+    merger.merge(1, 2)
+    # the boundaries of 1 and 2 to the common neighbor 3 are joined, vertex 6
+    # is counted once
+    counts = merger.neighbors[1][3]
+    assert (counts.salient, counts.total) == (2, 5) and merger.neighbors[3][1] is counts
+    assert merger.contacts[1][3] == {6, 7} and merger.contacts[3][1] == {1, 4, 5}
+    assert merger.weight(1, 3) == 0.4 and 2 not in merger.neighbors[3]
+    assert merger.sizes[1] == 6 and merger.find(2) == 1
+
+    merger = CellMerger(CellGraph(morse_cells), salient_mask)
+    merger.merge_below(0.6, minimum_labels=1)
+    # (1, 2) is merged first, then (1, 3) with weight 2/5, (1, 4) stays 2/2
+    assert merger.relabel().tolist() == [0, 1, 1, 1, 4]
+    assert list(merger.neighbors[1]) == [4] and merger.neighbors[1][4].weight() == 1
+
+def test_merge_dendrogram_cuts_equal_direct_merging(data):
+    data.reduce_morse_complex(data.range)
+    dendrogram = data.merge_dendrogram(0.01, 0.3, 0.2)
+    assert dendrogram is data.merge_dendrogram(0.01, 0.3, 0.2)
+    assert np.all(np.diff(dendrogram.weights) >= 0)
+
+    for merge_threshold in [0.1, 0.3, 0.5, 0.8, 1.1]:
+        for minimum_labels in [3, 10]:
+            merger = CellMerger(dendrogram.cell_graph, dendrogram.salient_mask)
+            expected = merger.segment(merge_threshold, minimum_labels, size_threshold=50)
+            cut = dendrogram.cut(merge_threshold, n_labels=minimum_labels, size_threshold=50)
+            assert np.array_equal(cut, expected)
+    assert len(data.cut_segmentation(0.01, 0.3, 0.2, n_labels=10, size_threshold=0)) == 10
+
+    # other salient edge points for the same thresholds give another dendrogram
+    reverse = data.merge_dendrogram(0.01, 0.3, 0.2, "reverse")
+    assert reverse is not dendrogram
+    assert set(np.flatnonzero(reverse.salient_mask).tolist()) == data.get_salient_ridges(0.3, 0.2, 
+                                                                                         separatrix_type="reverse")
+    assert data.merge_dendrogram(0.01, 0.3, 0.2) is dendrogram
+    reduced = data.reducedMorseComplexes[0.01]
+    other = reduced.get_merge_dendrogram({0, 1, 2}, 0.3, 0.2)
+    assert other is not dendrogram and np.flatnonzero(other.salient_mask).tolist() == [0, 1, 2]
+
+    bd_points = data.get_salient_ridges(0.3, 0.2)
+    cluster = data.seed_cluster_mesh(bd_points, 40)
+    cluster_tree = cluster_dendrogram(cluster, bd_points)
+    for threshold in [0.2, 0.5]:
+        expected = merge_cluster(deepcopy(cluster), bd_points, threshold)
+        cut = cut_cluster(cluster, bd_points, cluster_tree, threshold=threshold)
+        assert [comp.vertices for comp in cut.values()] == [comp.vertices for comp in expected.values()]
+
+def test_boundary_counts_match_set_weights(data):
+    data.reduce_morse_complex(data.range)
+    reduced = data.reduce_morse_complex(0.01)
+    data.extract_morse_cells(0.01)
+    salient_edge_pts = data.get_salient_ridges(0.3, 0.2)
+
+    morse_cells = reduced.get_cell_graph(data.n_vertices).to_morse_cells()
+    morse_cells.add_salient_edge_points(salient_edge_pts, (0.3, 0.2))
+    morse_cells.calculate_all_weights()
+    for label, cell in morse_cells.Cells.items():
+        for neighbor, points in cell.neighbors.items():
+            expected = compute_weight_saledge(points.union(morse_cells.Cells[neighbor].neighbors[label]), 
+                                              salient_edge_pts)
+            assert cell.neighbors_counts[neighbor] is morse_cells.Cells[neighbor].neighbors_counts[label]
+            assert cell.neighbors_weights[neighbor] == expected
+
+    # counting from the salient mask gives the same weights
+    masked_cells = reduced.get_cell_graph(data.n_vertices).to_morse_cells()
+    masked_cells.add_salient_edge_points(salient_edge_pts, (0.3, 0.2), 
+                                         salient_mask=data.get_salient_ridges(0.3, 0.2, return_mask=True)[1])
+    masked_cells.calculate_all_weights()
+    for label, cell in masked_cells.Cells.items():
+        assert cell.neighbors_weights == morse_cells.Cells[label].neighbors_weights
+
+    # merging on the Morse cells and with the CellMerger gives the same segments
+    morse_cells.segment(0.4, 3, size_threshold=100)
+    # merged boundaries count the points bordering both merged cells once
+    for label, cell in morse_cells.Cells.items():
+        for neighbor, points in cell.neighbors.items():
+            counts = BoundaryCounts.from_points(points.union(morse_cells.Cells[neighbor].neighbors[label]), 
+                                                salient_edge_pts)
+            assert (cell.neighbors_counts[neighbor].salient, cell.neighbors_counts[neighbor].total) == \
+                   (counts.salient, counts.total)
+    segmentation = Segmentation.from_morse_cells(reduced.get_cell_graph(), morse_cells)
+    dendrogram = reduced.get_merge_dendrogram(salient_edge_pts, 0.3, 0.2)
+    assert np.array_equal(segmentation.relabel, dendrogram.cut(0.4, n_labels=3, size_threshold=100))
+
+def test_user_label_counts_match_recomputed():
+    data = load_test_mesh()
+    data.load_labels("./test_data/labels_test.txt")
+    assert all(data.VertexUserLabels[vert] == label for vert, label in data.UserLabels['vertices'].items())
+    data.process_lower_stars(conforming=True)
+    data.extract_morse_complex()
+    data.reduce_morse_complex(data.range, conforming=True)
+    reduced = data.reduce_morse_complex(0.01, conforming=True)
+    data.extract_morse_cells(0.01)
+    salient_edge_pts = data.get_salient_ridges(0.3, 0.2)
+
+    morse_cells = reduced.get_cell_graph(data.n_vertices).to_morse_cells()
+    morse_cells.add_salient_edge_points(salient_edge_pts, (0.3, 0.2))
+    morse_cells.segment(0.4, 3, size_threshold=100, conforming=True, UserLabels=data.UserLabels, 
+                       vertex_user_labels=data.VertexUserLabels)
+    for cell in morse_cells.Cells.values():
+        cached = cell.getUserLabels(data.UserLabels)
+        cell.user_label_counts = None
+        fresh = cell.getUserLabels(data.UserLabels)
+        assert cached["interior"] == Counter(fresh["interior"])
+        assert cached["boundary"] == Counter(fresh["boundary"])
+        assert set(cached["all"]) == set(fresh["all"])
+
+    # unlabelled vertices are not counted as a label, as before
+    vertex_user_labels = data.VertexUserLabels.copy()
+    vertex = next(iter(next(iter(morse_cells.Cells.values())).vertices))
+    vertex_user_labels[vertex] = -1
+    with pytest.raises(KeyError):
+        morse_cells.count_user_labels(vertex_user_labels)
+
+def test_separatrix_table_queries_equal_legacy(data):
+    maximal = data.reduce_morse_complex(data.range)
+    mesh_arrays = data.get_mesh_arrays()
+
+    for separatrix_type in ("all", "cutoff", "reverse"):
+        for mode in (1, 2):
+            for high, low, min_length, max_length in ((0.3, 0.2, 1, None), (0.1, 0.05, 5, None), 
+                                                      (0.2, 0.3, 1, None), (0.5, 0.1, 3, 20)):
+                expected = get_salient_sepa_indices(maximal, high, low, data.Edges, data.Faces, mode=mode,
+                                                    min_length=min_length, max_length=max_length, 
+                                                    separatrix_type=separatrix_type)
+                result = get_salient_sepa_indices(maximal, high, low, data.Edges, data.Faces, mode=mode,
+                                                  min_length=min_length, max_length=max_length, 
+                                                  separatrix_type=separatrix_type, mesh_arrays=mesh_arrays)
+                assert result == expected
+
+    # the table is built once and rebuilt when the separatrices change
+    table = maximal.get_separatrix_table("all", mesh_arrays)
+    assert maximal.get_separatrix_table("all", mesh_arrays) is table
+    data.change_separatrix_persistences_start_end_average()
+    assert maximal.get_separatrix_table("all", mesh_arrays) is not table
+    assert (get_salient_sepa_indices(maximal, 0.6, 0.5, data.Edges, data.Faces, mesh_arrays=mesh_arrays) 
+            == get_salient_sepa_indices(maximal, 0.6, 0.5, data.Edges, data.Faces))
+
+def test_hysteresis_mask_equals_legacy_growth(shared_data):
+    data = shared_data
+    maximal = data.maximalReducedComplex
+    mesh_arrays = data.get_mesh_arrays()
+
+    for detection in (ridge_detection, valley_detection):
+        for high, low in ((0.3, 0.2), (0.1, 0.05), (0.05, 0.0), (0.3, 0.3)):
+            expected = detection(maximal, high, low, data.Vertices, data.Edges, data.Faces)
+            points, mask = detection(maximal, high, low, data.Vertices, data.Edges, data.Faces, 
+                                     mesh_arrays=mesh_arrays, return_mask=True)
+            assert points == expected
+            assert set(np.flatnonzero(mask).tolist()) == expected
+
+    # weak points are only kept if connected to a strong point via weak points
+    edge = mesh_arrays.edges[0]
+    far = next(v for v in range(mesh_arrays.n_vertices) 
+               if v not in edge and v not in data.Vertices[edge[0]].neighbors 
+               and v not in data.Vertices[edge[1]].neighbors)
+    mask = hysteresis_mask([edge[0]], [edge[1], far], mesh_arrays)
+    assert set(np.flatnonzero(mask).tolist()) == {edge[0], edge[1]}
+
+def test_salient_edge_tracker_updates_equal_recomputed(data):
+    data.reduce_morse_complex(data.range)
+
+    rng = np.random.default_rng(0)
+    for mode, detection in (("ridge", data.get_salient_ridges), ("valley", data.get_salient_valleys)):
+        for separatrix_type, min_length, max_length in (("all", 1, None), ("cutoff", 4, 30)):
+            points = set()
+            for step in range(20):
+                high = rng.uniform(-0.1, 0.6)
+                low = rng.uniform(-0.1, 0.6) if step % 3 else high
+                added, removed = data.update_salient_edges(high, low, mode=mode, 
+                                                           min_length=min_length, max_length=max_length, 
+                                                           separatrix_type=separatrix_type)
+                expected = detection(high, low, min_length, max_length, separatrix_type)
+                assert not points.intersection(added.tolist())
+                assert points.issuperset(removed.tolist())
+                points = points.union(added.tolist()).difference(removed.tolist())
+                assert points == expected
+
+    # small steps only regrow the components around the moved separatrices
+    tracker = data.get_salient_edge_tracker(mode="ridge")
+    for high in np.linspace(0.4, 0.0, 9):
+        tracker.update(high, high - 0.1)
+        assert set(tracker.points.tolist()) == data.get_salient_ridges(high, high - 0.1)
+        # the search markers are reset after every update
+        assert np.all(tracker._local == -1)
+
+def test_salient_edges_equal_ridges_and_valleys(shared_data):
+    data = shared_data
+    maximal = data.maximalReducedComplex
+
+    for high, low in ((0.3, 0.2), (0.1, 0.05), (0.05, -0.05), (-0.1, -0.2)):
+        for separatrix_type, min_length, max_length in (("all", 1, None), ("reverse", 4, 30)):
+            ridges, valleys, edges = data.get_salient_edges(high, low, min_length, max_length, separatrix_type)
+            assert set(np.flatnonzero(ridges).tolist()) == data.get_salient_ridges(high, low, min_length, 
+                                                                                    max_length, separatrix_type)
+            assert set(np.flatnonzero(valleys).tolist()) == data.get_salient_valleys(high, low, min_length, 
+                                                                                      max_length, separatrix_type)
+            assert np.array_equal(edges, ridges | valleys)
+
+        # mode 3 gives the strong and weak points of ridges and valleys together
+        both = get_salient_sepa_indices(maximal, high, low, data.Edges, data.Faces, mode=3)
+        ridge = get_salient_sepa_indices(maximal, high, low, data.Edges, data.Faces, mode=1)
+        valley = get_salient_sepa_indices(maximal, high, low, data.Edges, data.Faces, mode=2)
+        assert both == (ridge[0] | valley[0], ridge[1] | valley[1])
+        assert both == get_salient_sepa_indices(maximal, high, low, data.Edges, data.Faces, mode=3, 
+                                                mesh_arrays=data.get_mesh_arrays())
+
+def test_bulk_separatrix_persistences_equal_legacy(shared_data):
+    data = shared_data
+    mesh_arrays = data.get_mesh_arrays()
+
+    # the deferred bulk computation adds the same separatrices in the same order
+    legacy = cancel_critical_pairs(data.MorseComplex, data.range, data.Vertices, data.Edges, data.Faces)
+    bulk = cancel_critical_pairs(data.MorseComplex, data.range, data.Vertices, data.Edges, data.Faces, 
+                                 mesh_arrays=mesh_arrays)
+    # (the averages are summed in another order, so they agree up to rounding)
+    for name in ("Separatrices", "Separatrices_cutoff", "Separatrices_reversed"):
+        expected = [(sepa.origin, sepa.destination, sepa.dimension, path_array(sepa.path).tolist()) 
+                    for _, sepa in getattr(legacy, name)]
+        result = [(sepa.origin, sepa.destination, sepa.dimension, path_array(sepa.path).tolist()) 
+                  for _, sepa in getattr(bulk, name)]
+        assert result == expected
+        assert np.allclose([pers for pers, _ in getattr(bulk, name)], 
+                           [pers for pers, _ in getattr(legacy, name)], rtol=1e-12, atol=0)
+    assert all(pers == sepa.separatrix_persistence for pers, sepa in bulk.Separatrices)
+
+    separatrices = [sepa for _, sepa in legacy.Separatrices]
+    persistences = separatrix_persistences(separatrices, simplex_values(mesh_arrays), 
+                                           definitions=("average", "maximum", "minimum"))
+    averages = []
+    for i, sepa in enumerate(separatrices):
+        if sepa.dimension == 1:
+            averages.append(compute_min_sad_persistence(sepa.path, data.Vertices, data.Edges))
+            values = [data.Edges[elt].fun_val[0] if k % 2 == 0 else data.Vertices[elt].fun_val 
+                      for k, elt in enumerate(path_array(sepa.path).tolist())]
+        else:
+            averages.append(compute_max_sad_persistence(sepa.path, data.Edges, data.Faces))
+            values = [data.Faces[elt].fun_val[0] if k % 2 == 0 else data.Edges[elt].fun_val[0] 
+                      for k, elt in enumerate(path_array(sepa.path).tolist())]
+        assert persistences["maximum"][i] == max(values)
+        assert persistences["minimum"][i] == min(values)
+    assert np.allclose(persistences["average"], averages, rtol=1e-12, atol=0)
+
+    # start and end average in bulk and with the dictionaries
+    copy = deepcopy(legacy)
+    copy.change_separatrix_persistences(data.Vertices, data.Edges, data.Faces)
+    legacy.change_separatrix_persistences(data.Vertices, data.Edges, data.Faces, mesh_arrays=mesh_arrays)
+    assert [pers for pers, _ in legacy.Separatrices] == [pers for pers, _ in copy.Separatrices]
+    assert legacy.max_separatrix_persistence == copy.max_separatrix_persistence
+    for complex_ in (legacy, copy):
+        for separatrices in (complex_.Separatrices_cutoff, complex_.Separatrices_reversed):
+            assert separatrices and all(pers == sepa.separatrix_persistence for pers, sepa in separatrices)
+    assert ([pers for pers, _ in legacy.Separatrices_cutoff + legacy.Separatrices_reversed] 
+            == [pers for pers, _ in copy.Separatrices_cutoff + copy.Separatrices_reversed])
+
+    with pytest.raises(ValueError):
+        legacy.change_separatrix_persistences(data.Vertices, data.Edges, data.Faces, definition="maximum")
+    with pytest.raises(ValueError):
+        separatrix_persistences(separatrices, simplex_values(mesh_arrays), definitions=("median",))
+
+def test_separatrix_persistences_in_float64():
+    # values that lose the small summands in float32
+    values = (np.array([1.0, 3.0, 5.0]), np.array([1e8, 1e8 + 2, 7.0]), np.array([2e8]))
+    separatrices = [Separatrix(1, 2, 1, [0, 0, 1, 1], 0), 
+                    Separatrix(0, 2, 2, [0, 2], 0), 
+                    Separatrix(2, 0, 1, [2], 0)]
+    persistences = separatrix_persistences(separatrices, values, definitions=PERSISTENCE_DEFINITIONS)
+    assert all(persistence.dtype == np.float64 for persistence in persistences.values())
+    assert persistences["average"].tolist() == [(2e8 + 6) / 4, (2e8 + 7) / 2, 7.0]
+    assert persistences["start_end_average"].tolist() == [(1e8 + 3) / 2, (2e8 + 7) / 2, 7.0]
+    assert persistences["maximum"].tolist() == [1e8 + 2, 2e8, 7.0]
+    assert persistences["minimum"].tolist() == [1.0, 7.0, 7.0]
+
+def test_changed_separatrix_persistences_keep_sibling_complexes(data):
+    maximal = data.reduce_morse_complex(data.range)
+    sibling = data.reduce_morse_complex(0.999 * data.range)
+    names = ("Separatrices", "Separatrices_cutoff", "Separatrices_reversed")
+    before = {name: [(pers, sepa.separatrix_persistence) for pers, sepa in getattr(sibling, name)] 
+              for name in names}
+
+    data.change_separatrix_persistences("maximum")
+    separatrices = [sepa for _, sepa in maximal.Separatrices]
+    expected = separatrix_persistences(separatrices, simplex_values(data.get_mesh_arrays()), 
+                                       definitions=("maximum",))["maximum"].tolist()
+    assert [pers for pers, _ in maximal.Separatrices] == expected
+    for name in names:
+        assert all(pers == sepa.separatrix_persistence for pers, sepa in getattr(maximal, name))
+        # the sibling and the complexes replayed later keep the average
+        assert [(pers, sepa.separatrix_persistence) for pers, sepa in getattr(sibling, name)] == before[name]
+        later = data.reduce_morse_complex(0.998 * data.range)
+        assert all(pers == sepa.separatrix_persistence for pers, sepa in getattr(later, name))
+    assert before["Separatrices"] != [(pers, pers) for pers in expected]